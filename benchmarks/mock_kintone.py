@@ -0,0 +1,1018 @@
+"""
+where: benchmarks/mock_kintone.py
+what: ベンチマーク用にkintone REST APIの主要エンドポイントを模倣するローカルHTTPサーバー
+why: 実環境に依存せず、遅延・スロットリング・データ量を変えながらツールのHTTP経路を計測するため
+
+対応エンドポイント:
+    /k/v1/records.json (GET/POST/PUT), /k/v1/record.json (GET/POST/PUT),
+    /k/v1/records/cursor.json (POST/GET/DELETE), /k/v1/record/comments.json (GET),
+    /k/v1/record/comment.json (POST), /k/v1/file.json (POST/GET),
+    /k/v1/app/form/fields.json (GET), /k/v1/app/settings.json (GET), /k/v1/bulkRequest.json (POST)
+
+制御用エンドポイント:
+    GET /__mock__/stats, POST /__mock__/reset, POST /__mock__/config
+
+単体起動:
+    python -m benchmarks.mock_kintone --port 8080 --records 10000 --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+MAX_READ_LIMIT = 500
+MAX_OFFSET = 10000
+MAX_WRITE_RECORDS = 100
+MAX_BULK_REQUESTS = 20
+MAX_CURSORS = 10
+MAX_COMMENT_LIMIT = 10
+DEFAULT_CURSOR_SIZE = 100
+DEFAULT_READ_LIMIT = 100
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class MockConfig:
+    """モックサーバーの挙動設定（/__mock__/config で実行中に変更できる）。"""
+
+    FIELDS = (
+        "records",
+        "text_size",
+        "subtable_rows",
+        "comments_per_record",
+        "files",
+        "file_size",
+        "latency_ms",
+        "jitter_ms",
+        "throttle_rate",
+        "max_concurrent",
+        "seed",
+    )
+
+    def __init__(
+        self,
+        *,
+        records: int = 1000,
+        text_size: int = 64,
+        subtable_rows: int = 2,
+        comments_per_record: int = 3,
+        files: int = 10,
+        file_size: int = 256 * 1024,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_concurrent: int = 0,
+        seed: int = 42,
+    ) -> None:
+        self.records = records
+        self.text_size = text_size
+        self.subtable_rows = subtable_rows
+        self.comments_per_record = comments_per_record
+        self.files = files
+        self.file_size = file_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.max_concurrent = max_concurrent
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for name, value in values.items():
+            if name not in self.FIELDS:
+                raise ValueError(f"unknown config key: {name}")
+            current = getattr(self, name)
+            setattr(self, name, type(current)(value))
+
+
+class MockApiError(Exception):
+    """kintone形式のエラー応答に変換される例外。"""
+
+    def __init__(self, status: int, code: str, message: str, errors: Optional[Dict[str, Any]] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.body: Dict[str, Any] = {"code": code, "id": uuid.uuid4().hex[:20], "message": message}
+        if errors:
+            self.body["errors"] = errors
+
+
+# --- クエリ評価（ベンチマークに必要なサブセットのみ） ---
+
+_TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<string>"(?:\\.|[^"\\])*")|(?P<op>>=|<=|!=|=|>|<|\(|\)|,)|(?P<word>[^\s=<>!(),"]+))'
+)
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if not match or match.end() == position:
+            if query[position:].strip() == "":
+                break
+            raise MockApiError(400, "GAIA_IQ11", f"クエリ記法が間違っています。: {query[position:position + 20]}")
+        position = match.end()
+        if match.group("string") is not None:
+            tokens.append(("string", json.loads(match.group("string"))))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        elif match.group("word") is not None:
+            tokens.append(("word", match.group("word")))
+    return tokens
+
+
+Condition = Tuple[Any, ...]
+
+
+class ParsedQuery:
+    """条件式・並び順・limit/offset に分解したクエリ。"""
+
+    def __init__(self) -> None:
+        self.condition: Optional[Condition] = None
+        self.order_by: List[Tuple[str, bool]] = []
+        self.limit: Optional[int] = None
+        self.offset: Optional[int] = None
+
+
+class _QueryParser:
+    """and/or・括弧・比較/in/like を扱う再帰下降パーサー。"""
+
+    def __init__(self, query: str) -> None:
+        self.tokens = _tokenize(query or "")
+        self.index = 0
+
+    def parse(self) -> ParsedQuery:
+        parsed = ParsedQuery()
+        if self.index < len(self.tokens) and self._word() not in {"order", "limit", "offset"}:
+            parsed.condition = self._expression()
+        while self.index < len(self.tokens):
+            word = self._word()
+            if word == "order" and self._word(1) == "by":
+                self.index += 2
+                while True:
+                    field = self._take()[1]
+                    descending = False
+                    if self._word() in {"asc", "desc"}:
+                        descending = self._take()[1].lower() == "desc"
+                    parsed.order_by.append((field, descending))
+                    if self._peek() == ("op", ","):
+                        self.index += 1
+                        continue
+                    break
+            elif word in {"limit", "offset"}:
+                self.index += 1
+                setattr(parsed, word, int(self._take()[1]))
+            else:
+                raise self._error()
+        return parsed
+
+    def _peek(self, offset: int = 0) -> Optional[Tuple[str, str]]:
+        position = self.index + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+    def _word(self, offset: int = 0) -> Optional[str]:
+        token = self._peek(offset)
+        return token[1].lower() if token and token[0] == "word" else None
+
+    def _take(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise self._error()
+        self.index += 1
+        return token
+
+    def _error(self) -> MockApiError:
+        rest = " ".join(str(token[1]) for token in self.tokens[self.index : self.index + 3])
+        return MockApiError(400, "GAIA_IQ11", f"クエリ記法が間違っています。: {rest}")
+
+    def _expression(self) -> Condition:
+        terms = [self._term()]
+        while self._word() == "or":
+            self.index += 1
+            terms.append(self._term())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def _term(self) -> Condition:
+        factors = [self._factor()]
+        while self._word() == "and":
+            self.index += 1
+            factors.append(self._factor())
+        return factors[0] if len(factors) == 1 else ("and", factors)
+
+    def _factor(self) -> Condition:
+        if self._peek() == ("op", "("):
+            self.index += 1
+            inner = self._expression()
+            if self._take() != ("op", ")"):
+                raise self._error()
+            return inner
+
+        field = self._take()[1]
+        if self._word() == "not" and self._word(1) in {"in", "like"}:
+            operator = f"not {self._word(1)}"
+            self.index += 2
+        elif self._word() in {"in", "like"}:
+            operator = self._take()[1].lower()
+        elif self._peek() is not None and self._peek()[0] == "op":
+            operator = self._take()[1]
+        else:
+            raise self._error()
+
+        if operator in {"in", "not in"}:
+            if self._take() != ("op", "("):
+                raise self._error()
+            values: List[Any] = []
+            while self._peek() != ("op", ")"):
+                token = self._take()
+                if token != ("op", ","):
+                    values.append(token[1])
+            self.index += 1
+            return ("cmp", field, operator, values)
+        return ("cmp", field, operator, self._take()[1])
+
+
+def parse_query(query: str) -> ParsedQuery:
+    """"(a > 1 or b in ("x")) and c like "y" order by d desc limit 10 offset 5" 形式のクエリを解析する。"""
+
+    return _QueryParser(query).parse()
+
+
+def _comparable(value: Any) -> Any:
+    if isinstance(value, (int, float)):
+        return value
+    text = "" if value is None else str(value)
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _field_value(record: Dict[str, Any], field: str) -> Any:
+    entry = record.get(field)
+    if not isinstance(entry, dict):
+        return None
+    return entry.get("value")
+
+
+def _compare(actual: Any, operator: str, expected: Any) -> bool:
+    if operator in {"in", "not in"}:
+        hit = str(actual) in {str(item) for item in expected}
+        return hit == (operator == "in")
+    if operator in {"like", "not like"}:
+        hit = str(expected) in str(actual or "")
+        return hit == (operator == "like")
+    left, right = _comparable(actual), _comparable(expected)
+    if type(left) is not type(right):
+        left, right = str(actual), str(expected)
+    if operator == "=":
+        return left == right
+    if operator == "!=":
+        return left != right
+    if operator == ">":
+        return left > right
+    if operator == ">=":
+        return left >= right
+    if operator == "<":
+        return left < right
+    if operator == "<=":
+        return left <= right
+    raise MockApiError(400, "GAIA_IQ11", f"未対応の演算子です: {operator}")
+
+
+def _matches(record: Dict[str, Any], condition: Optional[Condition]) -> bool:
+    if condition is None:
+        return True
+    kind = condition[0]
+    if kind == "and":
+        return all(_matches(record, item) for item in condition[1])
+    if kind == "or":
+        return any(_matches(record, item) for item in condition[1])
+    _, field, operator, expected = condition
+    return _compare(_field_value(record, field), operator, expected)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class MockKintoneState:
+    """レコード・ファイル・カーソル・コメントを保持するインメモリのkintoneアプリ。"""
+
+    def __init__(self, config: MockConfig) -> None:
+        self.config = config
+        self.lock = threading.RLock()
+        self.stats: Counter[str] = Counter()
+        # "GET /k/v1/records/cursor.json" のようなキーごとに、処理後に応答を返さず切断する回数
+        self.drop_responses: Counter[str] = Counter()
+        self.revision = 1
+        self.reset()
+
+    # --- データ生成 ---
+
+    def reset(self) -> None:
+        with self.lock:
+            rng = random.Random(self.config.seed)
+            self.files: Dict[str, Tuple[bytes, str, str]] = {}
+            # 一時保管領域の fileKey（アップロード直後）と、レコードに添付して使えなくなった fileKey
+            self.temporary_files: set[str] = set()
+            self.consumed_files: set[str] = set()
+            self.cursors: Dict[str, Dict[str, Any]] = {}
+            self.comments: Dict[int, List[Dict[str, Any]]] = {}
+            self.records: Dict[int, Dict[str, Any]] = {}
+            self.stats.clear()
+            self.clock = BASE_TIME
+
+            file_keys = []
+            for index in range(self.config.files):
+                payload = bytes(rng.getrandbits(8) for _ in range(min(self.config.file_size, 4096)))
+                payload = (payload * (self.config.file_size // max(len(payload), 1) + 1))[: self.config.file_size]
+                file_keys.append(self._store_file(payload, f"sample-{index + 1}.bin", "application/octet-stream"))
+
+            for record_id in range(1, self.config.records + 1):
+                attachment = []
+                if file_keys:
+                    key = file_keys[(record_id - 1) % len(file_keys)]
+                    data, name, content_type = self.files[key]
+                    attachment = [
+                        {"fileKey": key, "name": name, "contentType": content_type, "size": str(len(data))}
+                    ]
+                fields = {
+                    "title": {"value": f"レコード {record_id}"},
+                    "num": {"value": str(rng.randint(0, 10000))},
+                    "status": {"value": rng.choice(["未着手", "進行中", "完了"])},
+                    "body": {"value": "あ" * (self.config.text_size // 3)},
+                    "添付ファイル": {"value": attachment},
+                    "明細": {
+                        "value": [
+                            {
+                                "id": str(record_id * 100 + row),
+                                "value": {
+                                    "品名": {"type": "SINGLE_LINE_TEXT", "value": f"品目{row}"},
+                                    "数量": {"type": "NUMBER", "value": str(row + 1)},
+                                },
+                            }
+                            for row in range(self.config.subtable_rows)
+                        ]
+                    },
+                }
+                self._insert(record_id, fields)
+                self.comments[record_id] = [
+                    {
+                        "id": str(number),
+                        "text": f"コメント {number}",
+                        "createdAt": _iso(BASE_TIME + timedelta(minutes=number)),
+                        "creator": {"code": "user1", "name": "ユーザー1"},
+                        "mentions": [],
+                    }
+                    for number in range(1, self.config.comments_per_record + 1)
+                ]
+            self.next_id = self.config.records + 1
+
+    def schema(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "レコード番号": {"type": "RECORD_NUMBER", "code": "レコード番号", "label": "レコード番号"},
+            "$id": {"type": "__ID__", "code": "$id", "label": "$id"},
+            "$revision": {"type": "__REVISION__", "code": "$revision", "label": "$revision"},
+            "title": {"type": "SINGLE_LINE_TEXT", "code": "title", "label": "タイトル", "unique": True},
+            "num": {"type": "NUMBER", "code": "num", "label": "数値"},
+            "status": {
+                "type": "DROP_DOWN",
+                "code": "status",
+                "label": "ステータス",
+                "options": {name: {"label": name, "index": str(i)} for i, name in enumerate(["未着手", "進行中", "完了"])},
+            },
+            "body": {"type": "MULTI_LINE_TEXT", "code": "body", "label": "本文"},
+            "添付ファイル": {"type": "FILE", "code": "添付ファイル", "label": "添付ファイル"},
+            "明細": {
+                "type": "SUBTABLE",
+                "code": "明細",
+                "fields": {
+                    "品名": {"type": "SINGLE_LINE_TEXT", "code": "品名", "label": "品名"},
+                    "数量": {"type": "NUMBER", "code": "数量", "label": "数量"},
+                },
+            },
+            "作成日時": {"type": "CREATED_TIME", "code": "作成日時", "label": "作成日時"},
+            "更新日時": {"type": "UPDATED_TIME", "code": "更新日時", "label": "更新日時"},
+        }
+
+    def _store_file(self, data: bytes, name: str, content_type: str) -> str:
+        key = uuid.uuid4().hex
+        self.files[key] = (data, name, content_type)
+        return key
+
+    def _tick(self) -> str:
+        self.clock += timedelta(seconds=1)
+        return _iso(self.clock)
+
+    def _insert(self, record_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+        schema = self.schema()
+        now = self._tick()
+        record: Dict[str, Any] = {
+            "$id": {"type": "__ID__", "value": str(record_id)},
+            "$revision": {"type": "__REVISION__", "value": "1"},
+            "レコード番号": {"type": "RECORD_NUMBER", "value": str(record_id)},
+            "作成日時": {"type": "CREATED_TIME", "value": now},
+            "更新日時": {"type": "UPDATED_TIME", "value": now},
+        }
+        for code, entry in fields.items():
+            field_type = schema.get(code, {}).get("type", "SINGLE_LINE_TEXT")
+            record[code] = {"type": field_type, "value": entry.get("value") if isinstance(entry, dict) else entry}
+        self._consume_files(fields)
+        self.records[record_id] = record
+        return record
+
+    def _update(self, record_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+        schema = self.schema()
+        current = self.records[record_id]
+        # 更新はコピーオンライトで行い、書き込みAPIのロールバック（_atomic）を浅いコピーで実現する
+        record = dict(current)
+        for code, entry in fields.items():
+            field_type = schema.get(code, {}).get("type", "SINGLE_LINE_TEXT")
+            record[code] = {"type": field_type, "value": entry.get("value") if isinstance(entry, dict) else entry}
+        revision = int(current["$revision"]["value"]) + 1
+        record["$revision"] = {"type": "__REVISION__", "value": str(revision)}
+        record["更新日時"] = {"type": "UPDATED_TIME", "value": self._tick()}
+        self._consume_files(fields)
+        self.records[record_id] = record
+        return record
+
+    # --- records.json / record.json ---
+
+    def select(self, query: str, fields: Optional[List[str]]) -> Tuple[List[Dict[str, Any]], int]:
+        parsed = parse_query(query)
+        limit = DEFAULT_READ_LIMIT if parsed.limit is None else parsed.limit
+        offset = parsed.offset or 0
+        if limit > MAX_READ_LIMIT:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"limit": {"messages": ["500以下である必要があります。"]}})
+        if offset > MAX_OFFSET:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"offset": {"messages": ["10000以下である必要があります。"]}})
+
+        with self.lock:
+            matched = [record for record in self.records.values() if _matches(record, parsed.condition)]
+        order_by = parsed.order_by or [("$id", True)]
+        for field, descending in reversed(order_by):
+            matched.sort(key=lambda record, f=field: _comparable(_field_value(record, f)), reverse=descending)
+        page = matched[offset : offset + limit]
+        return [self._project(record, fields) for record in page], len(matched)
+
+    @staticmethod
+    def _project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+        if not fields:
+            return record
+        return {code: value for code, value in record.items() if code in fields}
+
+    def _find_by_key(self, update_key: Dict[str, Any]) -> Optional[int]:
+        field = update_key.get("field")
+        value = str(update_key.get("value"))
+        for record_id, record in self.records.items():
+            if str(_field_value(record, field)) == value:
+                return record_id
+        return None
+
+    def add_records(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if len(records) > MAX_WRITE_RECORDS:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"records": {"messages": ["一度に100件までです。"]}})
+        ids, revisions = [], []
+        with self._atomic():
+            for fields in records:
+                self._check_fields(fields)
+                record = self._insert(self.next_id, fields)
+                ids.append(str(self.next_id))
+                revisions.append(record["$revision"]["value"])
+                self.next_id += 1
+        return {"ids": ids, "revisions": revisions}
+
+    def update_records(self, records: List[Dict[str, Any]], upsert: bool) -> Dict[str, Any]:
+        if len(records) > MAX_WRITE_RECORDS:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"records": {"messages": ["一度に100件までです。"]}})
+        results = []
+        with self._atomic():
+            for index, item in enumerate(records):
+                fields = item.get("record") or {}
+                self._check_fields(fields, index)
+                if item.get("id") is not None:
+                    record_id: Optional[int] = int(item["id"])
+                    if record_id not in self.records:
+                        raise MockApiError(404, "GAIA_RE01", f"指定したレコード（id: {record_id}）が見つかりません。")
+                elif isinstance(item.get("updateKey"), dict):
+                    record_id = self._find_by_key(item["updateKey"])
+                    if record_id is None and not upsert:
+                        raise MockApiError(404, "GAIA_RE20", "更新キーに一致するレコードが見つかりません。")
+                    if record_id is None:
+                        key = item["updateKey"]
+                        fields = {**fields, key["field"]: {"value": key["value"]}}
+                elif upsert:
+                    record_id = None
+                else:
+                    raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {f"records[{index}].id": {"messages": ["必須です。"]}})
+
+                if record_id is None:
+                    record = self._insert(self.next_id, fields)
+                    result = {"id": str(self.next_id), "revision": "1", "operation": "INSERT"}
+                    self.next_id += 1
+                else:
+                    record = self._update(record_id, fields)
+                    result = {"id": str(record_id), "revision": record["$revision"]["value"]}
+                    if upsert:
+                        result["operation"] = "UPDATE"
+                results.append(result)
+        return {"records": results}
+
+    @staticmethod
+    def _file_keys(entry: Any) -> List[str]:
+        value = entry.get("value") if isinstance(entry, dict) else entry
+        if not isinstance(value, list):
+            return []
+        return [str(item["fileKey"]) for item in value if isinstance(item, dict) and item.get("fileKey")]
+
+    def _consume_files(self, fields: Dict[str, Any]) -> None:
+        """添付した一時 fileKey を使用済みにする（kintone と同じく、一時 fileKey は1回しか添付できない）。"""
+
+        schema = self.schema()
+        for code, entry in fields.items():
+            if schema.get(code, {}).get("type") == "FILE":
+                for file_key in self._file_keys(entry):
+                    if file_key in self.temporary_files:
+                        self.temporary_files.discard(file_key)
+                        self.consumed_files.add(file_key)
+
+    def _check_fields(self, fields: Dict[str, Any], index: int = 0) -> None:
+        schema = self.schema()
+        for code, entry in fields.items():
+            if code not in schema:
+                raise MockApiError(
+                    400, "GAIA_IL01", f"指定したフィールド（{code}）が見つかりません。",
+                )
+            if schema[code]["type"] == "FILE":
+                for file_key in self._file_keys(entry):
+                    if file_key in self.consumed_files or file_key not in self.files:
+                        raise MockApiError(
+                            400,
+                            "GAIA_FU01",
+                            "指定したファイル（fileKey）は使用済みか、存在しません。",
+                            {f"records[{index}].{code}.value": {"messages": [f"fileKey {file_key} は使用できません。"]}},
+                        )
+            if schema[code]["type"] == "NUMBER":
+                value = entry.get("value") if isinstance(entry, dict) else entry
+                try:
+                    if value not in (None, ""):
+                        float(value)
+                except (TypeError, ValueError):
+                    raise MockApiError(
+                        400,
+                        "CB_VA01",
+                        "入力内容が正しくありません。",
+                        {f"records[{index}].{code}.value": {"messages": ["数字でなければなりません。"]}},
+                    ) from None
+
+    # --- カーソル ---
+
+    def create_cursor(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        size = int(body.get("size") or DEFAULT_CURSOR_SIZE)
+        if size > MAX_READ_LIMIT:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"size": {"messages": ["500以下である必要があります。"]}})
+        parsed = parse_query(body.get("query") or "")
+        if parsed.limit is not None or parsed.offset is not None:
+            raise MockApiError(400, "GAIA_IQ03", "カーソルのクエリでは limit と offset を指定できません。")
+        with self.lock:
+            if len(self.cursors) >= MAX_CURSORS:
+                raise MockApiError(400, "GAIA_CO02", "作成できるカーソルの上限に達しているため、カーソルを作成できません。")
+            matched = [record for record in self.records.values() if _matches(record, parsed.condition)]
+        for field, descending in reversed(parsed.order_by or [("$id", True)]):
+            matched.sort(key=lambda record, f=field: _comparable(_field_value(record, f)), reverse=descending)
+        cursor_id = str(uuid.uuid4())
+        fields = body.get("fields")
+        with self.lock:
+            self.cursors[cursor_id] = {
+                "records": [self._project(record, fields) for record in matched],
+                "position": 0,
+                "size": size,
+            }
+        return {"id": cursor_id, "totalCount": str(len(matched))}
+
+    def read_cursor(self, cursor_id: str) -> Dict[str, Any]:
+        with self.lock:
+            cursor = self.cursors.get(cursor_id)
+            if cursor is None:
+                raise MockApiError(400, "GAIA_CO01", "指定したカーソルが存在しません。")
+            start = cursor["position"]
+            chunk = cursor["records"][start : start + cursor["size"]]
+            cursor["position"] = start + cursor["size"]
+            has_next = cursor["position"] < len(cursor["records"])
+            if not has_next:
+                # 最後まで読み終えたカーソルは自動的に削除される
+                del self.cursors[cursor_id]
+        return {"records": chunk, "next": has_next}
+
+    def delete_cursor(self, cursor_id: str) -> Dict[str, Any]:
+        with self.lock:
+            if self.cursors.pop(cursor_id, None) is None:
+                raise MockApiError(400, "GAIA_CO01", "指定したカーソルが存在しません。")
+        return {}
+
+    # --- コメント ---
+
+    def list_comments(self, record_id: int, order: str, offset: int, limit: int) -> Dict[str, Any]:
+        if limit > MAX_COMMENT_LIMIT:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"limit": {"messages": ["10以下である必要があります。"]}})
+        with self.lock:
+            if record_id not in self.records:
+                raise MockApiError(404, "GAIA_RE01", f"指定したレコード（id: {record_id}）が見つかりません。")
+            comments = list(self.comments.get(record_id, []))
+        if order != "asc":
+            comments.reverse()
+        page = comments[offset : offset + limit]
+        return {
+            "comments": page,
+            "older": offset + limit < len(comments) if order != "asc" else offset > 0,
+            "newer": offset > 0 if order != "asc" else offset + limit < len(comments),
+        }
+
+    def add_comment(self, record_id: int, comment: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            if record_id not in self.records:
+                raise MockApiError(404, "GAIA_RE01", f"指定したレコード（id: {record_id}）が見つかりません。")
+            comments = self.comments.setdefault(record_id, [])
+            comment_id = str(len(comments) + 1)
+            comments.append(
+                {
+                    "id": comment_id,
+                    "text": comment.get("text", ""),
+                    "createdAt": self._tick(),
+                    "creator": {"code": "api", "name": "API"},
+                    "mentions": comment.get("mentions", []),
+                }
+            )
+        return {"id": comment_id}
+
+    # --- bulkRequest ---
+
+    def bulk(self, requests_payload: List[Dict[str, Any]], dispatch: Callable[[str, str, Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        if len(requests_payload) > MAX_BULK_REQUESTS:
+            raise MockApiError(400, "CB_VA01", "入力内容が正しくありません。", {"requests": {"messages": ["20件以下である必要があります。"]}})
+        results: List[Dict[str, Any]] = []
+        index = 0
+        try:
+            # いずれかが失敗した場合はすべての変更を取り消す
+            with self._atomic():
+                for index, sub_request in enumerate(requests_payload):
+                    api = str(sub_request.get("api", ""))
+                    method = str(sub_request.get("method", "")).upper()
+                    results.append(dispatch(method, api, sub_request.get("payload") or {}))
+        except MockApiError as error:
+            failed = [{} for _ in requests_payload]
+            failed[index] = error.body
+            raise MockBulkError(error.status, failed) from None
+        return {"results": results}
+
+    @contextmanager
+    def _atomic(self) -> Iterator[None]:
+        """kintone の書き込みAPIと同じく、途中で失敗したリクエストの変更をすべて取り消す。"""
+
+        with self.lock:
+            snapshot = (dict(self.records), self.next_id, self.clock, set(self.temporary_files), set(self.consumed_files))
+            try:
+                yield
+            except MockApiError:
+                self.records, self.next_id, self.clock, self.temporary_files, self.consumed_files = snapshot
+                raise
+
+
+class MockBulkError(Exception):
+    def __init__(self, status: int, results: List[Dict[str, Any]]) -> None:
+        super().__init__("bulk request failed")
+        self.status = status
+        self.results = results
+
+
+class MockKintoneHandler(BaseHTTPRequestHandler):
+    """HTTPリクエストを MockKintoneState の操作へ振り分ける。"""
+
+    server: "MockKintoneHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 基底クラスの引数名に合わせる
+        return
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def do_DELETE(self) -> None:
+        self._handle("DELETE")
+
+    # --- 共通処理 ---
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = self.rfile.readline().strip()
+                size = int(size_line.split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.state.stats["bytes_sent"] += len(body)
+
+    def _send_bytes(self, data: bytes, name: str, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(name)}")
+        self.end_headers()
+        view = memoryview(data)
+        for start in range(0, len(data), 64 * 1024):
+            self.wfile.write(view[start : start + 64 * 1024])
+        self.server.state.stats["bytes_sent"] += len(data)
+
+    def _handle(self, method: str) -> None:
+        state = self.server.state
+        config = state.config
+        parts = urlsplit(self.path)
+        path = parts.path
+        raw_body = self._read_body()
+        state.stats["bytes_received"] += len(raw_body)
+
+        if path.startswith("/__mock__/"):
+            self._handle_control(path, raw_body)
+            return
+
+        method = self.headers.get("X-HTTP-Method-Override", method).upper()
+        state.stats["requests"] += 1
+        state.stats[f"{method} {path}"] += 1
+
+        with self.server.inflight_lock:
+            self.server.inflight += 1
+            inflight = self.server.inflight
+            state.stats["peak_inflight"] = max(state.stats["peak_inflight"], inflight)
+        try:
+            if config.latency_ms or config.jitter_ms:
+                time.sleep((config.latency_ms + random.uniform(0, config.jitter_ms)) / 1000.0)
+
+            throttled = (config.max_concurrent and inflight > config.max_concurrent) or (
+                config.throttle_rate and random.random() < config.throttle_rate
+            )
+            if throttled:
+                state.stats["throttled"] += 1
+                self._send_json(
+                    429,
+                    {"code": "GAIA_TO04", "id": uuid.uuid4().hex[:20], "message": "リクエスト数が上限を超えています。"},
+                    {"Retry-After": "0"},
+                )
+                return
+
+            if not self.headers.get("X-Cybozu-API-Token"):
+                self._send_json(401, {"code": "GAIA_NO01", "message": "ログインしてください。"})
+                return
+
+            if self._take_drop(f"{method} {path}"):
+                # サーバー側の処理だけ進めて応答を返さずに切断し、応答の消失を再現する
+                state.stats["dropped"] += 1
+                try:
+                    self._dispatch(method, path, self._json_body(raw_body, parts.query))
+                except (MockBulkError, MockApiError):
+                    pass
+                self.close_connection = True
+                return
+
+            try:
+                self._route(method, path, parts.query, raw_body)
+            except MockBulkError as error:
+                state.stats["errors"] += 1
+                self._send_json(error.status, {"results": error.results})
+            except MockApiError as error:
+                state.stats["errors"] += 1
+                self._send_json(error.status, error.body)
+        finally:
+            with self.server.inflight_lock:
+                self.server.inflight -= 1
+
+    def _take_drop(self, key: str) -> bool:
+        state = self.server.state
+        with state.lock:
+            if state.drop_responses[key] <= 0:
+                return False
+            state.drop_responses[key] -= 1
+            return True
+
+    def _handle_control(self, path: str, raw_body: bytes) -> None:
+        state = self.server.state
+        if path == "/__mock__/stats":
+            self._send_json(200, {"stats": dict(state.stats), "config": state.config.to_dict(), "records": len(state.records)})
+        elif path == "/__mock__/reset":
+            state.reset()
+            self._send_json(200, {"records": len(state.records)})
+        elif path == "/__mock__/config":
+            try:
+                state.config.update(json.loads(raw_body or b"{}"))
+            except (ValueError, TypeError) as error:
+                self._send_json(400, {"message": str(error)})
+                return
+            self._send_json(200, state.config.to_dict())
+        elif path == "/__mock__/file-keys":
+            self._send_json(200, {"fileKeys": list(state.files)})
+        else:
+            self._send_json(404, {"message": "not found"})
+
+    def _json_body(self, raw_body: bytes, query_string: str) -> Dict[str, Any]:
+        if raw_body and self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw_body)
+        # GET のクエリ文字列形式（fields[0]=a のような配列表記は fields として扱う）
+        body: Dict[str, Any] = {}
+        for key, values in parse_qs(query_string).items():
+            base = key.split("[", 1)[0]
+            if "[" in key:
+                body.setdefault(base, []).extend(values)
+            else:
+                body[base] = values[0]
+        return body
+
+    def _route(self, method: str, path: str, query_string: str, raw_body: bytes) -> None:
+        state = self.server.state
+        if path == "/k/v1/file.json":
+            if method == "POST":
+                data, name, content_type = self._parse_multipart(raw_body)
+                with state.lock:
+                    key = state._store_file(data, name, content_type)
+                    state.temporary_files.add(key)
+                self._send_json(200, {"fileKey": key})
+                return
+            body = self._json_body(raw_body, query_string)
+            entry = state.files.get(str(body.get("fileKey")))
+            if entry is None:
+                raise MockApiError(404, "GAIA_BL01", "指定したファイル（id: {}）が見つかりません。".format(body.get("fileKey")))
+            data, name, content_type = entry
+            self._send_bytes(data, name, content_type)
+            return
+
+        body = self._json_body(raw_body, query_string)
+        self._send_json(200, self._dispatch(method, path, body))
+
+    def _dispatch(self, method: str, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        state = self.server.state
+        if path == "/k/v1/records.json":
+            if method == "GET":
+                records, total = state.select(body.get("query", ""), body.get("fields"))
+                total_count = body.get("totalCount") in (True, "true")
+                return {"records": records, "totalCount": str(total) if total_count else None}
+            if method == "POST":
+                return state.add_records(body.get("records") or [])
+            if method == "PUT":
+                return state.update_records(body.get("records") or [], bool(body.get("upsert")))
+        if path == "/k/v1/record.json":
+            if method == "GET":
+                records, _ = state.select(f"$id = {int(body.get('id', 0))}", None)
+                if not records:
+                    raise MockApiError(404, "GAIA_RE01", "指定したレコードが見つかりません。")
+                return {"record": records[0]}
+            if method == "POST":
+                result = state.add_records([body.get("record") or {}])
+                return {"id": result["ids"][0], "revision": result["revisions"][0]}
+            if method == "PUT":
+                item = {key: body[key] for key in ("id", "updateKey", "record") if key in body}
+                result = state.update_records([item], False)["records"][0]
+                return {"revision": result["revision"]}
+        if path == "/k/v1/records/cursor.json":
+            if method == "POST":
+                return state.create_cursor(body)
+            if method == "GET":
+                return state.read_cursor(str(body.get("id")))
+            if method == "DELETE":
+                return state.delete_cursor(str(body.get("id")))
+        if path == "/k/v1/record/comments.json" and method == "GET":
+            return state.list_comments(
+                int(body.get("record", 0)),
+                str(body.get("order", "desc")),
+                int(body.get("offset", 0)),
+                int(body.get("limit", MAX_COMMENT_LIMIT)),
+            )
+        if path == "/k/v1/record/comment.json" and method == "POST":
+            return state.add_comment(int(body.get("record", 0)), body.get("comment") or {})
+        if path == "/k/v1/app/form/fields.json" and method == "GET":
+            return {"properties": state.schema(), "revision": str(state.revision)}
+        if path == "/k/v1/app/settings.json" and method == "GET":
+            return {"name": "ベンチマーク用アプリ", "description": "", "revision": str(state.revision)}
+        if path == "/k/v1/bulkRequest.json" and method == "POST":
+            return state.bulk(body.get("requests") or [], self._dispatch_bulk)
+        raise MockApiError(404, "GAIA_NF01", f"{method} {path} は模倣されていません。")
+
+    def _dispatch_bulk(self, method: str, api: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if api.endswith("/bulkRequest.json") or api.endswith("/file.json"):
+            raise MockApiError(400, "CB_VA01", f"{api} は bulkRequest では使用できません。")
+        return self._dispatch(method, api, payload)
+
+    def _parse_multipart(self, raw_body: bytes) -> Tuple[bytes, str, str]:
+        content_type = self.headers.get("Content-Type", "")
+        if "multipart/form-data" not in content_type:
+            raise MockApiError(400, "CB_VA01", "multipart/form-data で送信してください。")
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw_body
+        )
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                name = part.get_filename() or "file"
+                data = part.get_payload(decode=True) or b""
+                return data, name, part.get_content_type()
+        raise MockApiError(400, "CB_VA01", "file パラメータが見つかりません。")
+
+
+class MockKintoneHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], state: MockKintoneState) -> None:
+        super().__init__(address, MockKintoneHandler)
+        self.state = state
+        self.inflight = 0
+        self.inflight_lock = threading.Lock()
+
+
+class MockKintoneServer:
+    """バックグラウンドスレッドでモックサーバーを起動する。with 文で使用できる。"""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.state = MockKintoneState(config or MockConfig())
+        self.httpd = MockKintoneHTTPServer((host, port), self.state)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockKintoneServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-kintone", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockKintoneServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="kintone REST API のモックサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 の場合は空きポートを使用")
+    defaults = MockConfig()
+    for name in MockConfig.FIELDS:
+        option = "--" + name.replace("_", "-")
+        parser.add_argument(option, dest=name, type=type(getattr(defaults, name)), default=getattr(defaults, name))
+    args = parser.parse_args(argv)
+
+    config = MockConfig(**{name: getattr(args, name) for name in MockConfig.FIELDS})
+    server = MockKintoneServer(config, host=args.host, port=args.port)
+    # ベンチマークハーネスが起動完了とURLを検知できるよう、最初の1行でURLを出力する
+    print(json.dumps({"url": server.url, "records": len(server.state.records)}), flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+where: benchmarks/run_benchmarks.py
+what: モックkintoneサーバーに対して主要ツールを実行し、スループット・レイテンシ・リクエスト数・ピークRSSを計測する
+why: リリースごとに性能の劣化を数値で比較できるようにするため
+
+使い方（リポジトリのルートで実行）:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenarios query,query_cursor --records 20000 --latency-ms 20
+    python -m benchmarks.run_benchmarks --output after.json --baseline before.json
+
+各シナリオは別プロセスで実行するため、ピークRSSはシナリオ単位の値になる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.request import Request, urlopen
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_TOKEN = "benchmark-token"
+
+SCENARIOS = (
+    "query",
+    "query_cursor",
+    "query_parallel",
+    "query_ndjson",
+    "upsert",
+    "upload",
+    "download",
+)
+
+
+# --- モックサーバー操作 ---
+
+
+def _mock_call(mock_url: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = Request(
+        f"{mock_url}{path}",
+        data=data,
+        method="POST" if data is not None else "GET",
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def _start_mock_server(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.mock_kintone",
+        "--records",
+        str(args.records),
+        "--files",
+        str(args.files),
+        "--file-size",
+        str(args.file_size),
+        "--latency-ms",
+        str(args.latency_ms),
+        "--jitter-ms",
+        str(args.jitter_ms),
+        "--throttle-rate",
+        str(args.throttle_rate),
+        "--max-concurrent",
+        str(args.max_concurrent),
+        "--text-size",
+        str(args.text_size),
+    ]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline() if process.stdout else ""
+    if not line:
+        process.kill()
+        raise RuntimeError("モックサーバーの起動に失敗しました。")
+    return process, json.loads(line)["url"]
+
+
+# --- 子プロセス側: ツールの実行と計測 ---
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _percentile(values: List[float], ratio: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(ratio * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _invoke(tool_class: Any, parameters: Dict[str, Any]) -> List[Any]:
+    from dify_plugin.core.runtime import Session
+    from dify_plugin.entities.tool import ToolRuntime
+
+    tool = tool_class(
+        runtime=ToolRuntime(credentials={}, user_id=None, session_id=None),
+        session=Session.empty_session(),
+    )
+    return list(tool._invoke(parameters))
+
+
+def _messages_of(messages: List[Any], kind: str) -> List[Any]:
+    return [message.message for message in messages if message.type.value == kind]
+
+
+def _summary_total(messages: List[Any]) -> int:
+    for payload in reversed(_messages_of(messages, "json")):
+        summary = payload.json_object.get("summary")
+        if isinstance(summary, dict):
+            return int(summary.get("total_records") or 0)
+    return 0
+
+
+def _scenario_runner(name: str, mock_url: str, args: argparse.Namespace) -> Callable[[int], Tuple[int, bool]]:
+    """シナリオ名から「1回実行して (処理量, 成功か) を返す関数」を組み立てる。"""
+
+    base = {"kintone_domain": mock_url, "kintone_app_id": 1, "kintone_api_token": API_TOKEN}
+
+    if name.startswith("query"):
+        from tools.kintone_query import KintoneTool
+
+        parameters = dict(base)
+        parameters["output_mode"] = "flattened_ndjson" if name == "query_ndjson" else "both"
+        if name == "query_cursor":
+            parameters["pagination_strategy"] = "cursor"
+        elif name == "query_parallel":
+            parameters["pagination_strategy"] = "parallel"
+            parameters["parallel_workers"] = args.parallel_workers
+
+        def run_query(_: int) -> Tuple[int, bool]:
+            total = _summary_total(_invoke(KintoneTool, parameters))
+            return total, total == args.records
+
+        return run_query
+
+    if name == "upsert":
+        from tools.kintone_upsert_records import KintoneUpsertRecordsTool
+
+        def run_upsert(iteration: int) -> Tuple[int, bool]:
+            # 半数は既存レコードの更新、半数は新規追加になるよう updateKey を作る
+            records = []
+            for index in range(args.upsert_records):
+                key = f"レコード {index + 1}" if index % 2 == 0 else f"新規 {iteration}-{index}"
+                records.append(
+                    {
+                        "updateKey": {"field": "title", "value": key},
+                        "record": {"num": {"value": str(index)}},
+                    }
+                )
+            parameters = {
+                **base,
+                "records_data": {"records": records},
+                "parallel_workers": args.parallel_workers,
+            }
+            messages = _invoke(KintoneUpsertRecordsTool, parameters)
+            processed = 0
+            for payload in _messages_of(messages, "json"):
+                result = payload.json_object.get("processed")
+                if isinstance(result, dict):
+                    processed = int(result.get("add", 0)) + int(result.get("updated", 0))
+            return processed, processed == args.upsert_records
+
+        return run_upsert
+
+    if name == "upload":
+        from tools.kintone_upload_file import KintoneUploadFileTool
+
+        payload = os.urandom(args.file_size)
+        upload_file = {
+            "data": base64.b64encode(payload).decode("ascii"),
+            "meta": {"filename": "benchmark.bin", "mime_type": "application/octet-stream"},
+        }
+
+        def run_upload(_: int) -> Tuple[int, bool]:
+            messages = _invoke(KintoneUploadFileTool, {**base, "upload_file": upload_file})
+            uploaded = any(
+                payload.json_object.get("uploaded_files") for payload in _messages_of(messages, "json")
+            )
+            return (args.file_size if uploaded else 0), uploaded
+
+        return run_upload
+
+    if name == "download":
+        from tools.kintone_download_file import KintoneDownloadFileTool
+
+        file_keys = _mock_call(mock_url, "/__mock__/file-keys")["fileKeys"]
+        if not file_keys:
+            raise RuntimeError("download シナリオには --files 1 以上が必要です。")
+
+        def run_download(iteration: int) -> Tuple[int, bool]:
+            file_key = file_keys[iteration % len(file_keys)]
+            messages = _invoke(KintoneDownloadFileTool, {**base, "file_key": file_key})
+            size = 0
+            for message in messages:
+                kind = message.type.value
+                if kind == "blob":
+                    size += len(message.message.blob)
+                elif kind == "blob_chunk":
+                    size += len(message.message.blob)
+            return size, size == args.file_size
+
+        return run_download
+
+    raise ValueError(f"unknown scenario: {name}")
+
+
+def _run_child(name: str, mock_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    sys.path.insert(0, REPO_ROOT)
+    runner = _scenario_runner(name, mock_url, args)
+
+    # 初回は接続確立やインポートの影響を除くためのウォームアップとして計測対象外にする
+    for _ in range(args.warmup):
+        runner(0)
+
+    stats_before = _mock_call(mock_url, "/__mock__/stats")["stats"]
+    latencies: List[float] = []
+    units = 0
+    failures = 0
+    started = time.perf_counter()
+    for iteration in range(args.iterations):
+        begin = time.perf_counter()
+        processed, ok = runner(iteration + 1)
+        latencies.append(time.perf_counter() - begin)
+        units += processed
+        failures += 0 if ok else 1
+    elapsed = time.perf_counter() - started
+    stats_after = _mock_call(mock_url, "/__mock__/stats")["stats"]
+
+    requests_made = stats_after.get("requests", 0) - stats_before.get("requests", 0)
+    return {
+        "scenario": name,
+        "iterations": args.iterations,
+        "failures": failures,
+        "unit": "bytes" if name in {"upload", "download"} else "records",
+        "units": units,
+        "throughput_per_sec": round(units / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "requests": requests_made,
+        "requests_per_iteration": round(requests_made / max(args.iterations, 1), 1),
+        "throttled": stats_after.get("throttled", 0) - stats_before.get("throttled", 0),
+        "peak_inflight": stats_after.get("peak_inflight", 0),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# --- 親プロセス側: シナリオの起動・集計・比較 ---
+
+
+def _child_command(name: str, mock_url: str, argv: List[str]) -> List[str]:
+    return [sys.executable, "-m", "benchmarks.run_benchmarks", *argv, "--child", name, "--mock-url", mock_url]
+
+
+def _compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {item["scenario"]: item for item in json.load(handle).get("results", [])}
+
+    regressions: List[str] = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if not before:
+            continue
+        checks = (
+            ("throughput_per_sec", -1),
+            ("p99_ms", 1),
+            ("requests_per_iteration", 1),
+            ("peak_rss_mb", 1),
+        )
+        for metric, direction in checks:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > tolerance:
+                regressions.append(f"{result['scenario']}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    columns = (
+        ("scenario", 16),
+        ("throughput_per_sec", 14),
+        ("unit", 8),
+        ("p50_ms", 9),
+        ("p99_ms", 9),
+        ("requests_per_iteration", 10),
+        ("throttled", 9),
+        ("peak_rss_mb", 11),
+        ("failures", 8),
+    )
+    headers = ("scenario", "throughput/s", "unit", "p50 ms", "p99 ms", "req/iter", "throttled", "peak RSS MB", "failures")
+    print("  ".join(header.ljust(width) for header, (_, width) in zip(headers, columns)))
+    for result in results:
+        print("  ".join(str(result.get(key, "")).ljust(width) for key, width in columns))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="kintone ツールのベンチマーク")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"カンマ区切り（{', '.join(SCENARIOS)}）")
+    parser.add_argument("--records", type=int, default=5000, help="モックアプリのレコード数")
+    parser.add_argument("--text-size", type=int, default=256, help="本文フィールドのおおよそのバイト数")
+    parser.add_argument("--upsert-records", type=int, default=500, help="upsert シナリオで送信するレコード数")
+    parser.add_argument("--files", type=int, default=4, help="モックに事前登録するファイル数")
+    parser.add_argument("--file-size", type=int, default=4 * 1024 * 1024, help="upload/download のファイルサイズ（バイト）")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--parallel-workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="モックのリクエストごとの遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="429 を返す確率（0〜1）")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="同時処理数の上限（超過分は 429）")
+    parser.add_argument("--output", help="結果をJSONで保存するパス")
+    parser.add_argument("--baseline", help="比較対象の結果JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="劣化とみなす変化率（既定 20%%）")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--mock-url", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    args = _build_parser().parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_run_child(args.child, args.mock_url, args), ensure_ascii=False))
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"未知のシナリオです: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    process, mock_url = _start_mock_server(args)
+    results: List[Dict[str, Any]] = []
+    try:
+        for name in scenarios:
+            # シナリオごとにモックのデータを初期状態へ戻す
+            _mock_call(mock_url, "/__mock__/reset", {})
+            completed = subprocess.run(
+                _child_command(name, mock_url, argv),
+                cwd=REPO_ROOT,
+                capture_output=True,
+                text=True,
+            )
+            lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+            if completed.returncode != 0 or not lines:
+                print(f"[{name}] 失敗しました:\n{completed.stderr[-2000:]}", file=sys.stderr)
+                continue
+            result = json.loads(lines[-1])
+            results.append(result)
+            print(f"[{name}] {result['throughput_per_sec']} {result['unit']}/s, p99 {result['p99_ms']} ms", file=sys.stderr)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    _print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"settings": {key: value for key, value in vars(args).items() if key not in {"child", "mock_url"}}, "results": results},
+                handle,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if args.baseline:
+        regressions = _compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n性能の劣化を検出しました:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nベースラインからの劣化はありません。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# tools / benchmarks をパッケージとして import できるよう、リポジトリのルートを追加する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dify_plugin.entities.tool import ToolInvokeMessage  # noqa: E402
+
+from benchmarks.mock_kintone import MockConfig, MockKintoneServer  # noqa: E402
+
+
+def make_tool(tool_class):
+    """Dify のランタイムなしでツールを呼び出せるインスタンスを作る。"""
+
+    tool = tool_class.__new__(tool_class)
+    tool.response_type = ToolInvokeMessage
+    return tool
+
+
+def json_messages(messages):
+    return [m.message.json_object for m in messages if m.type == ToolInvokeMessage.MessageType.JSON]
+
+
+def text_messages(messages):
+    return [m.message.text for m in messages if m.type == ToolInvokeMessage.MessageType.TEXT]
+
+
+@pytest.fixture
+def mock_server():
+    """レコード20件・添付ファイルなしのモック kintone を起動する。"""
+
+    with MockKintoneServer(MockConfig(records=20, files=0, comments_per_record=0, subtable_rows=1)) as server:
+        yield server
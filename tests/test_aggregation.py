@@ -0,0 +1,122 @@
+import pytest
+
+from tools.aggregation import Aggregator, format_table, parse_aggregations, required_fields
+
+
+def _record(status=None, amount=None, owner=None, rows=()):
+    record = {
+        "status": {"type": "DROP_DOWN", "value": status},
+        "amount": {"type": "NUMBER", "value": amount},
+        "owner": {"type": "USER_SELECT", "value": [{"code": code, "name": code.upper()} for code in owner or []]},
+        "明細": {
+            "type": "SUBTABLE",
+            "value": [{"id": str(index), "value": {"数量": {"type": "NUMBER", "value": str(quantity)}}} for index, quantity in enumerate(rows)],
+        },
+    }
+    return record
+
+
+RECORDS = [
+    _record("完了", "100", ["sato"], rows=(1, 2)),
+    _record("完了", "250.5", ["suzuki"]),
+    _record("進行中", "30", ["sato", "suzuki"], rows=(5,)),
+    _record("進行中", "abc", ["sato"]),
+    _record(None, "", []),
+]
+
+
+def aggregate(records, group_by, aggregations):
+    aggregator = Aggregator(group_by, parse_aggregations(aggregations))
+    aggregator.add_all(records)
+    return aggregator.rows()
+
+
+@pytest.mark.parametrize(
+    ("aggregations", "expected"),
+    [
+        ("count", [{"status": None, "count": 1}, {"status": "完了", "count": 2}, {"status": "進行中", "count": 2}]),
+        ("sum:amount", [{"status": None, "sum(amount)": None}, {"status": "完了", "sum(amount)": 350.5}, {"status": "進行中", "sum(amount)": 30}]),
+        ("avg:amount", [{"status": None, "avg(amount)": None}, {"status": "完了", "avg(amount)": 175.25}, {"status": "進行中", "avg(amount)": 30}]),
+        ("min:amount", [{"status": None, "min(amount)": None}, {"status": "完了", "min(amount)": 100}, {"status": "進行中", "min(amount)": 30}]),
+        ("max:amount", [{"status": None, "max(amount)": None}, {"status": "完了", "max(amount)": 250.5}, {"status": "進行中", "max(amount)": "abc"}]),
+        ("distinct:owner", [{"status": None, "distinct(owner)": 0}, {"status": "完了", "distinct(owner)": 2}, {"status": "進行中", "distinct(owner)": 2}]),
+    ],
+)
+def test_functions_by_group(aggregations, expected):
+    assert aggregate(RECORDS, ["status"], aggregations) == expected
+
+
+def test_without_group_by_returns_one_row():
+    rows = aggregate(RECORDS, [], "count, sum:amount, avg:amount, min(amount), max(amount)")
+
+    assert rows == [
+        {"count": 5, "sum(amount)": 380.5, "avg(amount)": pytest.approx(380.5 / 3), "min(amount)": 30, "max(amount)": "abc"}
+    ]
+
+
+def test_no_records_returns_no_groups():
+    assert aggregate([], ["status"], "count, avg:amount") == []
+    assert aggregate([], [], "count, avg:amount") == []
+
+
+def test_avg_without_numeric_values_is_none():
+    rows = aggregate([_record("完了", "abc"), _record("完了", None)], ["status"], "count, avg:amount, sum:amount")
+
+    assert rows == [{"status": "完了", "count": 2, "avg(amount)": None, "sum(amount)": None}]
+
+
+def test_multi_value_group_key_joins_codes():
+    rows = aggregate(RECORDS, ["owner"], "count")
+
+    assert rows == [
+        {"owner": None, "count": 1},
+        {"owner": "sato", "count": 2},
+        {"owner": "sato, suzuki", "count": 1},
+        {"owner": "suzuki", "count": 1},
+    ]
+
+
+def test_subtable_fields_are_treated_as_blank():
+    # テーブルやテーブル内のフィールドはレコード単位の値を持たないため、空として扱う
+    rows = aggregate(RECORDS, ["明細"], "count, sum:数量, distinct:明細")
+
+    assert rows == [{"明細": None, "count": 5, "sum(数量)": None, "distinct(明細)": 0}]
+
+
+def test_min_and_max_compare_dates_as_strings():
+    records = [{"日付": {"value": value}} for value in ("2025-03-01", "2024-12-31", "2025-01-15")]
+
+    assert aggregate(records, [], "min:日付, max:日付") == [{"min(日付)": "2024-12-31", "max(日付)": "2025-03-01"}]
+
+
+@pytest.mark.parametrize(
+    ("raw", "labels"),
+    [
+        (None, ["count"]),
+        ("", ["count"]),
+        ("COUNT, sum:金額", ["count", "sum(金額)"]),
+        ("max(日付)\ndistinct: 担当者", ["max(日付)", "distinct(担当者)"]),
+        (["avg:amount", "count"], ["avg(amount)", "count"]),
+        ("count(amount)", ["count"]),
+    ],
+)
+def test_parse_aggregations(raw, labels):
+    assert [spec.label for spec in parse_aggregations(raw)] == labels
+
+
+@pytest.mark.parametrize("raw", ["median:amount", "sum", "avg:", {"sum": "amount"}])
+def test_parse_aggregations_rejects_invalid_specs(raw):
+    with pytest.raises(ValueError):
+        parse_aggregations(raw)
+
+
+def test_required_fields_are_unique_and_ordered():
+    specs = parse_aggregations("count, sum:amount, distinct:status, max:amount")
+
+    assert required_fields(["status"], specs) == ["status", "amount"]
+
+
+def test_format_table():
+    rows = [{"status": "完了", "count": 2, "avg(amount)": 175.25}, {"status": None, "count": 1, "avg(amount)": None}]
+
+    assert format_table(rows) == "status: 完了, count: 2, avg(amount): 175.25\nstatus: null, count: 1, avg(amount): null"
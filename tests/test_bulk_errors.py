@@ -0,0 +1,61 @@
+import json
+
+from conftest import json_messages, make_tool, text_messages
+
+from tools.kintone_add_record import KintoneAddRecordTool
+from tools.kintone_upsert_records import KintoneUpsertRecordsTool
+
+
+def _records(count, bad_index):
+    records = [{"title": {"value": f"新規 {index}"}, "num": {"value": str(index)}} for index in range(count)]
+    records[bad_index]["num"] = {"value": "数値ではない"}
+    return records
+
+
+def test_add_transaction_reports_failing_request_index(mock_server):
+    before = len(mock_server.state.records)
+    tool = make_tool(KintoneAddRecordTool)
+
+    messages = list(
+        tool._invoke(
+            {
+                "kintone_domain": mock_server.url,
+                "kintone_api_token": "token",
+                "kintone_app_id": 1,
+                "record_data": json.dumps(_records(250, 150), ensure_ascii=False),
+                "write_mode": "transaction",
+            }
+        )
+    )
+
+    error = json_messages(messages)[-1]["error"]
+    assert error["status"] == 400
+    assert error["failed_request_index"] == 1
+    assert "失敗したリクエスト: 2 件目（レコード番号 100-199、0始まり）" in text_messages(messages)[-1]
+    assert len(mock_server.state.records) == before
+
+
+def test_upsert_transaction_reports_failing_request_index(mock_server):
+    before = len(mock_server.state.records)
+    items = [
+        {"updateKey": {"field": "title", "value": record["title"]["value"]}, "record": {"num": record["num"]}}
+        for record in _records(250, 220)
+    ]
+    tool = make_tool(KintoneUpsertRecordsTool)
+
+    messages = list(
+        tool._invoke(
+            {
+                "kintone_domain": mock_server.url,
+                "kintone_api_token": "token",
+                "kintone_app_id": 1,
+                "records_data": json.dumps({"records": items}, ensure_ascii=False),
+                "write_mode": "transaction",
+            }
+        )
+    )
+
+    error = json_messages(messages)[-1]["error"]
+    assert error["failed_request_index"] == 2
+    assert "失敗したリクエスト: 3 件目（レコード番号 200-249、0始まり）" in text_messages(messages)[-1]
+    assert len(mock_server.state.records) == before
@@ -0,0 +1,45 @@
+from conftest import json_messages, make_tool, text_messages
+
+from benchmarks.mock_kintone import MockConfig, MockKintoneServer
+from tools.kintone_query import KintoneTool
+
+CURSOR_READ = "GET /k/v1/records/cursor.json"
+
+
+def run_cursor_query(server):
+    tool = make_tool(KintoneTool)
+    return list(
+        tool._invoke(
+            {
+                "kintone_domain": server.url,
+                "kintone_api_token": "token",
+                "kintone_app_id": 1,
+                "query": "",
+                "pagination_strategy": "cursor",
+                "output_mode": "flattened_json",
+            }
+        )
+    )
+
+
+def test_cursor_reads_all_pages():
+    with MockKintoneServer(MockConfig(records=1200, files=0, comments_per_record=0)) as server:
+        messages = run_cursor_query(server)
+
+        records = json_messages(messages)[-1]["records"]
+        assert len(records) == 1200
+        assert server.state.stats[CURSOR_READ] == 3
+
+
+def test_dropped_cursor_read_fails_instead_of_skipping_a_page():
+    with MockKintoneServer(MockConfig(records=1200, files=0, comments_per_record=0)) as server:
+        server.state.drop_responses[CURSOR_READ] = 1
+
+        messages = run_cursor_query(server)
+
+        assert server.state.stats["dropped"] == 1
+        # 再送するとカーソルが進んだ後のページを取得してしまうため、再試行せずに失敗する
+        assert server.state.stats[CURSOR_READ] == 1
+        assert not any("records" in payload for payload in json_messages(messages))
+        assert any("kintone" in text for text in text_messages(messages))
+        assert server.state.cursors == {}
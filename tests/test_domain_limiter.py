@@ -0,0 +1,76 @@
+import gc
+
+from benchmarks.mock_kintone import MockConfig, MockKintoneServer
+from tools.common import DomainLimiter, KintoneClient, build_headers
+
+
+def _slot_free(limiter):
+    if limiter._semaphore.acquire(blocking=False):
+        limiter._semaphore.release()
+        return True
+    return False
+
+
+def _client(server):
+    client = KintoneClient(server.url)
+    client.limiter = DomainLimiter(1)
+    return client
+
+
+def _get_file(client, server, **kwargs):
+    file_key = next(iter(server.state.files))
+    return client.get(
+        f"{server.url}/k/v1/file.json",
+        headers=build_headers("token", content_type=None),
+        params={"fileKey": file_key},
+        timeout=10,
+        **kwargs,
+    )
+
+
+def test_streamed_response_holds_the_slot_until_closed():
+    with MockKintoneServer(MockConfig(records=1, files=1, file_size=256 * 1024)) as server:
+        client = _client(server)
+
+        response = _get_file(client, server, stream=True)
+        assert not _slot_free(client.limiter)
+
+        assert len(b"".join(response.iter_content(64 * 1024))) == 256 * 1024
+        assert not _slot_free(client.limiter)
+
+        response.close()
+        assert _slot_free(client.limiter)
+        # 2回目の close で枠を二重に返却しない
+        response.close()
+        assert client.limiter._semaphore._value == 1
+
+
+def test_streamed_response_used_as_context_manager_releases_the_slot():
+    with MockKintoneServer(MockConfig(records=1, files=1, file_size=1024)) as server:
+        client = _client(server)
+
+        with _get_file(client, server, stream=True) as response:
+            response.raise_for_status()
+            assert not _slot_free(client.limiter)
+
+        assert _slot_free(client.limiter)
+
+
+def test_discarded_streamed_response_releases_the_slot():
+    with MockKintoneServer(MockConfig(records=1, files=1, file_size=1024)) as server:
+        client = _client(server)
+
+        _get_file(client, server, stream=True)
+        gc.collect()
+
+        assert _slot_free(client.limiter)
+
+
+def test_buffered_response_releases_the_slot_immediately():
+    with MockKintoneServer(MockConfig(records=1, files=1, file_size=1024)) as server:
+        client = _client(server)
+
+        response = _get_file(client, server)
+
+        assert response.content
+        assert _slot_free(client.limiter)
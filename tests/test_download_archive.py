@@ -0,0 +1,61 @@
+import os
+
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from tools.file_references import FileReference
+from tools.kintone_download_file import KintoneDownloadFileTool
+from tools.upload_stream import BytesSource
+
+
+def _run_batch(file_sizes, max_file_size):
+    tool = KintoneDownloadFileTool.__new__(KintoneDownloadFileTool)
+    tool.response_type = ToolInvokeMessage
+
+    def download_one(client, url, headers, reference, timeout_seconds, max_size):
+        # 圧縮が効かないよう乱数のデータを返す
+        return {
+            "file_key": reference.file_key,
+            "file_name": f"{reference.file_key}.bin",
+            "record_id": None,
+            "field_code": None,
+            "mime_type": "application/octet-stream",
+            "size": file_sizes[reference.file_key],
+            "status": "success",
+            "source": BytesSource(os.urandom(file_sizes[reference.file_key])),
+        }
+
+    tool._download_one = download_one
+    references = [FileReference(file_key) for file_key in file_sizes]
+    return list(
+        tool._invoke_batch(
+            "https://example.cybozu.com",
+            "token",
+            references,
+            output_format="zip",
+            parallel_workers=2,
+            timeout_seconds=10,
+            max_file_size=max_file_size,
+        )
+    )
+
+
+def _texts(messages):
+    return [m.message.text for m in messages if m.type == ToolInvokeMessage.MessageType.TEXT]
+
+
+def _blob_chunks(messages):
+    return [m for m in messages if m.type == ToolInvokeMessage.MessageType.BLOB_CHUNK]
+
+
+def test_zip_within_budget_is_returned():
+    messages = _run_batch({"a": 100_000, "b": 100_000}, max_file_size=1024 * 1024)
+
+    assert _blob_chunks(messages)
+    assert not any("ZIP ファイルのサイズが上限" in text for text in _texts(messages))
+
+
+def test_zip_over_budget_is_rejected():
+    messages = _run_batch({"a": 400_000, "b": 400_000, "c": 400_000}, max_file_size=1024 * 1024)
+
+    assert not _blob_chunks(messages)
+    assert any("ZIP ファイルのサイズが上限" in text for text in _texts(messages))
@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from tools.file_references import FileReference
+from tools.kintone_download_file import KintoneDownloadFileTool
+from tools.upload_stream import BytesSource
+
+
+class TrackedSource(BytesSource):
+    def __init__(self, data, tracker):
+        super().__init__(data)
+        self.tracker = tracker
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.tracker.release()
+
+
+class Tracker:
+    """書き出したまま送信していない（close していない）一時領域の数を数える。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.held = 0
+        self.peak = 0
+        self.created = 0
+
+    def hold(self):
+        with self.lock:
+            self.held += 1
+            self.created += 1
+            self.peak = max(self.peak, self.held)
+
+    def release(self):
+        with self.lock:
+            self.held -= 1
+
+
+def _tool(tracker):
+    tool = KintoneDownloadFileTool.__new__(KintoneDownloadFileTool)
+    tool.response_type = ToolInvokeMessage
+
+    def download_one(client, url, headers, reference, timeout_seconds, max_size):
+        time.sleep(0.005)
+        tracker.hold()
+        return {
+            "file_key": reference.file_key,
+            "file_name": f"{reference.file_key}.bin",
+            "record_id": None,
+            "field_code": None,
+            "mime_type": "application/octet-stream",
+            "size": 10,
+            "status": "success",
+            "source": TrackedSource(reference.file_key.encode().ljust(10, b"."), tracker),
+        }
+
+    tool._download_one = download_one
+    return tool
+
+
+def _run(tool, count, output_format):
+    return tool._invoke_batch(
+        "https://example.cybozu.com",
+        "token",
+        [FileReference(f"key{index:03d}") for index in range(count)],
+        output_format=output_format,
+        parallel_workers=3,
+        timeout_seconds=10,
+        max_file_size=1024 * 1024,
+    )
+
+
+@pytest.mark.parametrize("output_format", ["blobs", "zip"])
+def test_batch_holds_at_most_parallel_workers_spools(output_format):
+    tracker = Tracker()
+    messages = []
+    for message in _run(_tool(tracker), 40, output_format):
+        messages.append(message)
+        # Dify への送信が遅い場合も、先行するダウンロードは枠の数までに抑えられる
+        time.sleep(0.001)
+
+    assert tracker.created == 40
+    assert tracker.peak <= 3
+    assert tracker.held == 0
+    payload = [m.message.json_object for m in messages if m.type == ToolInvokeMessage.MessageType.JSON][-1]
+    assert [item["file_key"] for item in payload["files"]] == [f"key{index:03d}" for index in range(40)]
+
+
+def test_closing_the_batch_early_releases_every_spool():
+    tracker = Tracker()
+    messages = _run(_tool(tracker), 40, "blobs")
+
+    for message in messages:
+        if message.type == ToolInvokeMessage.MessageType.BLOB_CHUNK:
+            break
+    messages.close()
+
+    assert tracker.created < 40
+    assert tracker.held == 0
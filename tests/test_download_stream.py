@@ -0,0 +1,34 @@
+import pytest
+
+from tools.download_stream import (
+    DEFAULT_MAX_DOWNLOAD_BYTES,
+    HOST_MAX_FILE_BYTES,
+    MAX_DOWNLOAD_BYTES_ENV,
+    DownloadLimitError,
+    resolve_max_download_bytes,
+)
+
+
+def test_parameter_up_to_host_limit_is_accepted():
+    assert resolve_max_download_bytes(30) == HOST_MAX_FILE_BYTES
+    assert resolve_max_download_bytes("2.5") == int(2.5 * 1024 * 1024)
+
+
+def test_parameter_over_host_limit_is_rejected():
+    with pytest.raises(DownloadLimitError):
+        resolve_max_download_bytes(31)
+
+
+def test_env_over_host_limit_is_rejected(monkeypatch):
+    monkeypatch.setenv(MAX_DOWNLOAD_BYTES_ENV, str(HOST_MAX_FILE_BYTES + 1))
+
+    with pytest.raises(DownloadLimitError):
+        resolve_max_download_bytes()
+    # パラメータを指定した場合は環境変数を参照しない
+    assert resolve_max_download_bytes(1) == 1024 * 1024
+
+
+def test_env_default(monkeypatch):
+    monkeypatch.delenv(MAX_DOWNLOAD_BYTES_ENV, raising=False)
+
+    assert resolve_max_download_bytes() == DEFAULT_MAX_DOWNLOAD_BYTES
@@ -0,0 +1,202 @@
+import copy
+import json
+
+import pytest
+from conftest import json_messages, make_tool
+
+from tools.flattening import ColumnBuilder, RecordFlattener
+from tools.kintone_flatten_json import KintoneFlattenJsonTool
+from tools.kintone_query import KintoneTool
+
+
+# --- 共有エンジン導入前の kintone_flatten_json の変換処理（比較の基準） ---
+
+
+def _legacy_extract_value(field_data):
+    if isinstance(field_data, dict) and "value" in field_data:
+        return field_data["value"]
+    return field_data
+
+
+def _legacy_flatten_subtable(field_data):
+    rows = field_data.get("value", []) if isinstance(field_data, dict) else field_data
+    if not isinstance(rows, list):
+        return field_data
+    flattened_rows = []
+    for row in rows:
+        if not isinstance(row, dict):
+            flattened_rows.append(row)
+            continue
+        flattened_row = {}
+        for key, value in row.items():
+            if key == "value" and isinstance(value, dict):
+                for sub_field_code, sub_field_data in value.items():
+                    flattened_row[sub_field_code] = _legacy_extract_value(sub_field_data)
+            else:
+                flattened_row[key] = value
+        flattened_rows.append(flattened_row)
+    return flattened_rows
+
+
+def _legacy_flatten_field(field_data):
+    if isinstance(field_data, dict) and field_data.get("type") == "SUBTABLE":
+        return _legacy_flatten_subtable(field_data)
+    extracted = _legacy_extract_value(field_data)
+    if isinstance(extracted, list) and any(isinstance(row, dict) and "value" in row for row in extracted):
+        return _legacy_flatten_subtable(extracted)
+    return extracted
+
+
+def _legacy_flatten_records(records, fields_filter=None):
+    result = []
+    for record in records:
+        if not isinstance(record, dict):
+            result.append(record)
+            continue
+        flattened = {code: _legacy_flatten_field(data) for code, data in record.items()}
+        if fields_filter:
+            flattened = {code: flattened[code] for code in fields_filter if code in flattened}
+        result.append(flattened)
+    return result
+
+
+def _legacy_collect_subtable_rows(records, subtable_field_code, fields_filter=None):
+    collected_rows = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        field_data = record.get(subtable_field_code)
+        if field_data is None:
+            continue
+        rows = _legacy_flatten_subtable(field_data)
+        if isinstance(rows, list):
+            parent_field_values = {}
+            if fields_filter:
+                flattened_parent = _legacy_flatten_records([record])[0]
+                parent_field_values = {code: flattened_parent[code] for code in fields_filter if code in flattened_parent}
+            for row in rows:
+                if not fields_filter:
+                    collected_rows.append(row)
+                    continue
+                filtered_row = dict(row) if isinstance(row, dict) else {"value": row}
+                for code in fields_filter:
+                    if code in parent_field_values:
+                        filtered_row[code] = parent_field_values[code]
+                collected_rows.append(filtered_row)
+    return collected_rows
+
+
+def _transpose(rows):
+    """行形式の結果を列形式へ素朴に変換する（ColumnBuilder の比較用）。"""
+
+    rows = [row if isinstance(row, dict) else {"value": row} for row in rows]
+    codes = []
+    for row in rows:
+        codes.extend(code for code in row if code not in codes)
+    return {"row_count": len(rows), "columns": {code: [row.get(code) for row in rows] for code in codes}}
+
+
+# --- フィクスチャ ---
+
+
+def _api_record(record_id, rows):
+    return {
+        "$id": {"type": "__ID__", "value": str(record_id)},
+        "title": {"type": "SINGLE_LINE_TEXT", "value": f"レコード {record_id}"},
+        "num": {"type": "NUMBER", "value": str(record_id * 10)},
+        "担当者": {"type": "USER_SELECT", "value": [{"code": "sato", "name": "佐藤"}]},
+        "明細": {
+            "type": "SUBTABLE",
+            "value": [
+                {
+                    "id": str(record_id * 100 + index),
+                    "value": {
+                        "品名": {"type": "SINGLE_LINE_TEXT", "value": f"品目{index}"},
+                        "数量": {"type": "NUMBER", "value": str(index + 1)},
+                    },
+                }
+                for index in range(rows)
+            ],
+        },
+    }
+
+
+def _fixture():
+    records = [_api_record(record_id, rows) for record_id, rows in ((1, 2), (2, 0), (3, 3))]
+    # 型情報のない値だけのフィールドと、型情報のないテーブル
+    records.append({"$id": {"value": "4"}, "title": "plain", "明細": [{"id": "1", "value": {"品名": {"value": "x"}}}]})
+    # 計画と同じフィールド構成だが、value が欠けたフィールドと余分なキーを持つテーブル行
+    irregular = _api_record(5, 1)
+    del irregular["num"]["value"]
+    irregular["明細"]["value"][0]["extra"] = True
+    records.append(irregular)
+    # テーブルの行が辞書でない、または value を持たない
+    odd = _api_record(6, 0)
+    odd["明細"]["value"] = ["raw", {"id": "9"}]
+    records.append(odd)
+    records.append("not a record")
+    return records
+
+
+@pytest.mark.parametrize("fields", [None, ["明細", "title", "missing"], ["num"]])
+def test_record_flattener_matches_legacy(fields):
+    records = _fixture()
+    expected = _legacy_flatten_records(copy.deepcopy(records), fields)
+
+    assert RecordFlattener(fields).flatten_all(records) == expected
+    # 2回目以降はコンパイル済みの計画を使う
+    flattener = RecordFlattener(fields)
+    flattener.flatten_all(records)
+    assert flattener.flatten_all(records) == expected
+
+
+def test_column_builder_matches_transposed_rows():
+    rows = _legacy_flatten_records(_fixture())
+    builder = ColumnBuilder()
+    builder.extend(RecordFlattener().flatten_all(_fixture()))
+
+    assert builder.to_dict() == _transpose(rows)
+
+
+def run_flatten_tool(**parameters):
+    tool = make_tool(KintoneFlattenJsonTool)
+    messages = list(tool._invoke({"records_json": json.dumps({"records": _fixture()}, ensure_ascii=False), **parameters}))
+    return json_messages(messages)[-1]
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {},
+        {"fields": "title, 明細, title"},
+        {"subtable_field_code": "明細"},
+        {"subtable_field_code": "明細", "fields": "title,num"},
+    ],
+)
+def test_flatten_tool_matches_legacy(parameters):
+    fields = [code.strip() for code in parameters.get("fields", "").split(",") if code.strip()]
+    fields = list(dict.fromkeys(fields)) or None
+    if "subtable_field_code" in parameters:
+        expected = _legacy_collect_subtable_rows(_fixture(), parameters["subtable_field_code"], fields)
+    else:
+        expected = _legacy_flatten_records(_fixture(), fields)
+
+    assert run_flatten_tool(**parameters) == {"records": expected}
+    assert run_flatten_tool(output_layout="columns", **parameters) == _transpose(expected)
+
+
+def test_query_flattened_output_matches_legacy(mock_server):
+    parameters = {
+        "kintone_domain": mock_server.url,
+        "kintone_api_token": "token",
+        "kintone_app_id": 1,
+        "query": "order by $id asc",
+    }
+    tool = make_tool(KintoneTool)
+    raw = json_messages(list(tool._invoke({**parameters, "output_mode": "both"})))[-1]["records"]
+    flattened = json_messages(list(tool._invoke({**parameters, "output_mode": "flattened_json"})))[-1]["records"]
+    columnar = json_messages(list(tool._invoke({**parameters, "output_mode": "columnar_json"})))[-1]
+
+    assert any(record["明細"]["value"] for record in raw)
+    assert flattened == _legacy_flatten_records(raw)
+    assert {"row_count": columnar["row_count"], "columns": columnar["columns"]} == _transpose(flattened)
@@ -0,0 +1,42 @@
+from benchmarks.mock_kintone import MockConfig, MockKintoneState
+from tools.kintone_query import KintoneTool
+from tools.sync_state import Watermark
+
+
+def _state_with_times(times):
+    state = MockKintoneState(MockConfig(records=len(times), files=0, comments_per_record=0))
+    for record_id, updated_time in enumerate(times, start=1):
+        state.records[record_id]["更新日時"] = {"type": "UPDATED_TIME", "value": updated_time}
+    return state
+
+
+def _sync(state, since, limit=500):
+    tool = KintoneTool.__new__(KintoneTool)
+    stats = {}
+
+    def fetch(query):
+        return {"records": state.select(query, None)[0]}
+
+    pages = tool._iter_incremental_pages(fetch, "", limit, "更新日時", since, stats)
+    ids = [int(record["$id"]["value"]) for records, _ in pages for record in records]
+    return ids, stats.get("watermark")
+
+
+def test_lower_id_updated_within_watermark_minute_is_picked_up():
+    state = _state_with_times(["2025-01-01T00:00:00Z", "2025-01-01T00:00:00Z", "2025-01-01T00:01:00Z"])
+    ids, watermark = _sync(state, None)
+    assert ids == [1, 2, 3]
+    assert watermark == Watermark("2025-01-01T00:01:00Z", 0)
+
+    # 更新日時は分単位のため、同じ分のうちに $id の小さいレコードが更新されると同じ日時になる
+    state.records[2]["更新日時"] = {"type": "UPDATED_TIME", "value": "2025-01-01T00:01:00Z"}
+    ids, watermark = _sync(state, watermark)
+    assert ids == [2, 3]
+    assert watermark == Watermark("2025-01-01T00:01:00Z", 0)
+
+
+def test_pages_within_a_run_do_not_repeat_records_of_the_same_minute():
+    state = _state_with_times(["2025-01-01T00:01:00Z"] * 5)
+    ids, watermark = _sync(state, None, limit=2)
+    assert ids == [1, 2, 3, 4, 5]
+    assert watermark == Watermark("2025-01-01T00:01:00Z", 0)
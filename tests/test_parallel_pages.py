@@ -0,0 +1,52 @@
+import threading
+import time
+
+from benchmarks.mock_kintone import MockConfig, MockKintoneState
+from tools import kintone_query
+from tools.kintone_query import KintoneTool
+
+
+def _iter_parallel(state, fetch_delay, limit=10, workers=4):
+    tool = KintoneTool.__new__(KintoneTool)
+    lock = threading.Lock()
+    progress = {"fetched": 0, "yielded": 0, "max_ahead": 0}
+
+    def fetch(query, projection=None):
+        fetch_delay(query)
+        records = state.select(query, projection)[0]
+        if records:
+            with lock:
+                progress["fetched"] += 1
+        return {"records": records}
+
+    pages = tool._iter_parallel_pages(fetch, "", limit, workers, {})
+    ids = []
+    for records, _ in pages:
+        with lock:
+            # 境界値の取得（2回）を除いた、読み手より先に取得済みのページ数
+            ahead = progress["fetched"] - 2 - progress["yielded"]
+            progress["max_ahead"] = max(progress["max_ahead"], ahead)
+            progress["yielded"] += 1
+        ids.extend(int(record["$id"]["value"]) for record in records)
+    return ids, progress
+
+
+def test_parallel_pages_are_returned_in_id_order():
+    state = MockKintoneState(MockConfig(records=437, files=0, comments_per_record=0))
+    ids, _ = _iter_parallel(state, lambda query: None)
+    assert ids == list(range(1, 438))
+
+
+def test_parallel_pages_buffer_is_bounded_behind_a_slow_window():
+    state = MockKintoneState(MockConfig(records=2000, files=0, comments_per_record=0))
+
+    def slow_first_window(query):
+        # 先頭の区間だけ遅くし、後続の区間が先に完了する状況を作る
+        if "$id > 0 and" in query:
+            time.sleep(0.3)
+
+    workers = 4
+    ids, progress = _iter_parallel(state, slow_first_window, workers=workers)
+    assert ids == list(range(1, 2001))
+    # 取得中のページを含めても、区間ごとの先読み上限 × ワーカー数を超えて保持しない
+    assert progress["max_ahead"] <= workers * (kintone_query._WINDOW_BUFFER_PAGES + 1)
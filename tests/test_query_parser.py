@@ -0,0 +1,134 @@
+import pytest
+
+from tools.query_parser import QuerySyntaxError, parse_query, split_query, tokenize
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("num >= 10", [("word", "num"), ("op", ">="), ("word", "10")]),
+        ('a != "x y"', [("word", "a"), ("op", "!="), ("string", '"x y"')]),
+        ('a in ("1","2")', [("word", "a"), ("word", "in"), ("lparen", "("), ("string", '"1"'), ("comma", ","), ("string", '"2"'), ("rparen", ")")]),
+        ('title = "say \\"hi\\""', [("word", "title"), ("op", "="), ("string", '"say \\"hi\\""')]),
+        ("作成者 in (LOGINUSER())", [("word", "作成者"), ("word", "in"), ("lparen", "("), ("word", "LOGINUSER"), ("lparen", "("), ("rparen", ")"), ("rparen", ")")]),
+    ],
+)
+def test_tokenize(query, expected):
+    assert [(token.kind, token.text) for token in tokenize(query)] == expected
+
+
+def test_tokenize_rejects_unclosed_string():
+    with pytest.raises(QuerySyntaxError):
+        tokenize('title = "open')
+
+
+@pytest.mark.parametrize(
+    ("query", "condition", "order_by", "limit", "offset"),
+    [
+        ("", None, [], None, None),
+        ("num > 1", "Comparison('num', '>', '1')", [], None, None),
+        (
+            'a = "1" and b = "2" or c = "3"',
+            "BoolOp('or', [BoolOp('and', [Comparison('a', '=', '1'), Comparison('b', '=', '2')]), Comparison('c', '=', '3')])",
+            [],
+            None,
+            None,
+        ),
+        (
+            'a = "1" and (b = "2" or c = "3")',
+            "BoolOp('and', [Comparison('a', '=', '1'), BoolOp('or', [Comparison('b', '=', '2'), Comparison('c', '=', '3')])])",
+            [],
+            None,
+            None,
+        ),
+        ('status not in ("完了", "保留")', "Comparison('status', 'not in', ['完了', '保留'])", [], None, None),
+        ('title not like "x"', "Comparison('title', 'not like', 'x')", [], None, None),
+        ("添付 is not empty", "EmptyCheck('添付', negated=True)", [], None, None),
+        ("日付 = TODAY()", "Comparison('日付', '=', TODAY())", [], None, None),
+        ('日付 > FROM_TODAY(-7, "DAYS")', "Comparison('日付', '>', FROM_TODAY(-7, DAYS))", [], None, None),
+        ('title = "limit"', "Comparison('title', '=', 'limit')", [], None, None),
+        ('title = "a \\"and\\" b"', "Comparison('title', '=', 'a \"and\" b')", [], None, None),
+        ("order by num desc, $id", None, [("num", "desc"), ("$id", "asc")], None, None),
+        (
+            'Title like "limit 5" limit 10 offset 3',
+            "Comparison('Title', 'like', 'limit 5')",
+            [],
+            10,
+            3,
+        ),
+        ("num > 1 ORDER BY num ASC LIMIT 5", "Comparison('num', '>', '1')", [("num", "asc")], 5, None),
+    ],
+)
+def test_parse_query(query, condition, order_by, limit, offset):
+    parsed = parse_query(query)
+
+    assert (repr(parsed.condition) if parsed.condition is not None else None) == condition
+    assert parsed.order_by == order_by
+    assert parsed.limit == limit
+    assert parsed.offset == offset
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        'title = "a \\"b\\""',
+        'a = "1" and (b = "2" or c in ("3", "4"))',
+        "日付 >= FROM_TODAY(-7, DAYS) order by 日付 desc limit 5 offset 10",
+    ],
+)
+def test_parse_query_round_trips(query):
+    parsed = parse_query(query)
+
+    assert repr(parse_query(parsed.to_query())) == repr(parsed)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "num >",
+        "num ~ 1",
+        "and num > 1",
+        "(num > 1",
+        "num > 1 order num",
+        "num > 1 limit x",
+        "a not between 1",
+        "a is blank",
+    ],
+)
+def test_parse_query_rejects_invalid_syntax(query):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+
+@pytest.mark.parametrize(
+    ("query", "condition", "order_by", "limit", "offset"),
+    [
+        ("num > 1 limit 10 offset 3", "num > 1", "", 10, 3),
+        ('Title like "limit 5" limit 10 offset 3', 'Title like "limit 5"', "", 10, 3),
+        ("num > 1 and", "num > 1", "", None, None),
+        ("num > 1 or limit 5", "num > 1", "", 5, None),
+        ("num > 1 and order by num desc", "num > 1", "num desc", None, None),
+        ('a = "offset 3" order by $id asc limit 2', 'a = "offset 3"', "$id asc", 2, None),
+        ("a in (limit, 5) limit 1", "a in (limit, 5)", "", 1, None),
+        ('title = "say \\"limit 1\\"" limit 4', 'title = "say \\"limit 1\\""', "", 4, None),
+        ("num   >   1    limit 5", "num > 1", "", 5, None),
+        ("limit 20", "", "", 20, None),
+        ('title = "open limit 5', 'title = "open limit 5', "", None, None),
+    ],
+)
+def test_split_query(query, condition, order_by, limit, offset):
+    clauses = split_query(query)
+
+    assert (clauses.condition, clauses.order_by, clauses.limit, clauses.offset) == (condition, order_by, limit, offset)
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("", "num > 1"),
+        ("a = 1 or b = 2", "(a = 1 or b = 2) and num > 1"),
+        ("a = 1 order by a desc limit 3", "(a = 1) and num > 1 order by a desc"),
+    ],
+)
+def test_with_condition_wraps_the_original_condition(query, expected):
+    assert split_query(query).with_condition("num > 1") == expected
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from tools.kintone_query import KintoneTool
+from tools.query_planner import plan_pagination
+
+
+def test_auto_does_not_choose_parallel_without_workers():
+    plan = plan_pagination(5000, has_order_by=False, has_offset=False)
+
+    assert plan.strategy == "record_id"
+    assert "parallel" not in plan.costs
+
+
+def test_auto_chooses_parallel_with_explicit_workers():
+    plan = plan_pagination(5000, has_order_by=False, has_offset=False, parallel_workers=4)
+
+    assert plan.strategy == "parallel"
+
+
+def test_plan_query_passes_through_missing_workers():
+    tool = KintoneTool.__new__(KintoneTool)
+    tool._call_api = lambda *args, **kwargs: {"records": [], "totalCount": "5000"}
+    client = SimpleNamespace(base_url="https://example.cybozu.com")
+
+    plan = tool._plan_query(
+        client=client,
+        api_token="token",
+        app_id=1,
+        clean_query="",
+        has_order_by=False,
+        has_offset=False,
+        initial_offset=0,
+        parallel_workers=None,
+        timeout_seconds=10,
+    )
+
+    assert plan.strategy == "record_id"
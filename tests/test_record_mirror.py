@@ -0,0 +1,134 @@
+import pytest
+
+from conftest import json_messages, make_tool
+
+from tools import record_mirror
+from tools.kintone_query import KintoneTool
+from tools.query_parser import parse_query
+from tools.record_mirror import RecordMirror, select_records
+
+
+def _record(record_id, num):
+    return {"$id": {"type": "__ID__", "value": str(record_id)}, "num": {"type": "NUMBER", "value": str(num)}}
+
+
+def _ids(records):
+    return [int(record["$id"]["value"]) for record in records]
+
+
+def test_select_streams_in_id_order_and_stops_at_limit(tmp_path):
+    mirror = RecordMirror(db_path=str(tmp_path / "mirror.sqlite3"))
+    mirror.apply_page("key", [_record(record_id, record_id % 7) for record_id in range(1, 2001)], None)
+    read = []
+
+    def counting(records):
+        for record in records:
+            read.append(record)
+            yield record
+
+    selected = select_records(
+        counting(mirror.iter_records("key", descending=True)), parse_query("num > 3").with_paging(5, 2)
+    )
+
+    assert _ids(selected) == [1994, 1993, 1992, 1987, 1986]
+    assert len(read) < 20
+
+
+def test_select_with_order_by_matches_full_sort(tmp_path):
+    records = [_record(record_id, (record_id * 37) % 11) for record_id in range(1, 301)]
+    parsed = parse_query("num >= 2 order by num desc").with_paging(10, 5)
+
+    selected = select_records(iter(records), parsed)
+
+    expected = sorted((r for r in records if int(r["num"]["value"]) >= 2), key=lambda r: -int(r["num"]["value"]))
+    assert _ids(selected) == _ids(expected[5:15])
+
+
+def test_mirror_requires_file_path(mock_server, monkeypatch):
+    monkeypatch.delenv(record_mirror.MIRROR_PATH_ENV, raising=False)
+    tool = make_tool(KintoneTool)
+
+    messages = list(
+        tool._invoke(
+            {
+                "kintone_domain": mock_server.url,
+                "kintone_api_token": "token",
+                "kintone_app_id": 1,
+                "query": "num > 100",
+                "use_mirror": True,
+                "output_mode": "flattened_json",
+            }
+        )
+    )
+
+    summary = json_messages(messages)[-1]
+    assert summary["summary"]["pagination_strategy"] != "mirror"
+    assert any(m.message.label == "Mirror fallback" for m in messages if m.type.value == "log")
+
+
+def run_query(server, query, **extra):
+    tool = make_tool(KintoneTool)
+    parameters = {
+        "kintone_domain": server.url,
+        "kintone_api_token": "token",
+        "kintone_app_id": 1,
+        "query": query,
+        "output_mode": "both",
+        **extra,
+    }
+    messages = list(tool._invoke(parameters))
+    return json_messages(messages)[-1], messages
+
+
+def test_mirror_matches_kintone(mock_server, monkeypatch, tmp_path):
+    monkeypatch.setenv(record_mirror.MIRROR_PATH_ENV, str(tmp_path / "mirror.sqlite3"))
+    query = "num > 3000 order by num desc limit 5 offset 2"
+
+    direct, _ = run_query(mock_server, query)
+    mirrored, _ = run_query(mock_server, query, use_mirror=True)
+
+    assert mirrored["summary"]["pagination_strategy"] == "mirror"
+    assert _ids(mirrored["records"]) == _ids(direct["records"])
+
+
+def _fell_back(messages):
+    return any(m.message.label == "Mirror fallback" for m in messages if m.type.value == "log")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        'title like "レコード 1"',
+        'title not like "レコード 1" order by $id asc',
+        '更新日時 > "2025-01-01" order by $id asc',
+        '作成日時 = "2025-01-01"',
+    ],
+)
+def test_mirror_defers_to_kintone_when_semantics_differ(mock_server, monkeypatch, tmp_path, query):
+    monkeypatch.setenv(record_mirror.MIRROR_PATH_ENV, str(tmp_path / "mirror.sqlite3"))
+
+    direct, _ = run_query(mock_server, query)
+    mirrored, messages = run_query(mock_server, query, use_mirror=True)
+
+    assert _fell_back(messages)
+    assert mirrored["summary"]["pagination_strategy"] != "mirror"
+    assert _ids(mirrored["records"]) == _ids(direct["records"])
+
+
+@pytest.mark.parametrize(
+    "query",
+    ['作成日時 = TODAY()', 'num > 1 and 作成者 in (LOGINUSER())', 'title like "a" or num > 1'],
+)
+def test_unsupported_reason_rejects_functions_and_like(query):
+    assert record_mirror.unsupported_reason(parse_query(query).condition)
+
+
+def test_unsupported_reason_accepts_plain_comparisons():
+    assert record_mirror.unsupported_reason(parse_query('num > 1 and title in ("a", "b")').condition) is None
+
+
+def test_date_only_literal_on_datetime_field_is_not_evaluated():
+    record = {"更新日時": {"type": "UPDATED_TIME", "value": "2025-01-01T15:00:00Z"}}
+
+    with pytest.raises(record_mirror.MirrorQueryError):
+        record_mirror.matches(record, parse_query('更新日時 = "2025-01-02"').condition)
@@ -0,0 +1,101 @@
+import json
+
+from conftest import json_messages, make_tool, text_messages
+
+from tools.kintone_query import KintoneTool
+from tools.result_cache import QueryResultCache
+
+
+def test_entry_keeps_resolved_strategy():
+    cache = QueryResultCache()
+    pages = [([{"$id": {"value": "1"}}], 0)]
+
+    assert cache.put("key", pages, {"total_count": 1}, 10, strategy="record_id")
+
+    entry = cache.get("key")
+    assert entry is not None
+    assert entry.strategy == "record_id"
+    assert entry.pages == pages
+
+
+def test_entry_without_strategy():
+    cache = QueryResultCache()
+    cache.put("key", [], {}, 0)
+
+    assert cache.get("key").strategy is None
+
+
+def run_query(server, **extra):
+    tool = make_tool(KintoneTool)
+    parameters = {
+        "kintone_domain": server.url,
+        "kintone_api_token": "token",
+        "kintone_app_id": 1,
+        "query": "num > 1000 order by $id asc",
+        "use_result_cache": True,
+        **extra,
+    }
+    messages = list(tool._invoke(parameters))
+    return json_messages(messages)[-1], messages
+
+
+def test_ndjson_reads_the_cache_but_does_not_store_pages(mock_server):
+    first, _ = run_query(mock_server, output_mode="ndjson")
+    second, _ = run_query(mock_server, output_mode="ndjson")
+
+    assert first["summary"]["result_cache"]["status"] == "miss"
+    assert second["summary"]["result_cache"]["status"] == "miss"
+
+    stored, _ = run_query(mock_server, output_mode="both")
+    replayed, messages = run_query(mock_server, output_mode="ndjson")
+
+    assert stored["summary"]["result_cache"]["status"] == "miss"
+    assert stored["records"]
+    assert replayed["summary"]["result_cache"]["status"] == "hit"
+    lines = "".join(text_messages(messages)).splitlines()
+    assert [json.loads(line)["$id"]["value"] for line in lines] == [
+        record["$id"]["value"] for record in stored["records"]
+    ]
+
+
+def _groups(payload):
+    return {row["status"]: row for row in payload["groups"]}
+
+
+def test_aggregate_and_full_records_are_cached_separately(mock_server):
+    direct, _ = run_query(mock_server, output_mode="both", use_result_cache=False)
+    aggregate = {"output_mode": "aggregate", "group_by": "status", "aggregations": "count,sum:num"}
+
+    first_groups, _ = run_query(mock_server, **aggregate)
+    full, _ = run_query(mock_server, output_mode="both")
+    second_groups, _ = run_query(mock_server, **aggregate)
+    full_again, _ = run_query(mock_server, output_mode="both")
+
+    # aggregate は集計に必要なフィールドだけを取得するため、全フィールドの結果とは別に保存される
+    assert first_groups["summary"]["result_cache"]["status"] == "miss"
+    assert full["summary"]["result_cache"]["status"] == "miss"
+    assert second_groups["summary"]["result_cache"]["status"] == "hit"
+    assert full_again["summary"]["result_cache"]["status"] == "hit"
+    assert full["records"] == direct["records"]
+    assert full_again["records"] == direct["records"]
+    assert _groups(second_groups) == _groups(first_groups)
+    expected_counts = {}
+    for record in direct["records"]:
+        status = record["status"]["value"]
+        expected_counts[status] = expected_counts.get(status, 0) + 1
+    assert {status: row["count"] for status, row in _groups(second_groups).items()} == expected_counts
+
+
+def test_compact_profile_is_cached_separately_from_full_records(mock_server):
+    full, _ = run_query(mock_server, output_mode="both")
+    compact, _ = run_query(mock_server, output_mode="both", field_profile="compact")
+    compact_again, _ = run_query(mock_server, output_mode="both", field_profile="compact")
+    full_again, _ = run_query(mock_server, output_mode="both")
+
+    assert compact["summary"]["result_cache"]["status"] == "miss"
+    assert compact_again["summary"]["result_cache"]["status"] == "hit"
+    assert full_again["summary"]["result_cache"]["status"] == "hit"
+    assert "添付ファイル" not in compact_again["records"][0]
+    assert "添付ファイル" in full_again["records"][0]
+    assert compact_again["records"] == compact["records"]
+    assert full_again["records"] == full["records"]
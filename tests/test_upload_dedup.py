@@ -0,0 +1,43 @@
+import base64
+
+from conftest import json_messages, make_tool
+
+from tools.kintone_upload_file import KintoneUploadFileTool
+
+LOGO = {"data": base64.b64encode(b"logo-bytes" * 100).decode("ascii"), "filename": "logo.png", "mime_type": "image/png"}
+
+
+def _upload(server, files):
+    tool = make_tool(KintoneUploadFileTool)
+    messages = list(
+        tool._invoke(
+            {
+                "kintone_domain": server.url,
+                "kintone_api_token": "token",
+                "upload_file": files,
+                "deduplicate": True,
+            }
+        )
+    )
+    return [item["fileKey"] for item in json_messages(messages)[0]["uploaded_files"]]
+
+
+def test_identical_files_in_one_call_are_uploaded_once(mock_server):
+    file_keys = _upload(mock_server, [LOGO, LOGO])
+
+    assert mock_server.state.stats["POST /k/v1/file.json"] == 1
+    assert file_keys[0] == file_keys[1]
+
+
+def test_next_call_uploads_again_after_the_file_key_was_attached(mock_server):
+    state = mock_server.state
+    first_key = _upload(mock_server, [LOGO])[0]
+    state.add_records([{"添付ファイル": {"value": [{"fileKey": first_key}]}}])
+
+    second_key = _upload(mock_server, [LOGO])[0]
+
+    assert state.stats["POST /k/v1/file.json"] == 2
+    assert second_key != first_key
+    # 新しい fileKey は添付でき、使用済みの fileKey は添付できない
+    state.add_records([{"添付ファイル": {"value": [{"fileKey": second_key}]}}])
+    assert first_key in state.consumed_files
@@ -0,0 +1,21 @@
+import pytest
+import requests
+
+from tools.common import get_session
+from tools.upload_stream import BytesSource, FileSource
+
+
+def test_file_source_requires_iter_chunks():
+    with pytest.raises(TypeError):
+        FileSource()
+
+    assert b"".join(BytesSource(b"abc").iter_chunks()) == b"abc"
+
+
+def test_get_session_is_shared_per_host():
+    first = get_session("https://dify.example.com/files/tools/a.pdf?sign=1")
+    second = get_session("https://dify.example.com/files/tools/b.pdf")
+
+    assert isinstance(first, requests.Session)
+    assert first is second
+    assert get_session("https://other.example.com/x") is not first
@@ -0,0 +1,71 @@
+import json
+
+from conftest import json_messages, make_tool, text_messages
+
+from tools.kintone_upsert_records import KintoneUpsertRecordsTool
+
+CHUNK_REQUEST = "PUT /k/v1/records.json"
+
+
+def _items(count, *, bad_index=None):
+    # 先頭20件はモックの既存レコード（レコード 1〜20）を更新し、残りは追加になる
+    items = []
+    for index in range(count):
+        title = f"レコード {index + 1}" if index < 20 else f"新規 {index}"
+        num = "数値ではない" if index == bad_index else str(index)
+        items.append({"updateKey": {"field": "title", "value": title}, "record": {"num": {"value": num}}})
+    return items
+
+
+def run_upsert(server, items, **extra):
+    tool = make_tool(KintoneUpsertRecordsTool)
+    return list(
+        tool._invoke(
+            {
+                "kintone_domain": server.url,
+                "kintone_api_token": "token",
+                "kintone_app_id": 1,
+                "records_data": json.dumps({"records": items}, ensure_ascii=False),
+                **extra,
+            }
+        )
+    )
+
+
+def test_upsert_splits_into_chunks_of_100(mock_server):
+    messages = run_upsert(mock_server, _items(250))
+
+    payload = json_messages(messages)[-1]
+    assert mock_server.state.stats[CHUNK_REQUEST] == 3
+    assert payload["processed"] == {
+        "add": 230,
+        "updated": 20,
+        "requested": 250,
+        "with_update_key": 250,
+        "chunks": 3,
+        "failed": 0,
+    }
+    assert payload["failed_indexes"] == []
+    assert [chunk["count"] for chunk in payload["chunks"]] == [100, 100, 50]
+    assert len(payload["raw_response"]["records"]) == 250
+    assert len(mock_server.state.records) == 250
+    assert "分割送信: 3 回" in text_messages(messages)[0]
+
+
+def test_upsert_reports_a_failing_chunk_and_keeps_the_others(mock_server):
+    messages = run_upsert(mock_server, _items(250, bad_index=130), parallel_workers=2)
+
+    payload = json_messages(messages)[-1]
+    assert mock_server.state.stats[CHUNK_REQUEST] == 3
+    assert payload["failed_indexes"] == list(range(100, 200))
+    assert payload["processed"]["failed"] == 100
+    assert payload["processed"]["add"] == 130
+    assert payload["processed"]["updated"] == 20
+    records = payload["raw_response"]["records"]
+    assert all(record is None for record in records[100:200])
+    assert all(record is not None for record in records[:100] + records[200:])
+    # 成功したチャンク（0〜99 と 200〜249）だけが反映される
+    assert len(mock_server.state.records) == 150
+    texts = text_messages(messages)
+    assert "アップサート完了: 追加 130 件 / 更新 20 件" in texts[0]
+    assert "250 件中 100 件の更新/追加に失敗しました（レコード番号 100-199、0始まり）" in texts[-1]
@@ -0,0 +1,201 @@
+"""
+where: kintone_integration/tools/aggregation.py
+what: kintone_query のページを受け取りながらグループ別の件数・合計・最小/最大・平均・ユニーク数を求める集計器
+why: 全レコードを Dify へ返して後段で集計する代わりに、集計結果の表だけを返してデータ量とメモリを抑えるため
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterable, Mapping
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "avg", "min", "max", "distinct")
+_SPEC_PATTERN = re.compile(r"^(?P<function>[a-z_]+)\s*(?:[:(]\s*(?P<field>[^)]+?)\s*\)?)?$", re.IGNORECASE)
+
+
+class AggregateSpec:
+    """1つの集計指定（関数とフィールドコード）。count はフィールドを持たない。"""
+
+    __slots__ = ("function", "field")
+
+    def __init__(self, function: str, field: str | None) -> None:
+        self.function = function
+        self.field = field
+
+    @property
+    def label(self) -> str:
+        return self.function if self.field is None else f"{self.function}({self.field})"
+
+
+def parse_aggregations(raw: Any) -> list[AggregateSpec]:
+    """aggregations パラメータ（"count, sum:金額, max(日付)" 形式）を解析する。未指定なら count のみ。"""
+
+    if raw is None or (isinstance(raw, str) and not raw.strip()):
+        return [AggregateSpec("count", None)]
+    if isinstance(raw, str):
+        tokens = [part.strip() for part in re.split(r"[,\n]", raw) if part.strip()]
+    elif isinstance(raw, list) and all(isinstance(item, str) for item in raw):
+        tokens = [item.strip() for item in raw if item.strip()]
+    else:
+        raise ValueError("aggregations は文字列または文字列の配列で指定してください。")
+
+    specs: list[AggregateSpec] = []
+    for token in tokens:
+        match = _SPEC_PATTERN.match(token)
+        function = match.group("function").lower() if match else ""
+        field = match.group("field") if match else None
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(
+                f"aggregations の {token} は使用できません。count, sum, avg, min, max, distinct のいずれかを指定してください。"
+            )
+        if function == "count":
+            field = None
+        elif not field:
+            raise ValueError(f"aggregations の {function} にはフィールドコードを指定してください（例: {function}:金額）。")
+        specs.append(AggregateSpec(function, field))
+    return specs
+
+
+def required_fields(group_by: Iterable[str], specs: Iterable[AggregateSpec]) -> list[str]:
+    """集計に必要なフィールドコードを重複なく返す（取得フィールドの絞り込み用）。"""
+
+    fields: list[str] = []
+    for code in [*group_by, *(spec.field for spec in specs if spec.field)]:
+        if code not in fields:
+            fields.append(code)
+    return fields
+
+
+def scalar_value(record: Mapping[str, Any], code: str) -> Any:
+    """レコードからグループ化・集計に使う値を取り出す。空の値は None を返す。
+
+    ユーザー選択などは code、複数選択は値を ", " で連結した文字列として扱う。
+    """
+
+    entry = record.get(code)
+    value = entry.get("value") if isinstance(entry, Mapping) else entry
+    if isinstance(value, list):
+        items = [_item_text(item) for item in value]
+        value = ", ".join(item for item in items if item)
+    elif isinstance(value, Mapping):
+        value = _item_text(value)
+    if value is None or value == "":
+        return None
+    return value
+
+
+def _item_text(item: Any) -> str:
+    if isinstance(item, Mapping):
+        return str(item.get("code") or item.get("name") or "")
+    return "" if item is None else str(item)
+
+
+def _to_decimal(value: Any) -> Decimal | None:
+    if value is None:
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def _to_json_number(number: Decimal) -> int | float:
+    return int(number) if number == number.to_integral_value() else float(number)
+
+
+class _GroupState:
+    __slots__ = ("count", "values")
+
+    def __init__(self, specs: list[AggregateSpec]) -> None:
+        self.count = 0
+        self.values: list[Any] = [set() if spec.function == "distinct" else None for spec in specs]
+
+
+class Aggregator:
+    """レコードを逐次受け取って集計する。保持するのはグループごとの集計値のみ（distinct は値の集合）。"""
+
+    def __init__(self, group_by: list[str], specs: list[AggregateSpec]) -> None:
+        self.group_by = group_by
+        self.specs = specs
+        self.record_count = 0
+        self._groups: dict[tuple[Any, ...], _GroupState] = {}
+
+    def add_all(self, records: Iterable[Mapping[str, Any]]) -> None:
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Mapping[str, Any]) -> None:
+        key = tuple(scalar_value(record, code) for code in self.group_by)
+        state = self._groups.get(key)
+        if state is None:
+            state = self._groups[key] = _GroupState(self.specs)
+        state.count += 1
+        self.record_count += 1
+
+        for index, spec in enumerate(self.specs):
+            if spec.field is None:
+                continue
+            value = scalar_value(record, spec.field)
+            if value is None:
+                continue
+            if spec.function == "distinct":
+                state.values[index].add(value)
+            elif spec.function in {"sum", "avg"}:
+                number = _to_decimal(value)
+                if number is None:
+                    continue
+                current = state.values[index]
+                # avg は (合計, 件数) を保持する
+                state.values[index] = (
+                    (number, 1) if current is None else (current[0] + number, current[1] + 1)
+                )
+            else:
+                candidate = self._comparable(value)
+                current = state.values[index]
+                if current is None or (candidate < current if spec.function == "min" else candidate > current):
+                    state.values[index] = candidate
+
+    @staticmethod
+    def _comparable(value: Any) -> tuple[int, Any]:
+        # 数値は数値として、それ以外（日付・日時など）は文字列として比較する
+        number = _to_decimal(value)
+        return (0, number) if number is not None else (1, str(value))
+
+    def rows(self) -> list[dict[str, Any]]:
+        """集計結果の表を、グループキーの昇順で返す。"""
+
+        rows: list[dict[str, Any]] = []
+        for key in sorted(self._groups, key=lambda values: [(value is not None, str(value)) for value in values]):
+            state = self._groups[key]
+            row: dict[str, Any] = dict(zip(self.group_by, key))
+            for index, spec in enumerate(self.specs):
+                row[spec.label] = self._finalize(spec, state, state.values[index])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _finalize(spec: AggregateSpec, state: _GroupState, value: Any) -> Any:
+        if spec.function == "count":
+            return state.count
+        if spec.function == "distinct":
+            return len(value)
+        if value is None:
+            return None
+        if spec.function == "sum":
+            return _to_json_number(value[0])
+        if spec.function == "avg":
+            return _to_json_number(value[0] / value[1])
+        kind, comparable = value
+        return _to_json_number(comparable) if kind == 0 else comparable
+
+
+def format_table(rows: list[dict[str, Any]]) -> str:
+    """集計結果をテキスト（1グループ1行）に整形する。"""
+
+    def render(value: Any) -> str:
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+    return "\n".join(", ".join(f"{name}: {render(value)}" for name, value in row.items()) for row in rows)
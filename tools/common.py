@@ -8,7 +8,20 @@ from __future__ import annotations
 
 import ast
 import json
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from http.cookiejar import DefaultCookiePolicy
 from typing import Any, Iterable, Mapping, MutableMapping, Sequence
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, HTTPError, Timeout
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
@@ -17,6 +30,20 @@ USER_AGENT = "r3-yamauchi/dify-kintone-plugin/0.2.0"
 SENSITIVE_KEYS = {"kintone_api_token"}
 _MASKED = "***"
 MAX_LOG_PAYLOAD_CHARS = 4000
+DEFAULT_POOL_SIZE = 10
+POOL_SIZE_ENV = "KINTONE_HTTP_POOL_SIZE"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 20
+MAX_CONCURRENT_ENV = "KINTONE_MAX_CONCURRENT_REQUESTS"
+RATE_LIMIT_ENV = "KINTONE_RATE_LIMIT_PER_SECOND"
+DEFAULT_PARALLEL_WORKERS = 4
+# kintone のドメイン単位の同時接続上限（100）を大きく下回る値に抑える
+MAX_PARALLEL_WORKERS = 10
+RECORDS_PER_WRITE = 100  # 一括追加/更新APIで1回に送信できるレコード数の上限
+BULK_REQUEST_MAX_REQUESTS = 20  # bulkRequest.json に含められるリクエスト数の上限
+MAX_TRANSACTION_RECORDS = RECORDS_PER_WRITE * BULK_REQUEST_MAX_REQUESTS
+WRITE_MODE_TRANSACTION = "transaction"
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "DELETE"})
 
 
 def normalize_domain(raw_domain: Any) -> str:
@@ -119,30 +146,66 @@ def resolve_timeout(value: Any, default: float) -> float:
     return timeout
 
 
-def parse_single_record_data(payload: Any) -> MutableMapping[str, Any]:
-    """単一レコードのrecord_dataを辞書に正規化する。
+def resolve_parallel_workers(value: Any, default: int = DEFAULT_PARALLEL_WORKERS) -> int:
+    """並列実行数のパラメータを検証し、上限値（MAX_PARALLEL_WORKERS）に丸めて返す。"""
 
-    - dictをそのまま許容
-    - JSON文字列をパース（失敗時はast.literal_evalでPythonリテラルも許容）
-    - ラッパー形式 {"record_data": {...}} を認識して中身を取り出す
-    """
+    if is_blank(value):
+        return default
+    try:
+        workers = int(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("parallel workers must be an integer") from exc
+    if workers < 1:
+        raise ValueError("parallel workers must be positive")
+    return min(workers, MAX_PARALLEL_WORKERS)
+
+
+def resolve_flag(value: Any, default: bool = False) -> bool:
+    """真偽値パラメータ（bool / "true" / "1" など）を正規化する。"""
 
-    if isinstance(payload, MutableMapping):
-        data = payload
-    elif isinstance(payload, str):
+    if isinstance(value, bool):
+        return value
+    if is_blank(value):
+        return default
+    if isinstance(value, str):
+        normalized = value.strip().lower()
+        if normalized in {"true", "1", "yes", "y"}:
+            return True
+        if normalized in {"false", "0", "no", "n"}:
+            return False
+    if isinstance(value, (int, float)):
+        return bool(value)
+    raise ValueError("invalid flag")
+
+
+def _load_json_like(payload: Any) -> Any:
+    """JSON文字列（失敗時はPythonリテラル）をパースする。dict/listはそのまま返す。"""
+
+    if isinstance(payload, (MutableMapping, list)):
+        return payload
+    if isinstance(payload, str):
         text = payload.strip()
         if not text:
             raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。")
         try:
-            data = json.loads(text)
+            return json.loads(text)
         except json.JSONDecodeError:
             try:
-                data = ast.literal_eval(text)
+                return ast.literal_eval(text)
             except (ValueError, SyntaxError):
                 raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。") from None
-    else:
-        raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。")
+    raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。")
+
+
+def parse_single_record_data(payload: Any) -> MutableMapping[str, Any]:
+    """単一レコードのrecord_dataを辞書に正規化する。
+
+    - dictをそのまま許容
+    - JSON文字列をパース（失敗時はast.literal_evalでPythonリテラルも許容）
+    - ラッパー形式 {"record_data": {...}} を認識して中身を取り出す
+    """
 
+    data = _load_json_like(payload)
     if not isinstance(data, MutableMapping):
         raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。")
 
@@ -153,6 +216,34 @@ def parse_single_record_data(payload: Any) -> MutableMapping[str, Any]:
     return _to_json_compatible(data)
 
 
+def parse_multiple_record_data(payload: Any) -> list[MutableMapping[str, Any]]:
+    """複数レコードのrecord_dataをレコード（フィールド辞書）のリストに正規化する。
+
+    - レコードの配列、{"records": [...]}、単一レコードの辞書を許容
+    - 配列の要素は {"record": {...}} 形式でもよい
+    """
+
+    data = _load_json_like(payload)
+    if isinstance(data, MutableMapping):
+        if "record_data" in data and isinstance(data["record_data"], (MutableMapping, list)):
+            data = data["record_data"]
+        if isinstance(data, MutableMapping) and isinstance(data.get("records"), list):
+            data = data["records"]
+    if isinstance(data, MutableMapping):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError("record_data が有効なJSON形式ではありません。正しいJSON形式で入力してください。")
+
+    records: list[MutableMapping[str, Any]] = []
+    for item in data:
+        if isinstance(item, MutableMapping) and set(item) == {"record"} and isinstance(item["record"], MutableMapping):
+            item = item["record"]
+        if not isinstance(item, MutableMapping):
+            raise ValueError("record_data の各要素はオブジェクトで指定してください。")
+        records.append(_to_json_compatible(item))
+    return records
+
+
 def validate_record_structure(record_data: Mapping[str, Any]) -> list[str]:
     """単一レコードデータの構造を検証し、問題があればエラー文言を返す。"""
 
@@ -228,6 +319,89 @@ def build_headers(
     return headers
 
 
+def build_bulk_record_requests(
+    method: str,
+    app_id: int,
+    records: Sequence[Any],
+    **payload: Any,
+) -> list[dict[str, Any]]:
+    """records を100件ずつに分け、bulkRequest.json 用のリクエスト配列を組み立てる。"""
+
+    return [
+        {
+            "method": method,
+            "api": "/k/v1/records.json",
+            "payload": {"app": app_id, "records": list(records[start : start + RECORDS_PER_WRITE]), **payload},
+        }
+        for start in range(0, len(records), RECORDS_PER_WRITE)
+    ]
+
+
+def find_bulk_request_error(payload: Any) -> tuple[int, Mapping[str, Any]] | None:
+    """bulkRequest.json のエラー応答から、失敗したリクエストの位置とエラー内容を取り出す。"""
+
+    results = payload.get("results") if isinstance(payload, Mapping) else None
+    if not isinstance(results, list):
+        return None
+    for index, result in enumerate(results):
+        if isinstance(result, Mapping) and (result.get("code") or result.get("message")):
+            return index, result
+    return None
+
+
+def describe_http_error(error: HTTPError, *, record_count: int | None = None) -> tuple[str, dict[str, Any]]:
+    """HTTPエラーを利用者向けメッセージと構造化エラーに変換する。
+
+    bulkRequest.json のエラーでは失敗したリクエストの位置（0始まり）を failed_request_index に入れ、
+    メッセージにも含める。record_count を渡すと、build_bulk_record_requests で分割した
+    そのリクエストのレコード番号の範囲も示す。
+    """
+
+    status_code = error.response.status_code if error.response is not None else "unknown"
+    error_message = "kintone APIリクエスト中にエラーが発生しました"
+
+    error_payload = None
+    try:
+        error_payload = error.response.json()
+        if "message" in error_payload:
+            error_message = f"{error_message}: {error_payload['message']}"
+    except (json.JSONDecodeError, AttributeError, ValueError, TypeError):
+        pass
+
+    structured_error: dict[str, Any] = {
+        "status": status_code,
+        "message": error_message,
+        "details": error_payload,
+    }
+
+    bulk_error = find_bulk_request_error(error_payload)
+    if bulk_error is not None:
+        failed_index, failed_result = bulk_error
+        error_message = f"{error_message}: {failed_result.get('message', '')}"
+        structured_error["message"] = error_message
+        structured_error["failed_request_index"] = failed_index
+
+    if status_code == 401:
+        message = "kintone APIの認証に失敗しました。APIトークンを確認してください。"
+    elif status_code == 403:
+        message = "kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。"
+    elif status_code == 404:
+        message = "指定されたkintoneアプリが見つかりません。アプリIDを確認してください。"
+    elif isinstance(status_code, int) and status_code >= 500:
+        message = f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。"
+    else:
+        message = f"{error_message} （ステータスコード: {status_code}）"
+
+    if bulk_error is not None:
+        failed_index = bulk_error[0]
+        message += f"\n失敗したリクエスト: {failed_index + 1} 件目"
+        if record_count is not None:
+            start = failed_index * RECORDS_PER_WRITE
+            end = min(start + RECORDS_PER_WRITE, record_count) - 1
+            message += f"（レコード番号 {start}-{end}、0始まり）"
+    return message, structured_error
+
+
 def sanitize_for_logging(
     data: Mapping[str, Any] | None,
     *,
@@ -254,9 +428,16 @@ def log_parameters(tool: Tool, parameters: Mapping[str, Any]) -> ToolInvokeMessa
     return tool.create_log_message(label="Received parameters", data=sanitize_for_logging(parameters))
 
 
-def log_response(tool: Tool, label: str, payload: Mapping[str, Any]) -> ToolInvokeMessage:
-    """レスポンス情報をログとして出力する。"""
+def log_response(
+    tool: Tool,
+    label: str,
+    payload: Mapping[str, Any],
+    client: KintoneClient | None = None,
+) -> ToolInvokeMessage:
+    """レスポンス情報をログとして出力する（client 指定時はHTTP統計も付与する）。"""
 
+    if client is not None:
+        payload = {**payload, "http": client.stats()}
     sanitized = sanitize_for_logging(payload)
     text = json.dumps(sanitized, ensure_ascii=False)
     if len(text) > MAX_LOG_PAYLOAD_CHARS:
@@ -292,3 +473,404 @@ def _truncate(value: Any, max_string: int) -> Any:
             trimmed[key] = _truncate(item, max_string)
         return trimmed
     return value
+
+
+def resolve_pool_size(value: Any = None) -> int:
+    """コネクションプールの上限数を決定する（引数 > 環境変数 > 既定値）。"""
+
+    raw = value if value is not None else os.environ.get(POOL_SIZE_ENV)
+    if is_blank(raw):
+        return DEFAULT_POOL_SIZE
+    try:
+        pool_size = int(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_POOL_SIZE
+    return pool_size if pool_size > 0 else DEFAULT_POOL_SIZE
+
+
+def resolve_max_concurrent_requests(value: Any = None) -> int:
+    """ドメインあたりの同時リクエスト上限を決定する（引数 > 環境変数 > 既定値）。"""
+
+    raw = value if value is not None else os.environ.get(MAX_CONCURRENT_ENV)
+    if is_blank(raw):
+        return DEFAULT_MAX_CONCURRENT_REQUESTS
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_CONCURRENT_REQUESTS
+    return limit if limit > 0 else DEFAULT_MAX_CONCURRENT_REQUESTS
+
+
+def resolve_rate_limit(value: Any = None) -> float:
+    """ドメインあたりの秒間リクエスト上限を決定する（0 は無制限）。"""
+
+    raw = value if value is not None else os.environ.get(RATE_LIMIT_ENV)
+    if is_blank(raw):
+        return 0.0
+    try:
+        rate = float(raw)
+    except (TypeError, ValueError):
+        return 0.0
+    return rate if rate > 0 else 0.0
+
+
+_SESSIONS: dict[str, requests.Session] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _base_url_of(domain_or_url: str) -> str:
+    """ドメインまたはURLから scheme://host[:port] 形式の接続先を取り出す。"""
+
+    base = normalize_domain(domain_or_url)
+    parts = urlsplit(base)
+    if not parts.netloc:
+        raise ValueError("domain is empty")
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _get_shared_session(base_url: str, pool_size: int) -> requests.Session:
+    """接続先ごとのkeep-aliveセッションを取得する（プロセス内で共有）。"""
+
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(base_url)
+        if session is None:
+            session = requests.Session()
+            # APIトークン認証のみを使うため、異なるトークン間でCookieを共有しないようにする
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _SESSIONS[base_url] = session
+        return session
+
+
+class DomainLimiter:
+    """ドメイン単位で同時リクエスト数と秒間リクエスト数を制限する。
+
+    プロセス内の全ツール呼び出し（ワークフローの並列ブランチを含む）で共有され、
+    kintone 側の同時接続上限や 429 に達する前にクライアント側で待機させる。
+    """
+
+    def __init__(self, max_concurrent: int, rate_per_second: float = 0.0) -> None:
+        self.max_concurrent = max_concurrent
+        self.rate_per_second = rate_per_second
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        # トークンバケットの容量は1秒分（最低1）とし、短時間のバーストのみ許容する
+        self._capacity = max(1.0, rate_per_second)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._bucket_lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """実行枠を確保し、待機した秒数を返す。"""
+
+        started = time.monotonic()
+        self._semaphore.acquire()
+        try:
+            self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return time.monotonic() - started
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+    def _take_token(self) -> None:
+        if self.rate_per_second <= 0:
+            return
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._tokens = min(self._capacity, self._tokens + elapsed * self.rate_per_second)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+
+_LIMITERS: dict[str, DomainLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_domain_limiter(domain_or_url: str) -> DomainLimiter:
+    """接続先ごとのDomainLimiterを取得する（設定は初回作成時の環境変数を使用）。"""
+
+    base_url = _base_url_of(domain_or_url)
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(base_url)
+        if limiter is None:
+            limiter = DomainLimiter(resolve_max_concurrent_requests(), resolve_rate_limit())
+            _LIMITERS[base_url] = limiter
+        return limiter
+
+
+class RetryPolicy:
+    """kintone API 呼び出しの再試行方針（ジッター付き指数バックオフ）。
+
+    - 読み取り系（GET / X-HTTP-Method-Override: GET / DELETE）は
+      接続エラー・タイムアウト・429/5xx で再試行する
+    - 書き込み系はサーバーが処理していないことが明らかな場合
+      （接続確立前のタイムアウト、429）のみ再試行する
+    - Retry-After ヘッダーがあればその秒数だけ待機する
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 60.0,
+        status_codes: Iterable[int] = RETRYABLE_STATUS_CODES,
+    ) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.status_codes = frozenset(status_codes)
+
+    def should_retry_status(self, status_code: int, idempotent: bool) -> bool:
+        if status_code not in self.status_codes:
+            return False
+        return idempotent or status_code == 429
+
+    @staticmethod
+    def should_retry_error(error: Exception, idempotent: bool) -> bool:
+        if isinstance(error, ConnectTimeout):
+            return True
+        return idempotent and isinstance(error, (RequestsConnectionError, Timeout))
+
+    def backoff(self, attempt: int) -> float:
+        """attempt 回目の失敗後の待機秒数（full jitter）を返す。"""
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def delay_for(self, response: requests.Response, attempt: int) -> float:
+        """Retry-After ヘッダーを優先して待機秒数を決める。"""
+
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Retry-After ヘッダー（秒数またはHTTP日付）を秒数へ変換する。"""
+
+    if is_blank(value):
+        return None
+    text = value.strip()
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _effective_method(method: str, headers: Mapping[str, str] | None) -> str:
+    """X-HTTP-Method-Override を考慮した実質的なHTTPメソッドを返す。"""
+
+    override = (headers or {}).get("X-HTTP-Method-Override")
+    return (override or method).upper()
+
+
+def _is_replayable(kwargs: Mapping[str, Any]) -> bool:
+    """リクエストボディを再送できるか（ストリームを消費済みでないか）を判定する。"""
+
+    data = kwargs.get("data")
+    # rewind() を持つストリーム（upload_stream.MultipartFileBody など）は先頭から送り直せる
+    if data is not None and not isinstance(data, (bytes, str, Mapping, list, tuple)) and not hasattr(data, "rewind"):
+        return False
+    files = kwargs.get("files")
+    if files:
+        entries = files.values() if isinstance(files, Mapping) else [item[1] for item in files]
+        for entry in entries:
+            content = entry[1] if isinstance(entry, tuple) else entry
+            if not isinstance(content, (bytes, str)):
+                return False
+    return True
+
+
+class KintoneClient:
+    """接続先ごとにプールしたセッションでHTTPリクエストを送るクライアント。
+
+    セッションはプロセス内で共有されるため、ツール呼び出しやページをまたいで
+    TCP/TLS 接続が再利用される。インスタンス自体は呼び出し単位で生成してよく、
+    再試行回数や待機時間などの統計はインスタンスごとに集計される。
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        *,
+        pool_size: int | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ) -> None:
+        self.base_url = _base_url_of(domain)
+        self.pool_size = resolve_pool_size(pool_size)
+        self.session = _get_shared_session(self.base_url, self.pool_size)
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self.limiter = get_domain_limiter(self.base_url)
+        self.request_count = 0
+        self.retry_count = 0
+        self.backoff_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        # 並列取得時に複数スレッドから呼ばれるため、集計値の更新はロックで保護する
+        self._stats_lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        idempotent: bool | None = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """共有セッションでリクエストを送信し、再試行方針に従ってリトライする。
+
+        idempotent を省略した場合は実質的なHTTPメソッドから判定する。
+        最終的なレスポンスのステータス検証（raise_for_status）は呼び出し側で行う。
+        stream=True の場合、本文の受信も同時実行数に数えるため、ドメインの実行枠は
+        レスポンスを close するまで保持する（呼び出し側は必ず close するか with で使う）。
+        """
+
+        policy = self.retry_policy
+        if idempotent is None:
+            idempotent = _effective_method(method, kwargs.get("headers")) in _IDEMPOTENT_METHODS
+        replayable = _is_replayable(kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            # 同時実行枠は1回の送信ごとに確保し、バックオフ待機中は解放しておく
+            waited = self.limiter.acquire()
+            held = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (RequestsConnectionError, Timeout) as error:
+                self._record_attempt(waited)
+                if not replayable or attempt >= policy.max_attempts or not policy.should_retry_error(error, idempotent):
+                    raise
+                delay = policy.backoff(attempt)
+            else:
+                self._record_attempt(waited)
+                if (
+                    not replayable
+                    or attempt >= policy.max_attempts
+                    or not policy.should_retry_status(response.status_code, idempotent)
+                ):
+                    if kwargs.get("stream"):
+                        _release_on_close(response, self.limiter)
+                        held = True
+                    return response
+                delay = policy.delay_for(response, attempt)
+                # 再試行前に接続をプールへ返却する
+                response.close()
+            finally:
+                if not held:
+                    self.limiter.release()
+
+            with self._stats_lock:
+                self.retry_count += 1
+                self.backoff_seconds += delay
+            time.sleep(delay)
+            rewind = getattr(kwargs.get("data"), "rewind", None)
+            if callable(rewind):
+                rewind()
+
+    def stats(self) -> dict[str, Any]:
+        """ログ出力向けのHTTP統計を返す。"""
+
+        with self._stats_lock:
+            return {
+                "requests": self.request_count,
+                "retries": self.retry_count,
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+            }
+
+    def _record_attempt(self, waited: float) -> None:
+        with self._stats_lock:
+            self.request_count += 1
+            self.queue_wait_seconds += waited
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+
+class _SlotRelease:
+    """ストリーミング応答が保持するドメインの実行枠を1回だけ返却する。"""
+
+    __slots__ = ("limiter", "released", "lock")
+
+    def __init__(self, limiter: DomainLimiter) -> None:
+        self.limiter = limiter
+        self.released = False
+        self.lock = threading.Lock()
+
+    def __call__(self) -> None:
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        self.limiter.release()
+
+
+def _release_on_close(response: requests.Response, limiter: DomainLimiter) -> None:
+    """レスポンスの close 時に実行枠を返却する。close されずに破棄された場合も回収時に返却する。"""
+
+    release = _SlotRelease(limiter)
+    close = response.close
+
+    def close_and_release() -> None:
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release  # type: ignore[method-assign]
+    weakref.finalize(response, release)
+
+
+def get_session(url: str, *, pool_size: int | None = None) -> requests.Session:
+    """URL の接続先に対応する共有 keep-alive セッションを返す。
+
+    kintone 以外（Dify のファイル配信 URL など）への通信に使うため、ドメインごとのリミッターや
+    リトライは適用しない。pool_size は接続先のセッションを初めて作成するときのみ反映される。
+    """
+
+    return _get_shared_session(_base_url_of(url), resolve_pool_size(pool_size))
+
+
+def get_client(
+    domain_or_url: str,
+    *,
+    pool_size: int | None = None,
+    retry_policy: RetryPolicy | None = None,
+) -> KintoneClient:
+    """ドメインまたはURLに対応するKintoneClientを返す。
+
+    pool_size は接続先のセッションを初めて作成するときのみ反映される。
+    """
+
+    return KintoneClient(domain_or_url, pool_size=pool_size, retry_policy=retry_policy)
@@ -0,0 +1,180 @@
+"""
+where: kintone_integration/tools/download_stream.py
+what: kintone からダウンロードしたファイルを、Dify へ blob チャンクとして少しずつ送るためのヘルパー
+why: ダウンロード内容を BytesIO に溜めて getvalue() で bytes にし、さらに SDK が送信用に分割し直すと
+     ファイルサイズの数倍のメモリを使い、大きなファイルや並列ダウンロードでメモリ上限に達するため
+"""
+
+from __future__ import annotations
+
+import os
+import uuid
+from typing import Any, Iterable, Iterator, Mapping
+
+import requests
+
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .common import is_blank
+from .upload_stream import FileSource, SpooledSource, UploadTooLargeError, spool_response
+
+CHUNK_SIZE = 64 * 1024
+# Dify 本体が受け付ける blob チャンク1件あたりの上限（SDK が create_blob_message を分割するときと同じ値）
+BLOB_CHUNK_SIZE = 8192
+DEFAULT_MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024
+# Dify 本体がツールから受け取るファイルの上限（既定 30MB）。これを超える上限を設定しても、
+# ダウンロードを終えた後で Dify 側に拒否されるだけなので受け付けない
+HOST_MAX_FILE_BYTES = 30 * 1024 * 1024
+MAX_DOWNLOAD_BYTES_ENV = "KINTONE_DOWNLOAD_MAX_BYTES"
+
+
+class DownloadTooLargeError(ValueError):
+    """ダウンロード中のファイルがサイズ上限を超えたことを表す。"""
+
+
+class DownloadLimitError(ValueError):
+    """ダウンロードの上限として Dify 本体の上限（HOST_MAX_FILE_BYTES）を超える値が設定されたことを表す。"""
+
+
+def resolve_max_download_bytes(value_mb: Any = None) -> int:
+    """ダウンロードできるファイルサイズの上限（バイト）。
+
+    パラメータ（MB 単位）が未指定なら環境変数 KINTONE_DOWNLOAD_MAX_BYTES（バイト単位）、それもなければ 15MB。
+    どちらも HOST_MAX_FILE_BYTES を超える場合は DownloadLimitError を送出する。
+    """
+
+    if not is_blank(value_mb):
+        try:
+            megabytes = float(value_mb)
+        except (TypeError, ValueError) as error:
+            raise ValueError("max_file_size_mb must be a positive number") from error
+        if megabytes <= 0:
+            raise ValueError("max_file_size_mb must be a positive number")
+        resolved = int(megabytes * 1024 * 1024)
+        if resolved > HOST_MAX_FILE_BYTES:
+            raise DownloadLimitError("max_file_size_mb exceeds the Dify file size limit")
+        return resolved
+
+    raw = os.environ.get(MAX_DOWNLOAD_BYTES_ENV)
+    try:
+        resolved = int(raw) if raw not in (None, "") else DEFAULT_MAX_DOWNLOAD_BYTES
+    except ValueError:
+        return DEFAULT_MAX_DOWNLOAD_BYTES
+    if resolved > HOST_MAX_FILE_BYTES:
+        raise DownloadLimitError(f"{MAX_DOWNLOAD_BYTES_ENV} exceeds the Dify file size limit")
+    return resolved if resolved > 0 else DEFAULT_MAX_DOWNLOAD_BYTES
+
+
+def format_megabytes(size: int) -> str:
+    """メッセージ表示用に "15MB" / "2.5MB" 形式へ整形する。"""
+
+    return f"{size / (1024 * 1024):g}MB"
+
+
+def declared_length(response: requests.Response) -> int | None:
+    """圧縮されていないレスポンスの Content-Length を返す。分からない場合は None。"""
+
+    encoding = response.headers.get("Content-Encoding", "").strip().lower()
+    if encoding not in ("", "identity"):
+        # 圧縮されている場合、Content-Length は展開後のサイズではない
+        return None
+    try:
+        length = int(response.headers.get("Content-Length", ""))
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+def _split(data: bytes | bytearray | memoryview) -> Iterator[bytes]:
+    view = memoryview(data)
+    for start in range(0, len(view), BLOB_CHUNK_SIZE):
+        yield bytes(view[start : start + BLOB_CHUNK_SIZE])
+
+
+def iter_response_pieces(
+    response: requests.Response, max_bytes: int, expected_length: int | None = None
+) -> Iterator[bytes]:
+    """レスポンス本文を読みながら BLOB_CHUNK_SIZE ごとに返す。本文全体は保持しない。
+
+    expected_length を指定した場合、受信したサイズが一致しなければ ChunkedEncodingError を送出する。
+    """
+
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if not chunk:
+            continue
+        size += len(chunk)
+        if size > max_bytes:
+            raise DownloadTooLargeError("file too large")
+        yield from _split(chunk)
+    if expected_length is not None and size != expected_length:
+        raise requests.exceptions.ChunkedEncodingError(
+            f"response body was {size} bytes, expected {expected_length} bytes"
+        )
+
+
+def read_body(response: requests.Response, max_bytes: int) -> bytearray:
+    """サイズが事前に分からないレスポンスを、上限を確認しながら1つの bytearray に読み込む。"""
+
+    body = bytearray()
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if not chunk:
+            continue
+        if len(body) + len(chunk) > max_bytes:
+            raise DownloadTooLargeError("file too large")
+        body += chunk
+    return body
+
+
+def iter_buffer_pieces(body: bytearray) -> Iterator[bytes]:
+    """read_body で読み込んだ本文を BLOB_CHUNK_SIZE ごとに返す（本文をコピーしない）。"""
+
+    return _split(body)
+
+
+def spool_download(response: requests.Response, max_bytes: int) -> SpooledSource:
+    """レスポンスを一時領域（一定サイズまではメモリ、超えた分は一時ファイル）へ書き出す。
+
+    並列にダウンロードしたファイルを、Dify へ順番に送るまで保持するために使う。
+    """
+
+    try:
+        return spool_response(response, max_bytes)
+    except UploadTooLargeError as error:
+        raise DownloadTooLargeError(str(error)) from error
+
+
+def iter_source_pieces(source: FileSource) -> Iterator[bytes]:
+    """FileSource の内容を BLOB_CHUNK_SIZE ごとに返す。"""
+
+    for chunk in source.iter_chunks():
+        yield from _split(chunk)
+
+
+def blob_chunk_messages(
+    pieces: Iterable[bytes], total_length: int, meta: Mapping[str, Any]
+) -> Iterator[ToolInvokeMessage]:
+    """pieces を1つのファイルとして送る BLOB_CHUNK メッセージ列を生成する。
+
+    create_blob_message と異なり、ファイル全体を1つの bytes として保持せずに送信できる。
+    pieces の途中で例外が発生した場合は終端チャンクを送らないため、Dify 側で不完全なファイルは作成されない。
+    """
+
+    blob_id = uuid.uuid4().hex
+    sequence = 0
+    for piece in pieces:
+        yield ToolInvokeMessage(
+            type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+            message=ToolInvokeMessage.BlobChunkMessage(
+                id=blob_id, sequence=sequence, total_length=total_length, blob=piece, end=False
+            ),
+            meta=dict(meta),
+        )
+        sequence += 1
+    yield ToolInvokeMessage(
+        type=ToolInvokeMessage.MessageType.BLOB_CHUNK,
+        message=ToolInvokeMessage.BlobChunkMessage(
+            id=blob_id, sequence=sequence, total_length=total_length, blob=b"", end=True
+        ),
+        meta=dict(meta),
+    )
@@ -0,0 +1,307 @@
+"""
+where: kintone_integration/tools/field_cache.py
+what: フィールド定義（/k/v1/app/form/fields.json）をプロセス全体で共有するキャッシュ
+why: 検証や書き込みの前に毎回フォーム設定APIへ問い合わせず、スキーマ取得を高速化するため
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Mapping
+
+from requests.exceptions import RequestException
+
+from .common import KintoneClient, build_headers
+
+DEFAULT_FIELD_CACHE_TTL = 300.0
+FIELD_CACHE_TTL_ENV = "KINTONE_FIELD_CACHE_TTL_SECONDS"
+DEFAULT_FIELD_CACHE_MAX_ENTRIES = 128
+FIELD_CACHE_MAX_ENTRIES_ENV = "KINTONE_FIELD_CACHE_MAX_ENTRIES"
+FIELD_CACHE_PATH_ENV = "KINTONE_FIELD_CACHE_PATH"
+CACHE_HIT = "hit"
+CACHE_REVALIDATED = "revalidated"
+CACHE_MISS = "miss"
+
+FieldCacheKey = tuple[str, int, str]
+
+
+def token_fingerprint(api_token: str) -> str:
+    """APIトークンを識別するためのハッシュ値を返す（トークン自体は保持しない）。"""
+
+    return hashlib.sha256(api_token.encode("utf-8")).hexdigest()[:16]
+
+
+def field_cache_key(domain: str, app_id: int, api_token: str) -> FieldCacheKey:
+    """(ドメイン, アプリID, トークン指紋) のキャッシュキーを組み立てる。"""
+
+    return (domain, app_id, token_fingerprint(api_token))
+
+
+class FieldCacheEntry:
+    """キャッシュされたフィールド定義とフォームのリビジョン。"""
+
+    __slots__ = ("properties", "revision", "fetched_at")
+
+    def __init__(self, properties: Mapping[str, Any], revision: str | None, fetched_at: float) -> None:
+        self.properties = properties
+        self.revision = revision
+        self.fetched_at = fetched_at
+
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+class FieldDefinitionCache:
+    """TTLとLRU上限付きのフィールド定義キャッシュ（SQLiteへの永続化は任意）。"""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = DEFAULT_FIELD_CACHE_TTL,
+        max_entries: int = DEFAULT_FIELD_CACHE_MAX_ENTRIES,
+        db_path: str | None = None,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: OrderedDict[FieldCacheKey, FieldCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        if db_path:
+            self._init_db()
+
+    def get(self, key: FieldCacheKey, *, allow_stale: bool = False) -> FieldCacheEntry | None:
+        """有効期限内のエントリを返す。メモリになければ永続化先を参照する。
+
+        allow_stale=True の場合は期限切れのエントリも返す（リビジョンによる再検証用）。
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        stored = self._load(key)
+        if stored is not None and (entry is None or self._is_newer(stored, entry)):
+            # 他プロセスがより新しいリビジョンを保存していればそちらを採用する
+            entry = stored
+            self._remember(key, entry)
+
+        if entry is None:
+            return None
+        if not allow_stale and self.is_stale(entry):
+            return None
+        return entry
+
+    def is_stale(self, entry: FieldCacheEntry) -> bool:
+        return entry.age() > self.ttl_seconds
+
+    def touch(self, key: FieldCacheKey, entry: FieldCacheEntry) -> FieldCacheEntry:
+        """リビジョンが変わっていないことを確認したエントリの有効期限を延長する。"""
+
+        return self.put(key, entry.properties, entry.revision)
+
+    def put(self, key: FieldCacheKey, properties: Mapping[str, Any], revision: str | None) -> FieldCacheEntry:
+        """取得したフィールド定義を保存する。"""
+
+        entry = FieldCacheEntry(properties, revision, time.time())
+        self._remember(key, entry)
+        self._store(key, entry)
+        return entry
+
+    def invalidate(self, key: FieldCacheKey) -> None:
+        """指定キーのエントリを破棄する。"""
+
+        with self._lock:
+            self._entries.pop(key, None)
+        self._execute("DELETE FROM field_cache WHERE cache_key = ?", (self._db_key(key),))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self._execute("DELETE FROM field_cache", ())
+
+    def _remember(self, key: FieldCacheKey, entry: FieldCacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _is_newer(candidate: FieldCacheEntry, current: FieldCacheEntry) -> bool:
+        """リビジョン（取得できない場合は取得時刻）で新しさを比較する。"""
+
+        try:
+            if candidate.revision is not None and current.revision is not None:
+                return int(candidate.revision) > int(current.revision)
+        except ValueError:
+            pass
+        return candidate.fetched_at > current.fetched_at
+
+    # --- SQLite 永続化（失敗してもキャッシュとして動作を継続する） ---
+
+    @staticmethod
+    def _db_key(key: FieldCacheKey) -> str:
+        domain, app_id, fingerprint = key
+        return f"{domain}|{app_id}|{fingerprint}"
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5.0)
+
+    def _init_db(self) -> None:
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS field_cache ("
+                "cache_key TEXT PRIMARY KEY, revision TEXT, fetched_at REAL NOT NULL, properties TEXT NOT NULL)",
+                (),
+            )
+        except OSError:
+            self.db_path = None
+
+    def _execute(self, sql: str, params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        if not self.db_path:
+            return []
+        try:
+            with closing(self._connect()) as connection:
+                with connection:
+                    return connection.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _load(self, key: FieldCacheKey) -> FieldCacheEntry | None:
+        rows = self._execute(
+            "SELECT properties, revision, fetched_at FROM field_cache WHERE cache_key = ?",
+            (self._db_key(key),),
+        )
+        if not rows:
+            return None
+        properties_json, revision, fetched_at = rows[0]
+        try:
+            properties = json.loads(properties_json)
+        except ValueError:
+            return None
+        return FieldCacheEntry(properties, revision, float(fetched_at))
+
+    def _store(self, key: FieldCacheKey, entry: FieldCacheEntry) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO field_cache (cache_key, revision, fetched_at, properties) VALUES (?, ?, ?, ?)",
+            (self._db_key(key), entry.revision, entry.fetched_at, json.dumps(entry.properties, ensure_ascii=False)),
+        )
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    try:
+        value = float(raw) if raw not in (None, "") else default
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    try:
+        value = int(raw) if raw not in (None, "") else default
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+_FIELD_CACHE: FieldDefinitionCache | None = None
+_FIELD_CACHE_LOCK = threading.Lock()
+
+
+def get_field_cache() -> FieldDefinitionCache:
+    """環境変数の設定に基づくプロセス共有のフィールド定義キャッシュを返す。"""
+
+    global _FIELD_CACHE
+    with _FIELD_CACHE_LOCK:
+        if _FIELD_CACHE is None:
+            _FIELD_CACHE = FieldDefinitionCache(
+                ttl_seconds=_env_float(FIELD_CACHE_TTL_ENV, DEFAULT_FIELD_CACHE_TTL),
+                max_entries=_env_int(FIELD_CACHE_MAX_ENTRIES_ENV, DEFAULT_FIELD_CACHE_MAX_ENTRIES),
+                db_path=os.environ.get(FIELD_CACHE_PATH_ENV) or None,
+            )
+        return _FIELD_CACHE
+
+
+def probe_app_revision(
+    client: KintoneClient,
+    domain: str,
+    app_id: int,
+    api_token: str,
+    *,
+    timeout: float,
+) -> str | None:
+    """アプリ設定API（settings.json）から現在のリビジョンを取得する。取得できなければ None を返す。
+
+    kintone のアプリ設定は全体で1つのリビジョンを共有するため、フィールド定義の変更検知に使える。
+    """
+
+    try:
+        response = client.post(
+            f"{domain}/k/v1/app/settings.json",
+            headers=build_headers(api_token, method_override="GET"),
+            json={"app": app_id},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        revision = response.json().get("revision")
+    except (RequestException, ValueError, AttributeError):
+        # 権限不足などで確認できない場合はフィールド定義の再取得にフォールバックする
+        return None
+    return str(revision) if revision is not None else None
+
+
+def fetch_field_definitions(
+    client: KintoneClient,
+    domain: str,
+    app_id: int,
+    api_token: str,
+    *,
+    timeout: float,
+    cache: FieldDefinitionCache | None = None,
+) -> tuple[FieldCacheEntry, str]:
+    """フィールド定義をキャッシュ経由で取得し、(エントリ, キャッシュ状態) を返す。
+
+    キャッシュ状態は "hit"（有効期限内）、"revalidated"（期限切れだがリビジョン不変）、
+    "miss"（fields.json から取得）のいずれか。HTTPエラー等の例外は呼び出し元へそのまま送出する。
+    """
+
+    cache = cache or get_field_cache()
+    key = field_cache_key(domain, app_id, api_token)
+    cached = cache.get(key, allow_stale=True)
+    if cached is not None:
+        if not cache.is_stale(cached):
+            return cached, CACHE_HIT
+        if cached.revision is not None:
+            # 期限切れでもリビジョンが同じなら、大きなフィールド定義を再取得しない
+            current_revision = probe_app_revision(client, domain, app_id, api_token, timeout=timeout)
+            if current_revision == cached.revision:
+                return cache.touch(key, cached), CACHE_REVALIDATED
+
+    response = client.post(
+        f"{domain}/k/v1/app/form/fields.json",
+        headers=build_headers(api_token, method_override="GET"),
+        json={"app": app_id},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+
+    data = response.json()
+    properties = data.get("properties", {})
+    if not isinstance(properties, dict) or not properties:
+        raise ValueError("kintone アプリにフィールド定義が存在しません。アプリ設定を確認してください。")
+
+    revision = data.get("revision")
+    return cache.put(key, properties, str(revision) if revision is not None else None), CACHE_MISS
@@ -0,0 +1,154 @@
+"""
+where: kintone_integration/tools/file_references.py
+what: fileKey の一覧や kintone_query の結果から、ダウンロード対象の添付ファイルを取り出す
+why: 添付ファイル付きレコードのアーカイブで、fileKey ごとにツールを呼び出さず1回の呼び出しでまとめて取得するため
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Iterable, Mapping
+
+MAX_BATCH_FILES = 100
+
+
+class FileReference:
+    """ダウンロードする1ファイル。file_name などはレコードから分かる場合のみ設定される。"""
+
+    __slots__ = ("file_key", "file_name", "record_id", "field_code")
+
+    def __init__(
+        self,
+        file_key: str,
+        file_name: str | None = None,
+        record_id: str | None = None,
+        field_code: str | None = None,
+    ) -> None:
+        self.file_key = file_key
+        self.file_name = file_name
+        self.record_id = record_id
+        self.field_code = field_code
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "file_key": self.file_key,
+            "file_name": self.file_name,
+            "record_id": self.record_id,
+            "field_code": self.field_code,
+        }
+
+
+def parse_file_keys(raw: Any) -> list[FileReference]:
+    """file_keys パラメータ（配列、JSON 配列の文字列、またはカンマ・改行区切りの文字列）を解析する。"""
+
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        text = raw.strip()
+        if text.startswith("["):
+            try:
+                raw = json.loads(text)
+            except json.JSONDecodeError as error:
+                raise ValueError("file_keys のJSON配列を解析できませんでした。") from error
+        else:
+            raw = re.split(r"[,\n]", text)
+    if not isinstance(raw, list):
+        raise ValueError("file_keys は fileKey の配列、またはカンマ区切りの文字列で指定してください。")
+
+    references: list[FileReference] = []
+    for item in raw:
+        if isinstance(item, Mapping):
+            # kintone の FILE フィールドの値（{"fileKey": ..., "name": ...}）もそのまま受け付ける
+            file_key = item.get("fileKey")
+            file_name = item.get("name")
+        else:
+            file_key, file_name = item, None
+        if not isinstance(file_key, str):
+            raise ValueError("file_keys には文字列の fileKey を指定してください。")
+        if file_key.strip():
+            references.append(FileReference(file_key.strip(), file_name if isinstance(file_name, str) else None))
+    return references
+
+
+def collect_file_references(
+    records: Iterable[Any], fields: Iterable[str] | None = None
+) -> list[FileReference]:
+    """レコード（API の形式、またはフラット化済み）の FILE フィールドから添付ファイルを集める。
+
+    サブテーブル内の FILE フィールドも対象とする。fields を指定した場合はそのフィールドコードのみ。
+    """
+
+    field_filter = set(fields) if fields is not None else None
+    references: list[FileReference] = []
+    for record in records:
+        if not isinstance(record, Mapping):
+            continue
+        record_id = _scalar(record.get("$id"))
+        _collect(record, record_id, field_filter, references)
+    return references
+
+
+def _scalar(entry: Any) -> str | None:
+    value = entry.get("value") if isinstance(entry, Mapping) else entry
+    return None if value is None or value == "" else str(value)
+
+
+def _collect(
+    record: Mapping[str, Any],
+    record_id: str | None,
+    field_filter: set[str] | None,
+    references: list[FileReference],
+) -> None:
+    for field_code, field_data in record.items():
+        value = field_data.get("value") if isinstance(field_data, Mapping) else field_data
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if not isinstance(item, Mapping):
+                continue
+            if "fileKey" in item:
+                if field_filter is None or field_code in field_filter:
+                    file_key = item.get("fileKey")
+                    if isinstance(file_key, str) and file_key:
+                        name = item.get("name")
+                        references.append(
+                            FileReference(file_key, name if isinstance(name, str) else None, record_id, field_code)
+                        )
+                continue
+            # サブテーブルの行（{"id": ..., "value": {...}} またはフラット化済みの行）
+            row = item.get("value") if isinstance(item.get("value"), Mapping) else item
+            _collect(row, record_id, field_filter, references)
+
+
+def unique_references(references: Iterable[FileReference]) -> list[FileReference]:
+    """同じ fileKey を複数回参照している場合は最初の1件だけを残す。"""
+
+    seen: set[str] = set()
+    unique: list[FileReference] = []
+    for reference in references:
+        if reference.file_key in seen:
+            continue
+        seen.add(reference.file_key)
+        unique.append(reference)
+    return unique
+
+
+def archive_name(file_name: str, record_id: str | None, used: set[str]) -> str:
+    """ZIP 内のエントリ名を決める。レコードから取得した場合は "<レコードID>/<ファイル名>"。
+
+    パス区切りを含むファイル名は無害化し、同名のエントリには " (2)" などの連番を付ける。
+    """
+
+    safe_name = re.sub(r"[\\/]", "_", file_name).strip() or "file"
+    if safe_name in {".", ".."}:
+        safe_name = "file"
+    candidate = f"{record_id}/{safe_name}" if record_id else safe_name
+    stem, extension = os.path.splitext(candidate)
+    number = 2
+    while candidate in used:
+        candidate = f"{stem} ({number}){extension}"
+        number += 1
+    used.add(candidate)
+    return candidate
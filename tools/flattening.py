@@ -0,0 +1,223 @@
+"""
+where: kintone_integration/tools/flattening.py
+what: kintone レコードをフラットな辞書（または列ごとの配列）へ変換する共有エンジン
+why: kintone_query と kintone_flatten_json で重複していた変換処理を1か所にまとめ、フィールド構成ごとに
+     抽出処理を一度だけ組み立てて大量レコードの変換を速くするため
+"""
+
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_value_of = itemgetter("value")
+
+
+def extract_value(field_data: Any) -> Any:
+    """`value` キーがあればその値を、なければ入力をそのまま返す。"""
+
+    if isinstance(field_data, dict) and "value" in field_data:
+        return field_data["value"]
+    return field_data
+
+
+def flatten_subtable(field_data: Any) -> Any:
+    """SUBTABLEの value 配列を [{id, ...}] 形式へ展開する。展開できない場合は入力をそのまま返す。"""
+
+    rows = field_data.get("value", []) if isinstance(field_data, dict) else field_data
+    if not isinstance(rows, list):
+        return field_data
+
+    flattened_rows: List[Any] = []
+    for row in rows:
+        if not isinstance(row, dict):
+            flattened_rows.append(row)
+            continue
+        flattened_row: Dict[str, Any] = {}
+        for key, value in row.items():
+            if key == "value" and isinstance(value, dict):
+                for sub_field_code, sub_field_data in value.items():
+                    flattened_row[sub_field_code] = extract_value(sub_field_data)
+            else:
+                flattened_row[key] = value
+        flattened_rows.append(flattened_row)
+    return flattened_rows
+
+
+def flatten_field(field_data: Any) -> Any:
+    """型情報に頼らずに1フィールドをフラット化する（SUBTABLE は行を展開する）。"""
+
+    if isinstance(field_data, dict) and field_data.get("type") == "SUBTABLE":
+        return flatten_subtable(field_data)
+    extracted = extract_value(field_data)
+    if isinstance(extracted, list) and any(isinstance(row, dict) and "value" in row for row in extracted):
+        return flatten_subtable(extracted)
+    return extracted
+
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """フィールドコードをキーとし、その値を直接持つ辞書へ変換する（計画を使わない汎用版）。"""
+
+    return {field_code: flatten_field(field_data) for field_code, field_data in record.items()}
+
+
+_SUBTABLE_ROW_KEYS = ("id", "value")
+
+
+def _subtable_extractor(field_data: Any) -> Any:
+    rows = field_data["value"]
+    flattened_rows: List[Dict[str, Any]] = []
+    try:
+        for row in rows:
+            # API が返す {"id": ..., "value": {...}} 形式の行だけを速い経路で展開する
+            if tuple(row) != _SUBTABLE_ROW_KEYS:
+                return flatten_subtable(rows)
+            flattened_row = {"id": row["id"]}
+            for sub_field_code, sub_field_data in row["value"].items():
+                flattened_row[sub_field_code] = sub_field_data["value"]
+            flattened_rows.append(flattened_row)
+    except (AttributeError, KeyError, TypeError):
+        return flatten_subtable(rows)
+    return flattened_rows
+
+
+def _extractor_for(field_data: Any) -> Callable[[Any], Any]:
+    field_type = field_data.get("type") if isinstance(field_data, dict) else None
+    if field_type == "SUBTABLE":
+        return _subtable_extractor
+    if isinstance(field_type, str) and "value" in field_data:
+        # SUBTABLE 以外の型が分かっているフィールドは value を取り出すだけでよい
+        return _value_of
+    return flatten_field
+
+
+class FlattenPlan:
+    """あるフィールド構成のレコードに対する、フィールドコードごとの抽出処理の一覧。"""
+
+    __slots__ = ("key_set", "steps")
+
+    def __init__(self, key_set: frozenset, steps: Tuple[Tuple[str, Callable[[Any], Any]], ...]) -> None:
+        self.key_set = key_set
+        self.steps = steps
+
+    @classmethod
+    def compile(cls, record: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> "FlattenPlan":
+        """record の型情報から計画を組み立てる。fields を指定した場合はその順に該当フィールドだけを出力する。"""
+
+        codes = list(record) if fields is None else [code for code in fields if code in record]
+        return cls(frozenset(record), tuple((code, _extractor_for(record[code])) for code in codes))
+
+    def apply(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """計画どおりに変換する。型情報と実際の値が食い違う場合は None を返す。"""
+
+        try:
+            return {code: extract(record[code]) for code, extract in self.steps}
+        except (KeyError, TypeError):
+            return None
+
+
+class RecordFlattener:
+    """フィールド構成（フィールドコードの集合）ごとに計画をコンパイルして再利用するフラット化エンジン。
+
+    同じアプリのレコードは通常すべて同じ構成のため、計画の組み立ては最初の1件だけで済む。
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None) -> None:
+        self.fields = list(fields) if fields else None
+        self._plans: Dict[frozenset, FlattenPlan] = {}
+        self._last: Optional[FlattenPlan] = None
+
+    def flatten(self, record: Any) -> Any:
+        if not isinstance(record, dict):
+            return record
+        plan = self._last
+        if plan is None or record.keys() != plan.key_set:
+            key_set = frozenset(record)
+            plan = self._plans.get(key_set)
+            if plan is None:
+                plan = self._plans[key_set] = FlattenPlan.compile(record, self.fields)
+            self._last = plan
+        row = plan.apply(record)
+        if row is None:
+            row = flatten_record(record)
+            if self.fields is not None:
+                row = {code: row[code] for code in self.fields if code in row}
+        return row
+
+    def flatten_all(self, records: Iterable[Any]) -> List[Any]:
+        flatten = self.flatten
+        return [flatten(record) for record in records]
+
+
+class ColumnBuilder:
+    """フラット化した行を列ごとの配列へ蓄積する。行にないフィールドは None で埋める。"""
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, List[Any]] = {}
+        self.row_count = 0
+
+    def append(self, row: Any) -> None:
+        if not isinstance(row, dict):
+            row = {"value": row}
+        columns = self.columns
+        for code, value in row.items():
+            column = columns.get(code)
+            if column is None:
+                column = columns[code] = [None] * self.row_count
+            column.append(value)
+        self.row_count += 1
+        if len(row) != len(columns):
+            for column in columns.values():
+                if len(column) < self.row_count:
+                    column.append(None)
+
+    def extend(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"row_count": self.row_count, "columns": self.columns}
+
+
+def extract_records_array(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    """Walk through nested structures to find the actual records array."""
+    if payload is None:
+        return []
+
+    if isinstance(payload, list):
+        for element in payload:
+            candidate = extract_records_array(element)
+            if candidate is not None:
+                return candidate
+        return payload if _looks_like_records_list(payload) else None
+
+    if isinstance(payload, dict):
+        records_value = payload.get("records")
+        if isinstance(records_value, list):
+            return records_value
+
+        for key in ("json", "data", "result", "results", "response", "payload"):
+            if key in payload:
+                candidate = extract_records_array(payload.get(key))
+                if candidate is not None:
+                    return candidate
+        return None
+
+    return None
+
+
+def _looks_like_records_list(payload: List[Any]) -> bool:
+    if not payload:
+        return True
+
+    score = 0
+    for element in payload:
+        if not isinstance(element, dict):
+            return False
+        for value in element.values():
+            if isinstance(value, dict) and (
+                "value" in value or "type" in value
+            ):
+                score += 1
+                break
+    return score > 0
@@ -2,20 +2,25 @@ import json
 from collections.abc import Generator
 from typing import Any, Dict, List
 
-import requests
 from requests.exceptions import RequestException, Timeout, HTTPError
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
+    MAX_TRANSACTION_RECORDS,
+    WRITE_MODE_TRANSACTION,
+    build_bulk_record_requests,
     build_headers,
+    describe_http_error,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
     normalize_api_tokens,
     normalize_app_id,
     normalize_domain,
+    parse_multiple_record_data,
     parse_single_record_data,
     resolve_timeout,
     resolve_tool_parameter,
@@ -66,6 +71,21 @@ class KintoneAddRecordTool(Tool):
             },
         )
 
+        write_mode = tool_parameters.get("write_mode") or "single"
+        if write_mode not in ("single", WRITE_MODE_TRANSACTION):
+            yield self.create_text_message("write_mode には single または transaction を指定してください。")
+            return
+
+        if write_mode == WRITE_MODE_TRANSACTION:
+            yield from self._invoke_transaction(
+                kintone_domain,
+                kintone_api_token,
+                kintone_app_id,
+                record_data,
+                tool_parameters.get("request_timeout"),
+            )
+            return
+
         # レコードデータをJSONとして解析
         try:
             record_json = parse_single_record_data(record_data)
@@ -110,6 +130,7 @@ class KintoneAddRecordTool(Tool):
 
         # kintone のレコード追加 API のエンドポイント
         url = f"{kintone_domain}/k/v1/record.json"
+        client = get_client(kintone_domain)
 
         try:
             # リクエスト用のJSONボディを作成
@@ -120,7 +141,7 @@ class KintoneAddRecordTool(Tool):
 
             # APIリクエストの実行
             try:
-                response = requests.post(
+                response = client.post(
                     url,
                     headers=headers,
                     json=request_body,
@@ -156,7 +177,7 @@ class KintoneAddRecordTool(Tool):
                 yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
                 return
 
-            yield log_response(self, "kintone add record response", data)
+            yield log_response(self, "kintone add record response", data, client)
 
             # レコードIDの取得
             record_id = data.get("id")
@@ -186,3 +207,103 @@ class KintoneAddRecordTool(Tool):
             # 予期しないエラーの処理
             error_message = f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(e)}"
             yield self.create_text_message(error_message)
+
+    def _invoke_transaction(
+        self,
+        kintone_domain: str,
+        kintone_api_token: str,
+        app_id: int,
+        record_data: Any,
+        raw_timeout: Any,
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """複数レコードを bulkRequest.json でまとめて追加する（全件成功か全件失敗）。"""
+
+        try:
+            records = parse_multiple_record_data(record_data)
+        except ValueError as error:
+            yield self.create_text_message(str(error))
+            return
+
+        if not records:
+            yield self.create_text_message("レコードデータが空です。record_data に1件以上のレコードを指定してください。")
+            return
+        if len(records) > MAX_TRANSACTION_RECORDS:
+            yield self.create_text_message(
+                f"write_mode が transaction の場合、一度に追加できるレコード数は最大{MAX_TRANSACTION_RECORDS}件です"
+                f"（指定: {len(records)} 件）。"
+            )
+            return
+
+        validation_errors: List[str] = []
+        for index, record in enumerate(records):
+            validation_errors.extend(f"レコード #{index + 1}: {error}" for error in validate_record_structure(record))
+        if validation_errors:
+            error_message = "レコードデータの構造が不正です:\n" + "\n".join(validation_errors)
+            yield self.create_text_message(error_message)
+            return
+
+        try:
+            timeout_seconds = resolve_timeout(raw_timeout, 30.0)
+        except ValueError:
+            yield self.create_text_message("request_timeout には正の数値を指定してください。")
+            return
+
+        sub_requests = build_bulk_record_requests("POST", app_id, records)
+        yield self.create_log_message(
+            label="Add records transaction",
+            data={"record_count": len(records), "sub_requests": len(sub_requests)},
+        )
+
+        client = get_client(kintone_domain)
+        try:
+            response = client.post(
+                f"{kintone_domain}/k/v1/bulkRequest.json",
+                headers=build_headers(kintone_api_token),
+                json={"requests": sub_requests},
+                timeout=timeout_seconds,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Timeout:
+            # タイムアウト時はkintone側で確定したかどうかを判別できない
+            yield self.create_text_message(
+                "kintone APIへのリクエストがタイムアウトしました。処理結果が不明なため、アプリの状態を確認してから再実行してください。"
+            )
+            return
+        except HTTPError as e:
+            message, structured_error = describe_http_error(e, record_count=len(records))
+            yield self.create_text_message(f"{message}\nトランザクションのため、いずれのレコードも追加されていません。")
+            yield self.create_json_message({"error": structured_error})
+            yield log_response(self, "kintone add records error", structured_error, client)
+            return
+        except json.JSONDecodeError:
+            yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+            return
+        except RequestException as e:
+            yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
+            return
+
+        yield log_response(self, "kintone add records response", data, client)
+
+        record_ids: List[Any] = []
+        revisions: List[Any] = []
+        results = data.get("results") if isinstance(data, dict) else None
+        for result in results if isinstance(results, list) else []:
+            if isinstance(result, dict):
+                record_ids.extend(result.get("ids") or [])
+                revisions.extend(result.get("revisions") or [])
+
+        yield self.create_variable_message("record_ids", record_ids)
+        yield self.create_variable_message("response", data)
+        yield self.create_json_message(
+            {
+                "record_ids": record_ids,
+                "revisions": revisions,
+                "app_id": app_id,
+                "record_count": len(records),
+                "sub_requests": len(sub_requests),
+            }
+        )
+        yield self.create_text_message(
+            f"{len(record_ids)} 件のレコードをまとめて追加しました（bulkRequest 内 {len(sub_requests)} 件）。"
+        )
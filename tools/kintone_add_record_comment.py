@@ -4,7 +4,6 @@ import json
 from collections.abc import Generator
 from typing import Any, Dict, List
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
@@ -12,6 +11,7 @@ from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
     build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
@@ -91,6 +91,7 @@ class KintoneAddRecordCommentTool(Tool):
 
         headers = build_headers(kintone_api_token)
         url = f"{kintone_domain}/k/v1/record/comment.json"
+        client = get_client(kintone_domain)
         request_body: dict[str, Any] = {
             "app": kintone_app_id,
             "record": record_id,
@@ -103,7 +104,7 @@ class KintoneAddRecordCommentTool(Tool):
 
         try:
             try:
-                response = requests.post(
+                response = client.post(
                     url,
                     headers=headers,
                     json=request_body,
@@ -126,7 +127,7 @@ class KintoneAddRecordCommentTool(Tool):
                 yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
                 return
 
-            yield log_response(self, "kintone add record comment response", data)
+            yield log_response(self, "kintone add record comment response", data, client)
 
             comment_id = data.get("id")
             if not comment_id:
@@ -1,7 +1,10 @@
 import json
+import tempfile
+import zipfile
+from collections import deque
 from collections.abc import Generator
-from io import BytesIO
-from typing import Any, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 import requests
 from requests.exceptions import RequestException, Timeout, HTTPError
@@ -11,17 +14,48 @@ from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
     build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
     normalize_api_tokens,
     normalize_domain,
+    resolve_parallel_workers,
     resolve_timeout,
     resolve_tool_parameter,
 )
+from .download_stream import (
+    HOST_MAX_FILE_BYTES,
+    MAX_DOWNLOAD_BYTES_ENV,
+    DownloadLimitError,
+    DownloadTooLargeError,
+    blob_chunk_messages,
+    declared_length,
+    format_megabytes,
+    iter_buffer_pieces,
+    iter_response_pieces,
+    iter_source_pieces,
+    read_body,
+    resolve_max_download_bytes,
+    spool_download,
+)
+from .file_references import (
+    MAX_BATCH_FILES,
+    FileReference,
+    archive_name,
+    collect_file_references,
+    parse_file_keys,
+    unique_references,
+)
+from .flattening import extract_records_array
+from .upload_stream import SpooledSource, resolve_spool_bytes
+
+ARCHIVE_FILE_NAME = "kintone_attachments.zip"
 
 
 class KintoneDownloadFileTool(Tool):
+    OUTPUT_FORMATS = ("blobs", "zip")
+
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         # kintone の認証情報を取得
         raw_domain = resolve_tool_parameter(self, tool_parameters, "kintone_domain")
@@ -49,8 +83,51 @@ class KintoneDownloadFileTool(Tool):
             yield self.create_text_message("request_timeout には正の数値を指定してください。")
             return
 
+        try:
+            max_file_size = resolve_max_download_bytes(tool_parameters.get("max_file_size_mb"))
+        except DownloadLimitError:
+            yield self.create_text_message(
+                f"ダウンロードの上限には Dify が受け取れるファイルサイズ（{format_megabytes(HOST_MAX_FILE_BYTES)}）以下を指定してください"
+                f"（max_file_size_mb または環境変数 {MAX_DOWNLOAD_BYTES_ENV}）。"
+            )
+            return
+        except ValueError:
+            yield self.create_text_message("max_file_size_mb には正の数値を指定してください。")
+            return
+
         # ファイルキーの取得
         file_key = tool_parameters.get("file_key")
+        try:
+            references = self._collect_batch_references(tool_parameters)
+        except ValueError as error:
+            yield self.create_text_message(str(error))
+            return
+
+        if references is not None:
+            if not is_blank(file_key):
+                yield self.create_text_message("file_key と file_keys / records_json は同時に指定できません。")
+                return
+            try:
+                output_format = self._normalize_output_format(tool_parameters.get("output_format"))
+            except ValueError as error:
+                yield self.create_text_message(str(error))
+                return
+            try:
+                parallel_workers = resolve_parallel_workers(tool_parameters.get("parallel_workers"))
+            except ValueError:
+                yield self.create_text_message("parallel_workers には1以上の整数を指定してください。")
+                return
+            yield from self._invoke_batch(
+                kintone_domain,
+                kintone_api_token,
+                references,
+                output_format=output_format,
+                parallel_workers=parallel_workers,
+                timeout_seconds=timeout_seconds,
+                max_file_size=max_file_size,
+            )
+            return
+
         if not file_key:
             yield self.create_text_message("ファイルキーが見つかりません。file_keyパラメータを確認してください。")
             return
@@ -72,16 +149,18 @@ class KintoneDownloadFileTool(Tool):
 
         # kintone のファイルダウンロード API のエンドポイント
         url = f"{kintone_domain}/k/v1/file.json"
+        client = get_client(kintone_domain)
 
         # クエリパラメータの設定
         params = {
             "fileKey": file_key
         }
 
+        response = None
         try:
             # APIリクエストの実行
             try:
-                response = requests.get(
+                response = client.get(
                     url,
                     headers=headers,
                     params=params,
@@ -95,13 +174,7 @@ class KintoneDownloadFileTool(Tool):
                 return
             except HTTPError as e:
                 # kintoneのエラーメッセージをそのまま返す
-                try:
-                    error_data = e.response.json()
-                    error_message = error_data.get('message', str(e))
-                except (json.JSONDecodeError, AttributeError):
-                    error_message = str(e)
-
-                yield self.create_text_message(f"kintone APIエラー: {error_message}")
+                yield self.create_text_message(f"kintone APIエラー: {self._http_error_message(e)}")
                 return
             except RequestException as e:
                 yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
@@ -111,35 +184,38 @@ class KintoneDownloadFileTool(Tool):
             content_type = response.headers.get('Content-Type', 'application/octet-stream')
             file_name = self._extract_filename(response.headers.get('Content-Disposition'))
 
-            # ファイルデータの読み込み（15MB制限）
-            max_file_size = 15 * 1024 * 1024  # 15MB
-            buffer = BytesIO()
-            total_size = 0
-            for chunk in response.iter_content(chunk_size=1024 * 64):
-                if not chunk:
-                    continue
-                buffer.write(chunk)
-                total_size += len(chunk)
-                if total_size > max_file_size:
-                    yield self.create_text_message("ファイルサイズが大きすぎます。15MB以下のファイルを指定してください。")
+            too_large_message = f"ファイルサイズが大きすぎます。{format_megabytes(max_file_size)}以下のファイルを指定してください。"
+            total_size = declared_length(response)
+            try:
+                if total_size is None:
+                    # サイズが分からない（圧縮されている）場合のみ、本文を1つのバッファに読み込んでから送る
+                    body = read_body(response, max_file_size)
+                    total_size = len(body)
+                    pieces = iter_buffer_pieces(body)
+                elif total_size > max_file_size:
+                    yield self.create_text_message(too_large_message)
                     return
-            file_data = buffer.getvalue()
+                else:
+                    # サイズが分かる場合は、受信したチャンクをそのまま Dify へ送り、本文全体を保持しない
+                    pieces = iter_response_pieces(response, max_file_size, total_size)
 
-            if total_size > int(max_file_size * 0.9):
-                yield self.create_log_message(
-                    label="Large file download",
-                    data={"size": total_size, "threshold": max_file_size},
-                )
+                if total_size > int(max_file_size * 0.9):
+                    yield self.create_log_message(
+                        label="Large file download",
+                        data={"size": total_size, "threshold": max_file_size},
+                    )
 
-            metadata = {"mime_type": content_type}
-            if file_name:
-                metadata["file_name"] = file_name
+                metadata = {"mime_type": content_type}
+                if file_name:
+                    metadata["file_name"] = file_name
 
-            # create_blob_messageを使用してファイルを返す
-            yield self.create_blob_message(
-                file_data,
-                metadata
-            )
+                yield from blob_chunk_messages(pieces, total_size, metadata)
+            except DownloadTooLargeError:
+                yield self.create_text_message(too_large_message)
+                return
+            except RequestException as e:
+                yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
+                return
             yield self.create_json_message(
                 {
                     "file_key": file_key,
@@ -159,12 +235,319 @@ class KintoneDownloadFileTool(Tool):
                     "file_name": file_name,
                     "download_url": url,
                 },
+                client,
             )
 
         except Exception as e:
             # 予期しないエラーの処理
             error_message = f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(e)}"
             yield self.create_text_message(error_message)
+        finally:
+            # ストリーミング応答を閉じて接続をプールへ返却する
+            if response is not None:
+                response.close()
+
+    def _collect_batch_references(self, tool_parameters: Dict[str, Any]) -> Optional[List[FileReference]]:
+        """file_keys / records_json からダウンロード対象を集める。どちらも未指定なら None を返す。"""
+
+        raw_file_keys = tool_parameters.get("file_keys")
+        raw_records = tool_parameters.get("records_json")
+        if is_blank(raw_file_keys) and is_blank(raw_records):
+            return None
+
+        references = parse_file_keys(None if is_blank(raw_file_keys) else raw_file_keys)
+        if not is_blank(raw_records):
+            if isinstance(raw_records, str):
+                try:
+                    raw_records = json.loads(raw_records)
+                except json.JSONDecodeError as error:
+                    raise ValueError("records_json には有効なJSONオブジェクト/配列を指定してください。") from error
+            records = extract_records_array(raw_records)
+            if records is None:
+                raise ValueError(
+                    "records_json からレコード配列を抽出できませんでした。`records` キーを含むJSON、またはレコード配列を指定してください。"
+                )
+            references.extend(collect_file_references(records, self._parse_file_fields(tool_parameters.get("file_fields"))))
+
+        references = unique_references(references)
+        if not references:
+            raise ValueError("ダウンロードする添付ファイルが見つかりません。file_keys または records_json を確認してください。")
+        if len(references) > MAX_BATCH_FILES:
+            raise ValueError(
+                f"一度にダウンロードできるファイルは{MAX_BATCH_FILES}件までです（指定: {len(references)}件）。分割して実行してください。"
+            )
+        return references
+
+    @staticmethod
+    def _parse_file_fields(raw: Any) -> Optional[List[str]]:
+        if is_blank(raw):
+            return None
+        if isinstance(raw, str):
+            items = [part.strip() for part in raw.replace("\n", ",").split(",")]
+        elif isinstance(raw, list) and all(isinstance(item, str) for item in raw):
+            items = [item.strip() for item in raw]
+        else:
+            raise ValueError("file_fields はカンマ区切りの文字列または文字列の配列で指定してください。")
+        return [item for item in items if item] or None
+
+    @classmethod
+    def _normalize_output_format(cls, raw: Any) -> str:
+        if is_blank(raw):
+            return "blobs"
+        normalized = str(raw).strip().lower()
+        if normalized not in cls.OUTPUT_FORMATS:
+            raise ValueError("output_format には blobs または zip を指定してください。")
+        return normalized
+
+    def _invoke_batch(
+        self,
+        kintone_domain: str,
+        kintone_api_token: str,
+        references: List[FileReference],
+        *,
+        output_format: str,
+        parallel_workers: int,
+        timeout_seconds: float,
+        max_file_size: int,
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """複数ファイルを並列にダウンロードし、入力順に blob（または1つの ZIP）として返す。"""
+
+        yield log_parameters(
+            self,
+            {
+                "kintone_domain": kintone_domain,
+                "file_count": len(references),
+                "output_format": output_format,
+            },
+        )
+
+        headers = build_headers(kintone_api_token, content_type=None, extra={"Accept": "*/*"})
+        url = f"{kintone_domain}/k/v1/file.json"
+        client = get_client(kintone_domain)
+
+        workers = min(parallel_workers, len(references))
+        if workers > 1:
+            yield self.create_log_message(
+                label="Parallel download",
+                data={"file_count": len(references), "parallel_workers": workers},
+            )
+
+        # 各ファイルは一時領域へ書き出しておき、完了を待ちながら入力順に送る（送信済みのものから解放する）
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = self._iter_downloads(
+            executor,
+            workers,
+            references,
+            lambda reference: self._download_one(client, url, headers, reference, timeout_seconds, max_file_size),
+        )
+        downloaded: List[Dict[str, Any]] = []
+        failed_files: List[Dict[str, Any]] = []
+        archive: Optional[Dict[str, Any]] = None
+        archive_spool = None
+        try:
+            if output_format == "zip":
+                archive_spool = tempfile.SpooledTemporaryFile(max_size=resolve_spool_bytes())
+                used_names: set[str] = set()
+                with zipfile.ZipFile(archive_spool, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                    for reference, result in results:
+                        if result["status"] == "error":
+                            failed_files.append({key: result[key] for key in ("file_key", "file_name", "message")})
+                            continue
+                        source = result.pop("source")
+                        del result["status"]
+                        try:
+                            entry_name = archive_name(result["file_name"], reference.record_id, used_names)
+                            with zip_file.open(entry_name, "w") as entry:
+                                for chunk in source.iter_chunks():
+                                    entry.write(chunk)
+                                    # ZIP 全体も1つのファイルとして Dify に渡すため、書き込んだ圧縮後のサイズで上限を確認する
+                                    if archive_spool.tell() > max_file_size:
+                                        raise DownloadTooLargeError("archive too large")
+                        finally:
+                            source.close()
+                        result["archive_name"] = entry_name
+                        downloaded.append(result)
+                archive_size = archive_spool.seek(0, 2)
+                if archive_size > max_file_size:
+                    # 末尾のセントラルディレクトリを書き込んだ時点で上限を超えた場合
+                    raise DownloadTooLargeError("archive too large")
+                if downloaded:
+                    archive = {"file_name": ARCHIVE_FILE_NAME, "size": archive_size, "entry_count": len(downloaded)}
+                    yield from blob_chunk_messages(
+                        iter_source_pieces(SpooledSource(archive_spool, archive_size)),
+                        archive_size,
+                        {"mime_type": "application/zip", "file_name": ARCHIVE_FILE_NAME},
+                    )
+            else:
+                for _, result in results:
+                    if result["status"] == "error":
+                        failed_files.append({key: result[key] for key in ("file_key", "file_name", "message")})
+                        continue
+                    source = result.pop("source")
+                    del result["status"]
+                    try:
+                        yield from blob_chunk_messages(
+                            iter_source_pieces(source),
+                            source.size,
+                            {"mime_type": result["mime_type"], "file_name": result["file_name"]},
+                        )
+                    finally:
+                        source.close()
+                    downloaded.append(result)
+        except DownloadTooLargeError:
+            yield self.create_text_message(
+                f"ZIP ファイルのサイズが上限（{format_megabytes(max_file_size)}）を超えるため作成できませんでした。"
+                "output_format に blobs を指定するか、ファイル数を減らしてください。"
+            )
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            yield self.create_text_message(f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(e)}")
+            return
+        finally:
+            # 途中で終了した場合も、まだ送っていない一時領域を解放する
+            results.close()
+            executor.shutdown(wait=True, cancel_futures=True)
+            if archive_spool is not None:
+                archive_spool.close()
+
+        failure_lines = [f"- {item['file_name'] or item['file_key']}: {item['message']}" for item in failed_files]
+        if not downloaded:
+            yield self.create_text_message("添付ファイルを1件もダウンロードできませんでした。\n" + "\n".join(failure_lines))
+            return
+
+        json_payload: Dict[str, Any] = {"output_format": output_format, "files": downloaded}
+        if archive is not None:
+            json_payload["archive"] = archive
+        if failed_files:
+            json_payload["failed_files"] = failed_files
+        yield self.create_json_message(json_payload)
+        yield log_response(
+            self,
+            "kintone batch download summary",
+            {
+                "file_count": len(downloaded),
+                "failed_count": len(failed_files),
+                "total_size": sum(item["size"] for item in downloaded),
+                "archive": archive,
+            },
+            client,
+        )
+
+        message = f"{len(downloaded)}件のファイルをダウンロードしました。"
+        if archive is not None:
+            message += f"ZIP: {archive['file_name']}（{archive['size']} bytes）"
+        if failed_files:
+            message += f"\n{len(references)} 件中 {len(failed_files)} 件のファイルのダウンロードに失敗しました。\n" + "\n".join(
+                failure_lines
+            )
+        yield self.create_text_message(message)
+
+    @staticmethod
+    def _iter_downloads(
+        executor: ThreadPoolExecutor,
+        workers: int,
+        references: List[FileReference],
+        download: Callable[[FileReference], Dict[str, Any]],
+    ) -> Generator[Tuple[FileReference, Dict[str, Any]], None, None]:
+        """ダウンロード結果を入力順に返す。
+
+        投入するのは送信中のものを含めて workers 件までとし、1件送り終えるごとに次を投入する。
+        そのため一時領域に保持するファイルは、ダウンロード中と送信待ちを合わせて workers 件までになる。
+        """
+
+        remaining = iter(references)
+        window: Deque[Tuple[FileReference, Future]] = deque()
+
+        def submit_next() -> None:
+            reference = next(remaining, None)
+            if reference is not None:
+                window.append((reference, executor.submit(download, reference)))
+
+        for _ in range(workers):
+            submit_next()
+        try:
+            while window:
+                reference, future = window.popleft()
+                yield reference, future.result()
+                submit_next()
+        finally:
+            # 中断した場合は未着手のものを取り消し、書き出し済みの一時領域を解放する
+            for _, future in window:
+                future.cancel()
+            for _, future in window:
+                if not future.cancelled():
+                    source = future.result().get("source")
+                    if source is not None:
+                        source.close()
+
+    def _download_one(
+        self,
+        client: Any,
+        url: str,
+        headers: Dict[str, str],
+        reference: FileReference,
+        timeout_seconds: float,
+        max_file_size: int,
+    ) -> Dict[str, Any]:
+        """1ファイルをダウンロードして一時領域へ書き出す。失敗は例外ではなく status=error の結果として返す（並列実行用）。"""
+
+        result: Dict[str, Any] = {
+            "file_key": reference.file_key,
+            "file_name": reference.file_name,
+            "record_id": reference.record_id,
+            "field_code": reference.field_code,
+        }
+        response = None
+        try:
+            response = client.get(
+                url,
+                headers=headers,
+                params={"fileKey": reference.file_key},
+                timeout=timeout_seconds,
+                stream=True,
+            )
+            response.raise_for_status()
+            total_size = declared_length(response)
+            if total_size is not None and total_size > max_file_size:
+                raise DownloadTooLargeError("file too large")
+            source = spool_download(response, max_file_size)
+        except DownloadTooLargeError:
+            message = f"ファイルサイズが大きすぎます。{format_megabytes(max_file_size)}以下のファイルを指定してください。"
+            return {**result, "status": "error", "message": message}
+        except Timeout:
+            return {**result, "status": "error", "message": "kintone APIへのリクエストがタイムアウトしました。"}
+        except HTTPError as e:
+            return {**result, "status": "error", "message": f"kintone APIエラー: {self._http_error_message(e)}"}
+        except RequestException as e:
+            return {**result, "status": "error", "message": f"kintone APIへの接続中にエラーが発生しました: {str(e)}"}
+        except Exception as e:  # pylint: disable=broad-except
+            return {**result, "status": "error", "message": f"予期しないエラーが発生しました: {str(e)}"}
+        finally:
+            if response is not None:
+                response.close()
+
+        file_name = (
+            reference.file_name
+            or self._extract_filename(response.headers.get("Content-Disposition"))
+            or reference.file_key
+        )
+        return {
+            **result,
+            "status": "success",
+            "file_name": file_name,
+            "mime_type": response.headers.get("Content-Type", "application/octet-stream"),
+            "size": source.size,
+            "source": source,
+        }
+
+    @staticmethod
+    def _http_error_message(error: HTTPError) -> str:
+        try:
+            error_data = error.response.json()
+            return error_data.get("message", str(error))
+        except (json.JSONDecodeError, AttributeError, ValueError):
+            return str(error)
+
     def _extract_filename(self, content_disposition: Optional[str]) -> Optional[str]:
         """Content-Dispositionヘッダーからファイル名を抽出する。"""
 
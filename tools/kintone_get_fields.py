@@ -5,17 +5,15 @@
 """
 import json
 from collections.abc import Generator
-from typing import Any, Dict, Tuple
+from typing import Any, Dict
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
-from dify_plugin.core.runtime import Session
-from dify_plugin.entities.tool import ToolInvokeMessage, ToolRuntime
+from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
-    build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
@@ -25,6 +23,7 @@ from .common import (
     resolve_timeout,
     resolve_tool_parameter,
 )
+from .field_cache import fetch_field_definitions
 
 
 class KintoneGetFieldsTool(Tool):
@@ -34,10 +33,6 @@ class KintoneGetFieldsTool(Tool):
     kintone のフォーム設定 API を呼び出し、出力モードに応じたフィールド情報を返す。
     """
 
-    def __init__(self, runtime: ToolRuntime, session: Session) -> None:
-        super().__init__(runtime, session)
-        self._fields_cache: Dict[Tuple[str, int], Dict[str, Any]] = {}
-
     _BASIC_EXCLUDE_TYPES = {"GROUP", "RECORD_NUMBER", "REFERENCE_TABLE"}
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         raw_domain = resolve_tool_parameter(self, tool_parameters, "kintone_domain")
@@ -82,23 +77,7 @@ class KintoneGetFieldsTool(Tool):
             yield self.create_text_message("request_timeout には正の数値を指定してください。")
             return
 
-        headers = build_headers(
-            kintone_api_token,
-            method_override="GET",
-        )
-
-        url = f"{kintone_domain}/k/v1/app/form/fields.json"
-        request_body = {"app": normalized_app_id}
-
-        cache_key = (f"{kintone_domain}:{normalized_app_id}", int(include_full))
-        cached = self._fields_cache.get(cache_key)
-        if cached is not None:
-            body = cached if include_full else self._build_basic_view(cached)
-            payload = json.dumps(body, ensure_ascii=False, indent=2)
-            yield self.create_variable_message("fields", body)
-            yield self.create_json_message(body)
-            yield self.create_text_message(payload)
-            return
+        client = get_client(kintone_domain)
 
         yield log_parameters(
             self,
@@ -110,13 +89,13 @@ class KintoneGetFieldsTool(Tool):
         )
 
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=request_body,
+            entry, cache_status = fetch_field_definitions(
+                client,
+                kintone_domain,
+                normalized_app_id,
+                kintone_api_token,
                 timeout=timeout_seconds,
             )
-            response.raise_for_status()
         except Timeout:
             yield self.create_text_message("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
             return
@@ -135,23 +114,17 @@ class KintoneGetFieldsTool(Tool):
                     message += f" 詳細: {error_detail}"
                 yield self.create_text_message(message)
             return
+        except json.JSONDecodeError:
+            yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+            return
         except RequestException as error:
             yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(error)}")
             return
-
-        try:
-            data = response.json()
         except ValueError:
-            yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
-            return
-
-        properties = data.get("properties", {})
-        if not isinstance(properties, dict) or not properties:
             yield self.create_text_message("フィールド定義が見つかりませんでした。アプリ設定を確認してください。")
             return
 
-        self._fields_cache[cache_key] = properties
-
+        properties = entry.properties
         body = properties if include_full else self._build_basic_view(properties)
 
         payload = json.dumps(body, ensure_ascii=False, indent=2)
@@ -161,7 +134,13 @@ class KintoneGetFieldsTool(Tool):
         yield log_response(
             self,
             "kintone fields response",
-            {"field_count": len(body)},
+            {
+                "field_count": len(body),
+                "revision": entry.revision,
+                "cache": cache_status,
+                "cache_age_seconds": round(entry.age(), 1),
+            },
+            client,
         )
 
     def _build_basic_view(self, properties: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
@@ -4,14 +4,15 @@ import json
 from collections.abc import Generator
 from typing import Any, Dict, List, Tuple
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
+    KintoneClient,
     build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
@@ -108,12 +109,14 @@ class KintoneGetRecordCommentsTool(Tool):
 
         headers = build_headers(kintone_api_token, method_override="GET")
         url = f"{kintone_domain}/k/v1/record/comments.json"
+        client = get_client(kintone_domain)
 
         try:
             if full_fetch:
                 api_order = "asc"
                 output_order = order if order == "asc" else "desc"
                 result = self._fetch_all_comments(
+                    client=client,
                     url=url,
                     headers=headers,
                     app_id=kintone_app_id,
@@ -127,6 +130,7 @@ class KintoneGetRecordCommentsTool(Tool):
                 api_order = order
                 output_order = order
                 result = self._fetch_limited_comments(
+                    client=client,
                     url=url,
                     headers=headers,
                     app_id=kintone_app_id,
@@ -157,11 +161,13 @@ class KintoneGetRecordCommentsTool(Tool):
             self,
             "kintone get record comments response",
             {"comment_count": len(comments), **meta},
+            client,
         )
 
     def _fetch_single_page(
         self,
         *,
+        client: KintoneClient,
         url: str,
         headers: Dict[str, str],
         app_id: int,
@@ -178,7 +184,7 @@ class KintoneGetRecordCommentsTool(Tool):
             "offset": offset,
             "limit": limit,
         }
-        response = self._call_api(url, headers, body, timeout_seconds)
+        response = self._call_api(client, url, headers, body, timeout_seconds)
 
         comments = self._extract_comments(response)
         meta = {
@@ -195,6 +201,7 @@ class KintoneGetRecordCommentsTool(Tool):
     def _fetch_all_comments(
         self,
         *,
+        client: KintoneClient,
         url: str,
         headers: Dict[str, str],
         app_id: int,
@@ -223,7 +230,7 @@ class KintoneGetRecordCommentsTool(Tool):
                 "limit": _PAGE_SIZE,
             }
 
-            response = self._call_api(url, headers, body, timeout_seconds)
+            response = self._call_api(client, url, headers, body, timeout_seconds)
 
             batch = self._extract_comments(response)
             last_flags = {"older": response.get("older"), "newer": response.get("newer")}
@@ -252,6 +259,7 @@ class KintoneGetRecordCommentsTool(Tool):
     def _fetch_limited_comments(
         self,
         *,
+        client: KintoneClient,
         url: str,
         headers: Dict[str, str],
         app_id: int,
@@ -286,7 +294,7 @@ class KintoneGetRecordCommentsTool(Tool):
                 "limit": page_limit,
             }
 
-            response = self._call_api(url, headers, body, timeout_seconds)
+            response = self._call_api(client, url, headers, body, timeout_seconds)
             batch = self._extract_comments(response)
             last_flags = {"older": response.get("older"), "newer": response.get("newer")}
             comments.extend(batch)
@@ -322,13 +330,14 @@ class KintoneGetRecordCommentsTool(Tool):
 
     def _call_api(
         self,
+        client: KintoneClient,
         url: str,
         headers: Dict[str, str],
         body: Dict[str, Any],
         timeout_seconds: float,
     ) -> Dict[str, Any]:
         try:
-            response = requests.post(
+            response = client.post(
                 url,
                 headers=headers,
                 json=body,
@@ -4,28 +4,88 @@ what: Difyのkintoneレコード検索ツール実装
 why: kintone APIを通じたレコード取得と結果整形を担う
 """
 
+import math
+import queue
 import re
 import json
-from collections.abc import Generator
-from typing import Any, Dict, List, Optional
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 from requests.exceptions import RequestException, Timeout, HTTPError
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
+from .aggregation import Aggregator, format_table, parse_aggregations, required_fields
 from .common import (
+    KintoneClient,
     build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
     normalize_api_tokens,
     normalize_app_id,
     normalize_domain,
+    resolve_flag,
+    resolve_parallel_workers,
     resolve_timeout,
     resolve_tool_parameter,
 )
+from .field_cache import fetch_field_definitions
+from .flattening import ColumnBuilder, RecordFlattener
+from .query_parser import ParsedQuery, QuerySyntaxError, parse_query, split_query
+from .query_planner import QueryPlan, plan_pagination
+from .record_mirror import (
+    DEFAULT_MIRROR_MAX_STALENESS,
+    MIRROR_PATH_ENV,
+    MirrorQueryError,
+    RecordMirror,
+    MirrorState,
+    get_record_mirror,
+    mirror_key,
+    reconcile_interval,
+    select_records,
+    unsupported_reason,
+)
+from .result_cache import (
+    RESULT_CACHE_HIT,
+    RESULT_CACHE_MISS,
+    estimate_size,
+    get_result_cache,
+    result_cache_key,
+)
+from .sync_state import (
+    DEFAULT_UPDATED_TIME_FIELD,
+    Watermark,
+    get_watermark_store,
+    parse_watermark,
+    watermark_condition,
+    watermark_key,
+    watermark_of,
+)
+
+_CURSOR_PAGE_SIZE = 500  # カーソルAPIの1回あたり最大取得件数
+_PARTITIONS_PER_WORKER = 2  # $id の偏りを吸収するため、ワーカー数より多めに区間を分割する
+_WINDOW_BUFFER_PAGES = 2  # 並列取得で、区間ごとに先読みして保持するページ数の上限
+_WINDOW_DONE = object()
+# field_profile=compact で既定で除外する、サイズが大きくなりやすいフィールドタイプ
+_COMPACT_EXCLUDED_TYPES = ("FILE", "RICH_TEXT", "SUBTABLE")
+# レコードの値を持たないため fields に指定しないフィールドタイプ
+_NON_DATA_FIELD_TYPES = frozenset({"GROUP", "LABEL", "SPACER", "HR", "REFERENCE_TABLE"})
+
+
+class _QueryApiError(Exception):
+    """kintone API 呼び出しでユーザー向けメッセージを伴うエラーを表す。"""
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
 
 
 class KintoneTool(Tool):
@@ -81,7 +141,7 @@ class KintoneTool(Tool):
             output_mode = self._resolve_output_mode(tool_parameters.get("output_mode"))
         except ValueError:
             yield self.create_text_message(
-                "output_mode は「テキスト + JSON」,「テキストのみ」,「JSONをページごとに即時返却」,「フラット化したJSON」のいずれかを指定してください。"
+                "output_mode は「テキスト + JSON」,「テキストのみ」,「JSONをページごとに即時返却」,「フラット化したJSON」,「NDJSON」,「フラット化したNDJSON」,「列形式のJSON」,「件数のみ」,「存在確認」,「集計」のいずれかを指定してください。"
             )
             return
 
@@ -89,6 +149,26 @@ class KintoneTool(Tool):
         stream_json = output_mode == "json_stream"
         collect_json = output_mode in {"both", "flattened_json"}
         flatten_json = output_mode == "flattened_json"
+        # NDJSON モードはページごとに1行1レコードで返し、レコードを蓄積しない
+        stream_ndjson = output_mode in {"ndjson", "flattened_ndjson"}
+        flatten_ndjson = output_mode == "flattened_ndjson"
+        # フラット化はフィールド構成ごとにコンパイルした計画を全ページで再利用する
+        flattener = RecordFlattener() if output_mode in {"flattened_json", "flattened_ndjson", "columnar_json"} else None
+        column_builder = ColumnBuilder() if output_mode == "columnar_json" else None
+        # aggregate モードはレコードを蓄積せず、ページごとに集計値だけを更新する
+        aggregator: Optional[Aggregator] = None
+        if output_mode == "aggregate":
+            raw_group_by = tool_parameters.get("group_by")
+            try:
+                group_by = [] if is_blank(raw_group_by) else self._parse_fields(raw_group_by)
+            except ValueError:
+                yield self.create_text_message("group_by はフィールドコードのカンマ区切り（例: 担当者,ステータス）で指定してください。")
+                return
+            try:
+                aggregator = Aggregator(group_by, parse_aggregations(tool_parameters.get("aggregations")))
+            except ValueError as error:
+                yield self.create_text_message(str(error))
+                return
 
         # ユーザー指定のlimitがある場合はそれを使用、なければデフォルト値
         limit = user_limit if user_limit is not None else 500
@@ -117,8 +197,124 @@ class KintoneTool(Tool):
         #   - 全件取得するためにページネーションを行う
         #   - デフォルトのlimit値（500）を使用して複数回APIを呼び出す
         should_paginate = not has_limit
-        use_record_id_paging = should_paginate and not has_order_by
-        pagination_strategy = "record_id" if use_record_id_paging else "offset"
+
+        try:
+            requested_strategy = self._resolve_pagination_strategy(tool_parameters.get("pagination_strategy"))
+        except ValueError:
+            yield self.create_text_message(
+                "pagination_strategy は auto, record_id, offset, cursor, parallel のいずれかを指定してください。"
+            )
+            return
+
+        try:
+            parallel_workers = resolve_parallel_workers(tool_parameters.get("parallel_workers"))
+        except ValueError:
+            yield self.create_text_message("parallel_workers には1以上の整数を指定してください。")
+            return
+
+        try:
+            sync_mode = self._resolve_sync_mode(tool_parameters.get("sync_mode"))
+        except ValueError:
+            yield self.create_text_message("sync_mode は full または incremental を指定してください。")
+            return
+
+        incremental = sync_mode == "incremental"
+        if incremental and output_mode in {"count_only", "exists"}:
+            yield self.create_text_message(f"output_mode が {output_mode} の場合、sync_mode の incremental は指定できません。")
+            return
+        since_watermark: Optional[Watermark] = None
+        persist_watermark = False
+        updated_time_field = DEFAULT_UPDATED_TIME_FIELD
+        sync_key = None
+        if incremental:
+            if has_limit or has_offset or has_order_by:
+                yield self.create_text_message(
+                    "sync_mode が incremental の場合、query に order by / limit / offset は指定できません（更新日時と $id の昇順で取得します）。"
+                )
+                return
+            raw_field = tool_parameters.get("updated_time_field")
+            if isinstance(raw_field, str) and raw_field.strip():
+                updated_time_field = raw_field.strip()
+            try:
+                since_watermark = parse_watermark(tool_parameters.get("since_watermark"))
+            except ValueError as error:
+                yield self.create_text_message(str(error))
+                return
+            try:
+                persist_watermark = resolve_flag(tool_parameters.get("persist_watermark"))
+            except ValueError:
+                yield self.create_text_message("persist_watermark には true または false を指定してください。")
+                return
+            if persist_watermark:
+                sync_key = watermark_key(kintone_domain, kintone_app_id, clean_query, updated_time_field)
+                if since_watermark is None:
+                    # 明示指定がなければ前回保存したウォーターマークから再開する
+                    since_watermark = get_watermark_store().get(sync_key)
+
+        try:
+            use_mirror = resolve_flag(tool_parameters.get("use_mirror"))
+        except ValueError:
+            yield self.create_text_message("use_mirror には true または false を指定してください。")
+            return
+        try:
+            mirror_max_staleness = self._resolve_staleness(tool_parameters.get("mirror_max_staleness"))
+        except ValueError:
+            yield self.create_text_message("mirror_max_staleness には0以上の秒数を指定してください。")
+            return
+
+        try:
+            use_result_cache = resolve_flag(tool_parameters.get("use_result_cache"))
+        except ValueError:
+            yield self.create_text_message("use_result_cache には true または false を指定してください。")
+            return
+
+        parsed_query: Optional[ParsedQuery] = None
+        if use_mirror:
+            if incremental:
+                yield self.create_text_message("use_mirror と sync_mode の incremental は同時に指定できません。")
+                return
+            raw_field = tool_parameters.get("updated_time_field")
+            if isinstance(raw_field, str) and raw_field.strip():
+                updated_time_field = raw_field.strip()
+            mirror_unavailable_reason = None
+            try:
+                parsed_query = parse_query(clean_query).with_paging(user_limit, user_offset)
+            except QuerySyntaxError as error:
+                mirror_unavailable_reason = str(error)
+            else:
+                mirror_unavailable_reason = unsupported_reason(parsed_query.condition)
+            if get_record_mirror() is None:
+                # アプリ全体をプラグインのメモリに載せないよう、ミラーはファイルに保存する場合のみ使う
+                mirror_unavailable_reason = f"環境変数 {MIRROR_PATH_ENV} が設定されていないため、ミラーは使用できません。"
+            if mirror_unavailable_reason:
+                # ミラーで評価できないクエリは kintone へ直接問い合わせる
+                yield self.create_log_message(label="Mirror fallback", data={"reason": mirror_unavailable_reason})
+                use_mirror = False
+                parsed_query = None
+
+        if incremental:
+            pagination_strategy = "incremental"
+        elif not should_paginate:
+            # limit 指定時は1回だけ取得するため、戦略指定に関わらず offset 方式で取得する
+            pagination_strategy = "offset"
+        elif requested_strategy == "auto":
+            # 推定件数を調べてから方式を決める（_plan_query）
+            pagination_strategy = "auto"
+        else:
+            pagination_strategy = requested_strategy
+
+        if pagination_strategy in {"record_id", "parallel"} and has_order_by:
+            yield self.create_text_message(
+                f"{pagination_strategy} 方式のページネーションでは order by を指定できません。pagination_strategy に cursor または offset を指定してください。"
+            )
+            return
+        if pagination_strategy == "cursor" and has_offset:
+            yield self.create_text_message(
+                "cursor 方式のページネーションでは offset を指定できません。query から offset を取り除いてください。"
+            )
+            return
+
+        use_record_id_paging = pagination_strategy == "record_id"
 
         pagination_mode_log = self.create_log_message(
             label="Pagination mode",
@@ -128,10 +324,25 @@ class KintoneTool(Tool):
                 "start_offset": initial_offset,
                 "output_mode": output_mode,
                 "strategy": pagination_strategy,
+                "requested_strategy": requested_strategy,
+                "parallel_workers": parallel_workers if pagination_strategy == "parallel" else None,
+                "sync_mode": sync_mode,
+                "use_mirror": use_mirror,
+                "use_result_cache": use_result_cache,
             },
         )
         yield pagination_mode_log
 
+        if incremental:
+            yield self.create_log_message(
+                label="Incremental sync",
+                data={
+                    "updated_time_field": updated_time_field,
+                    "since_watermark": since_watermark.to_dict() if since_watermark else None,
+                    "persist_watermark": persist_watermark,
+                },
+            )
+
         # ページネーション処理用の変数
         all_records = [] if collect_json else None
         all_flattened_records = [] if flatten_json else None
@@ -139,8 +350,13 @@ class KintoneTool(Tool):
         total_records = 0
         page_count = 0
         last_record_id: Optional[int] = None
-        record_id_cursor: Optional[int] = 0 if use_record_id_paging else None
-        offset_query_with_guard: Optional[str] = None if use_record_id_paging else self._ensure_min_record_id_condition(clean_query, 0)
+        paging_stats: Dict[str, Any] = {}
+        mirror_stats: Optional[Dict[str, Any]] = None
+        query_plan: Optional[QueryPlan] = None
+        cache_status: Optional[str] = None
+        cache_age: Optional[float] = None
+        cache_pages: Optional[List[Tuple[List[Dict[str, Any]], Optional[int]]]] = None
+        cache_size = 0
 
         # フィールドリストの処理
         fields_list = None
@@ -154,10 +370,33 @@ class KintoneTool(Tool):
             if parsed_fields:
                 fields_list = parsed_fields
 
+        if aggregator is not None:
+            # 集計に必要なフィールドだけを取得する（fields の指定より優先）
+            fields_list = required_fields(aggregator.group_by, aggregator.specs)
+
         if fields_list is not None:
             fields_list = [*fields_list, "$id"]
+            if incremental:
+                # 次回のウォーターマークを求めるため更新日時も必ず取得する
+                fields_list.append(updated_time_field)
             fields_list = self._deduplicate_fields(fields_list)
 
+        try:
+            field_profile = self._resolve_field_profile(tool_parameters.get("field_profile"))
+        except ValueError:
+            yield self.create_text_message("field_profile は all または compact を指定してください。")
+            return
+        excluded_types = _COMPACT_EXCLUDED_TYPES
+        raw_excluded_types = tool_parameters.get("exclude_field_types")
+        if field_profile == "compact" and not is_blank(raw_excluded_types):
+            try:
+                excluded_types = tuple(token.upper() for token in self._parse_fields(raw_excluded_types))
+            except ValueError:
+                yield self.create_text_message(
+                    "exclude_field_types はフィールドタイプのカンマ区切り（例: FILE,RICH_TEXT）で指定してください。"
+                )
+                return
+
         try:
             timeout_seconds = resolve_timeout(tool_parameters.get("request_timeout"), 30.0)
         except ValueError:
@@ -173,179 +412,220 @@ class KintoneTool(Tool):
                 "output_mode": output_mode,
                 "user_limit": user_limit,
                 "user_offset": user_offset,
+                "pagination_strategy": pagination_strategy,
             },
         )
 
-        # APIリクエスト用のヘッダー設定
-        headers = build_headers(kintone_api_token, method_override="GET")
+        client = get_client(kintone_domain)
 
-        # kintone のレコード取得 API のエンドポイント
-        url = f"{kintone_domain}/k/v1/records.json"
+        if output_mode in {"count_only", "exists"}:
+            yield from self._invoke_count(
+                output_mode,
+                client=client,
+                api_token=kintone_api_token,
+                app_id=kintone_app_id,
+                clean_query=clean_query,
+                timeout_seconds=timeout_seconds,
+            )
+            return
 
-        request_count = 0
+        projection_summary: Optional[Dict[str, Any]] = None
+        if field_profile == "compact" and fields_list is None:
+            # fields の明示指定がない場合のみ、フィールド定義の型から取得するフィールドを絞り込む
+            try:
+                entry, cache_state = fetch_field_definitions(
+                    client, kintone_domain, kintone_app_id, kintone_api_token, timeout=timeout_seconds
+                )
+            except (RequestException, ValueError) as error:
+                yield self.create_log_message(
+                    label="Field projection skipped",
+                    data={"reason": f"フィールド定義を取得できなかったため全フィールドを取得します: {error}"},
+                )
+            else:
+                projected, excluded = self._derive_projection(entry.properties, excluded_types)
+                fields_list = self._deduplicate_fields(
+                    [*projected, "$id", *([updated_time_field] if incremental else [])]
+                )
+                projection_summary = {
+                    "profile": field_profile,
+                    "excluded_types": list(excluded_types),
+                    "excluded_fields": excluded,
+                    "field_cache": cache_state,
+                }
+                yield self.create_log_message(label="Field projection", data=projection_summary)
 
         try:
-            # ページネーションを使用して全レコードを取得
-            while True:
-                # クエリ文字列にページング条件を追加
-                if use_record_id_paging:
-                    base_query = clean_query
-                    if record_id_cursor is not None:
-                        id_condition = f"$id > {record_id_cursor}"
-                        if base_query:
-                            base_query = f"{base_query} and {id_condition}"
-                        else:
-                            base_query = id_condition
-
-                    query_parts = []
-                    if base_query:
-                        query_parts.append(base_query)
-                    query_parts.append("order by $id asc")
-                    query_parts.append(f"limit {limit}")
-                    query = " ".join(query_parts).strip()
+            pages = None
+            result_cache = get_result_cache()
+            cache_key = None
+            # 差分同期とミラーはそれぞれ鮮度を管理するため、結果キャッシュの対象外とする
+            if use_result_cache and not incremental and not use_mirror:
+                cache_key = result_cache_key(
+                    kintone_domain,
+                    kintone_app_id,
+                    kintone_api_token,
+                    query=clean_query,
+                    limit=user_limit,
+                    offset=user_offset,
+                    fields=fields_list,
+                    strategy=pagination_strategy,
+                )
+                cached = result_cache.get(cache_key)
+                if cached is not None:
+                    cache_status = RESULT_CACHE_HIT
+                    cache_age = cached.age()
+                    paging_stats.update(cached.stats)
+                    pages = self._iter_stored_pages(cached.pages)
+                    # auto で保存した結果は、そのとき選択された方式として報告する
+                    if cached.strategy is not None:
+                        pagination_strategy = cached.strategy
+                        use_record_id_paging = pagination_strategy == "record_id"
                 else:
-                    query_core = offset_query_with_guard or ""
-                    if query_core:
-                        query = f"{query_core} limit {limit} offset {offset}"
-                    else:
-                        query = f"$id > 0 limit {limit} offset {offset}"
-
-                # POSTリクエスト用のJSONボディを作成
-                request_body = {
-                    "app": kintone_app_id,
-                    "query": query,
-                }
-                
-                # 事前に処理したfieldsリストがある場合は追加
-                if fields_list:
-                    request_body["fields"] = fields_list
+                    cache_status = RESULT_CACHE_MISS
+                    # NDJSON はレコードを蓄積せずに返すモードのため、キャッシュは読み出しのみで保存しない
+                    if not stream_ndjson:
+                        cache_pages = []
 
-                # APIリクエストの実行
+            if use_mirror and parsed_query is not None:
+                mirror_stats = {}
                 try:
-                    # GETの代わりにPOSTメソッドを使用
-                    response = requests.post(
-                        url,
-                        headers=headers,
-                        json=request_body,  # paramsの代わりにjsonを使用
-                        timeout=timeout_seconds
+                    selected_records = self._query_mirror(
+                        parsed_query,
+                        client=client,
+                        api_token=kintone_api_token,
+                        domain=kintone_domain,
+                        app_id=kintone_app_id,
+                        fields=fields_list,
+                        updated_time_field=updated_time_field,
+                        max_staleness=mirror_max_staleness,
+                        timeout_seconds=timeout_seconds,
+                        default_descending=has_limit,
+                        stats=mirror_stats,
                     )
-                    # HTTPエラーがあれば例外を発生
-                    response.raise_for_status()
-                    request_count += 1
-                except Timeout:
-                    yield self.create_text_message("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
-                    return
-                except HTTPError as e:
-                    # HTTPステータスコードに基づいたエラーメッセージ
-                    status_code = e.response.status_code if hasattr(e, "response") else "unknown"
-                    detail = self._extract_http_error_detail(e)
-
-                    def _with_detail(message: str) -> str:
-                        return f"{message} 詳細: {detail}" if detail else message
-
-                    if status_code == 401:
-                        yield self.create_text_message(
-                            _with_detail("kintone APIの認証に失敗しました。APIトークンを確認してください。")
-                        )
-                    elif status_code == 403:
-                        yield self.create_text_message(
-                            _with_detail("kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。")
-                        )
-                    elif status_code == 404:
-                        yield self.create_text_message(
-                            _with_detail("指定されたkintoneアプリが見つかりません。アプリIDを確認してください。")
-                        )
-                    elif status_code >= 500:
-                        yield self.create_text_message(
-                            _with_detail(f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。")
-                        )
-                    else:
-                        yield self.create_text_message(
-                            _with_detail(f"kintone APIリクエスト中にHTTPエラーが発生しました: {str(e)}")
+                except (MirrorQueryError, sqlite3.Error, OSError) as error:
+                    yield self.create_log_message(label="Mirror fallback", data={"reason": str(error)})
+                    mirror_stats = None
+                else:
+                    yield self.create_log_message(label="Mirror", data=mirror_stats)
+                    pages = self._iter_mirror_pages(selected_records, limit)
+                    pagination_strategy = "mirror"
+                    use_record_id_paging = False
+
+            if pages is None and pagination_strategy == "auto":
+                query_plan = self._plan_query(
+                    client=client,
+                    api_token=kintone_api_token,
+                    app_id=kintone_app_id,
+                    clean_query=clean_query,
+                    has_order_by=has_order_by,
+                    has_offset=has_offset,
+                    initial_offset=initial_offset,
+                    # parallel はページを先読みして保持するため、並列数が明示され、
+                    # ページを順次返す出力形式でない場合に限って auto の候補にする
+                    parallel_workers=(
+                        parallel_workers
+                        if not is_blank(tool_parameters.get("parallel_workers"))
+                        and not (stream_json or stream_ndjson)
+                        else None
+                    ),
+                    timeout_seconds=timeout_seconds,
+                )
+                pagination_strategy = query_plan.strategy
+                use_record_id_paging = pagination_strategy == "record_id"
+                yield self.create_log_message(label="Query plan", data=query_plan.to_dict())
+
+            if pages is None:
+                pages = self._iter_pages(
+                    pagination_strategy,
+                    client=client,
+                    api_token=kintone_api_token,
+                    app_id=kintone_app_id,
+                    clean_query=clean_query,
+                    fields=fields_list,
+                    limit=limit,
+                    initial_offset=initial_offset,
+                    paginate=should_paginate,
+                    timeout_seconds=timeout_seconds,
+                    parallel_workers=parallel_workers,
+                    stats=paging_stats,
+                    since=since_watermark,
+                    updated_time_field=updated_time_field,
+                )
+
+            # ページ単位でレコードを受け取り、出力モードに応じて蓄積する
+            # （cursor 方式では中断時もジェネレーターの終了処理でカーソルを削除する）
+            with closing(pages):
+                for records, page_offset in pages:
+                    if page_offset is not None:
+                        offset = page_offset
+
+                    # 取得したレコードを結果リストに追加
+                    total_records += len(records)
+                    page_count += 1
+                    if collect_json and all_records is not None:
+                        all_records.extend(records)
+                    if aggregator is not None:
+                        aggregator.add_all(records)
+                    if flatten_json and all_flattened_records is not None:
+                        all_flattened_records.extend(flattener.flatten_all(records))
+                    if column_builder is not None:
+                        column_builder.extend(flattener.flatten_all(records))
+
+                    if produce_text and text_records is not None:
+                        for record in records:
+                            record_lines = []
+                            for field_name in record.keys():
+                                field_value = get_field_value(record, field_name)
+                                if field_value and field_value != "不明":
+                                    record_lines.append(f"{field_name}: {field_value}")
+                            if record_lines:
+                                text_records.append(record_lines)
+
+                    if stream_json:
+                        yield self.create_json_message(
+                            {
+                                "page": page_count,
+                                "offset": page_offset,
+                                "limit": limit,
+                                "records": records,
+                            }
                         )
-                    return
-                except RequestException as e:
-                    yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
-                    return
 
-                # レスポンスのJSONデータを解析
-                try:
-                    data = response.json()
-                except json.JSONDecodeError:
-                    yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
-                    return
-
-                # レコードデータの取得と検証
-                records = data.get("records", [])
-
-                # レコードが存在しなければループを抜ける
-                if not records:
-                    break
-
-                # 取得したレコードを結果リストに追加
-                total_records += len(records)
-                page_count += 1
-                if collect_json and all_records is not None:
-                    all_records.extend(records)
-                if flatten_json and all_flattened_records is not None:
-                    for record in records:
-                        all_flattened_records.append(self._flatten_record(record))
-
-                if produce_text and text_records is not None:
-                    for record in records:
-                        record_lines = []
-                        for field_name in record.keys():
-                            field_value = get_field_value(record, field_name)
-                            if field_value and field_value != "不明":
-                                record_lines.append(f"{field_name}: {field_value}")
-                        if record_lines:
-                            text_records.append(record_lines)
-
-                if stream_json:
-                    yield self.create_json_message(
-                        {
-                            "page": page_count,
-                            "offset": offset,
-                            "limit": limit,
-                            "records": records,
-                        }
-                    )
-
-                if use_record_id_paging:
-                    last_id_value = self._extract_record_id(records[-1])
-                    if last_id_value is None:
+                    if stream_ndjson and records:
                         yield self.create_text_message(
-                            "$id フィールドを取得できなかったためページネーションを継続できません。fields パラメータをご確認ください。"
+                            "".join(
+                                json.dumps(
+                                    flattener.flatten(record) if flatten_ndjson else record,
+                                    ensure_ascii=False,
+                                )
+                                + "\n"
+                                for record in records
+                            )
                         )
-                        return
-                    last_record_id = last_id_value
-                    record_id_cursor = last_id_value
-
-                # ページネーション処理の判断
-                # 1. ユーザーがlimitを指定した場合（should_paginate = False）：
-                #    - 1回だけAPIを呼び出し、指定された件数だけを取得
-                # 2. ユーザーがlimitを指定していない場合（should_paginate = True）：
-                #    - 全件取得するまで繰り返しAPIを呼び出す
-                if not should_paginate:
-                    # ユーザーがlimitを指定した場合は1回だけ取得
-                    break
-
-                # 取得したレコード数が指定したlimitより少ない場合、全てのレコードを取得完了
-                if len(records) < limit:
-                    break
 
-                if use_record_id_paging:
-                    continue
+                    if cache_pages is not None:
+                        cache_size += estimate_size(records)
+                        # 上限を超える結果はキャッシュしないため、その時点で蓄積をやめる
+                        if cache_size > result_cache.max_bytes:
+                            cache_pages = None
+                        else:
+                            cache_pages.append((records, page_offset))
+
+                    if use_record_id_paging:
+                        last_id_value = self._extract_record_id(records[-1])
+                        if last_id_value is not None:
+                            last_record_id = last_id_value
 
-                # 次のページのoffsetを設定
-                offset += limit
+            if cache_key is not None and cache_pages is not None:
+                cached_stats = {name: paging_stats[name] for name in ("total_count", "partitions") if name in paging_stats}
+                result_cache.put(cache_key, cache_pages, cached_stats, cache_size, strategy=pagination_strategy)
 
             summary_payload = {
                 "total_records": total_records,
-                "requests_made": request_count,
+                "requests_made": client.request_count,
                 "request_limit": limit,
                 "initial_offset": initial_offset,
-                "final_offset": None if use_record_id_paging else offset,
+                "final_offset": offset if pagination_strategy == "offset" else None,
                 "used_pagination": should_paginate,
                 "fields": fields_list,
                 "effective_query": clean_query or None,
@@ -358,6 +638,49 @@ class KintoneTool(Tool):
                 summary_payload["user_defined_offset"] = user_offset
             if use_record_id_paging and last_record_id is not None:
                 summary_payload["last_record_id"] = last_record_id
+            if "total_count" in paging_stats:
+                summary_payload["total_count"] = paging_stats["total_count"]
+            if "partitions" in paging_stats:
+                summary_payload["parallel_workers"] = parallel_workers
+                summary_payload["partitions"] = paging_stats["partitions"]
+            if projection_summary is not None:
+                summary_payload["field_projection"] = projection_summary
+            if query_plan is not None:
+                summary_payload["query_plan"] = query_plan.to_dict()
+            if mirror_stats is not None:
+                summary_payload["mirror"] = mirror_stats
+            if cache_status is not None:
+                summary_payload["result_cache"] = {"status": cache_status, **result_cache.stats()}
+                if cache_age is not None:
+                    summary_payload["result_cache"]["age_seconds"] = round(cache_age, 3)
+            if incremental:
+                # 取得件数が0件の場合は前回のウォーターマークをそのまま返す
+                new_watermark = paging_stats.get("watermark") or since_watermark
+                summary_payload["sync_mode"] = sync_mode
+                summary_payload["updated_time_field"] = updated_time_field
+                summary_payload["since_watermark"] = since_watermark.to_dict() if since_watermark else None
+                summary_payload["watermark"] = new_watermark.to_dict() if new_watermark else None
+                summary_payload["watermark_persisted"] = False
+                if sync_key is not None and new_watermark is not None:
+                    get_watermark_store().put(sync_key, new_watermark)
+                    summary_payload["watermark_persisted"] = True
+                yield self.create_variable_message("watermark", summary_payload["watermark"])
+
+            if aggregator is not None:
+                aggregate_rows = aggregator.rows()
+                summary_payload["aggregation"] = {
+                    "group_by": aggregator.group_by,
+                    "aggregations": [spec.label for spec in aggregator.specs],
+                    "groups": len(aggregate_rows),
+                }
+                yield self.create_variable_message("groups", aggregate_rows)
+                yield self.create_json_message({"summary": summary_payload, "groups": aggregate_rows})
+                if total_records == 0:
+                    yield self.create_text_message(f"'{query_str}' に一致するレコードは見つかりませんでした。")
+                else:
+                    yield self.create_text_message(
+                        f"集計対象のレコード件数: {total_records}\n{format_table(aggregate_rows)}"
+                    )
 
             if output_mode == "both":
                 records_output = all_records or []
@@ -374,7 +697,9 @@ class KintoneTool(Tool):
                 }
                 yield self.create_json_message(json_payload)
                 yield self.create_text_message(json.dumps(records_output, ensure_ascii=False))
-            elif output_mode == "json_stream":
+            elif column_builder is not None:
+                yield self.create_json_message({"summary": summary_payload, **column_builder.to_dict()})
+            elif output_mode == "json_stream" or stream_ndjson:
                 yield self.create_json_message({"summary": summary_payload})
 
             if output_mode in {"both", "text_only"}:
@@ -394,46 +719,716 @@ class KintoneTool(Tool):
                 "kintone query summary",
                 {
                     "total_records": total_records,
-                    "requests_made": request_count,
+                    "requests_made": client.request_count,
                     "output_mode": output_mode,
                     "pagination_strategy": pagination_strategy,
                 },
+                client,
             )
 
+        except _QueryApiError as error:
+            yield self.create_text_message(error.message)
         except Exception as e:
             # 予期しないエラーの処理
             error_message = f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(e)}"
             yield self.create_text_message(error_message)
 
+    def _iter_pages(
+        self,
+        strategy: str,
+        *,
+        client: KintoneClient,
+        api_token: str,
+        app_id: int,
+        clean_query: str,
+        fields: Optional[List[str]],
+        limit: int,
+        initial_offset: int,
+        paginate: bool,
+        timeout_seconds: float,
+        parallel_workers: int,
+        stats: Dict[str, Any],
+        since: Optional[Watermark] = None,
+        updated_time_field: str = DEFAULT_UPDATED_TIME_FIELD,
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """ページネーション戦略に応じて (レコード配列, offset) をページ単位で返す。"""
+
+        if strategy == "cursor":
+            return self._iter_cursor_pages(
+                client=client,
+                api_token=api_token,
+                app_id=app_id,
+                query=clean_query,
+                fields=fields,
+                timeout_seconds=timeout_seconds,
+                stats=stats,
+            )
+
+        url = f"{client.base_url}/k/v1/records.json"
+        headers = build_headers(api_token, method_override="GET")
+
+        def fetch(query: str, projection: Optional[List[str]] = None) -> Dict[str, Any]:
+            request_body: Dict[str, Any] = {"app": app_id, "query": query}
+            # 事前に処理したfieldsリストがある場合は追加（projection 指定時はそちらを優先）
+            if projection or fields:
+                request_body["fields"] = projection or fields
+            # GETの代わりにPOSTメソッドを使用（X-HTTP-Method-Override）
+            return self._call_api(client, "POST", url, timeout_seconds, headers=headers, json=request_body)
+
+        if strategy == "record_id":
+            return self._iter_record_id_pages(fetch, clean_query, limit)
+        if strategy == "incremental":
+            return self._iter_incremental_pages(fetch, clean_query, limit, updated_time_field, since, stats)
+        if strategy == "parallel":
+            return self._iter_parallel_pages(fetch, clean_query, limit, parallel_workers, stats)
+        return self._iter_offset_pages(fetch, clean_query, limit, initial_offset, paginate)
+
+    def _invoke_count(
+        self,
+        output_mode: str,
+        *,
+        client: KintoneClient,
+        api_token: str,
+        app_id: int,
+        clean_query: str,
+        timeout_seconds: float,
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """該当件数（count_only）または該当レコードの有無（exists）だけを1回のリクエストで返す。
+
+        並び順は結果に影響しないため order by を除き、$id を1件だけ取得する。
+        """
+
+        condition = split_query(clean_query).condition
+        request_body: Dict[str, Any] = {
+            "app": app_id,
+            "query": f"{condition} limit 1".strip(),
+            "fields": ["$id"],
+        }
+        if output_mode == "count_only":
+            request_body["totalCount"] = True
+
+        try:
+            data = self._call_api(
+                client,
+                "POST",
+                f"{client.base_url}/k/v1/records.json",
+                timeout_seconds,
+                headers=build_headers(api_token, method_override="GET"),
+                json=request_body,
+            )
+        except _QueryApiError as error:
+            yield self.create_text_message(error.message)
+            return
+
+        summary_payload: Dict[str, Any] = {
+            "output_mode": output_mode,
+            "requests_made": client.request_count,
+            "effective_query": condition or None,
+        }
+        if output_mode == "count_only":
+            count = self._to_int(data.get("totalCount"))
+            if count is None:
+                yield self.create_text_message("kintone APIの応答に totalCount が含まれていませんでした。")
+                return
+            yield self.create_variable_message("count", count)
+            yield self.create_json_message({"summary": summary_payload, "count": count})
+            yield self.create_text_message(str(count))
+        else:
+            exists = bool(data.get("records"))
+            yield self.create_variable_message("exists", exists)
+            yield self.create_json_message({"summary": summary_payload, "exists": exists})
+            yield self.create_text_message("true" if exists else "false")
+
+        yield log_response(
+            self,
+            "kintone query summary",
+            {"requests_made": client.request_count, "output_mode": output_mode},
+            client,
+        )
+
+    def _plan_query(
+        self,
+        *,
+        client: KintoneClient,
+        api_token: str,
+        app_id: int,
+        clean_query: str,
+        has_order_by: bool,
+        has_offset: bool,
+        initial_offset: int,
+        parallel_workers: Optional[int],
+        timeout_seconds: float,
+    ) -> QueryPlan:
+        """$id だけを1件取得する軽量なリクエストで該当件数（totalCount）を調べ、ページネーション方式を選ぶ。"""
+
+        probe = self._call_api(
+            client,
+            "POST",
+            f"{client.base_url}/k/v1/records.json",
+            timeout_seconds,
+            headers=build_headers(api_token, method_override="GET"),
+            json={
+                "app": app_id,
+                "query": f"{clean_query} limit 1".strip(),
+                "fields": ["$id"],
+                "totalCount": True,
+            },
+        )
+        total_count = self._to_int(probe.get("totalCount"))
+        return plan_pagination(
+            max(0, total_count - initial_offset) if total_count is not None else None,
+            has_order_by=has_order_by,
+            has_offset=has_offset,
+            initial_offset=initial_offset,
+            parallel_workers=parallel_workers,
+        )
+
+    def _iter_record_id_pages(
+        self,
+        fetch: Callable[[str], Dict[str, Any]],
+        clean_query: str,
+        limit: int,
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """$id > 直前ページの最終ID を条件に昇順で全件を取得する。"""
+
+        clauses = split_query(clean_query)
+        record_id_cursor = 0
+        while True:
+            query = f"{clauses.with_condition(f'$id > {record_id_cursor}', order_by='$id asc')} limit {limit}"
+
+            records = fetch(query).get("records", [])
+            # レコードが存在しなければ終了
+            if not records:
+                return
+            yield records, None
+
+            # 取得したレコード数が指定したlimitより少ない場合、全てのレコードを取得完了
+            if len(records) < limit:
+                return
+
+            last_id_value = self._extract_record_id(records[-1])
+            if last_id_value is None:
+                raise _QueryApiError(
+                    "$id フィールドを取得できなかったためページネーションを継続できません。fields パラメータをご確認ください。"
+                )
+            record_id_cursor = last_id_value
+
+    def _iter_incremental_pages(
+        self,
+        fetch: Callable[[str], Dict[str, Any]],
+        clean_query: str,
+        limit: int,
+        updated_time_field: str,
+        since: Optional[Watermark],
+        stats: Dict[str, Any],
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """(更新日時, $id) のキーセットで、ウォーターマーク以降に更新されたレコードを昇順に取得する。"""
+
+        # OR 条件を含むクエリでもウォーターマーク条件が全体に掛かるよう括弧で囲む
+        condition = f"({clean_query})" if clean_query else ""
+        order_clause = f"order by {updated_time_field} asc, $id asc limit {limit}"
+        watermark = since
+        while True:
+            where = " and ".join(part for part in (condition, watermark_condition(updated_time_field, watermark)) if part)
+            query = f"{where} {order_clause}" if where else order_clause
+
+            records = fetch(query).get("records", [])
+            if not records:
+                return
+
+            watermark = watermark_of(records[-1], updated_time_field)
+            if watermark is None:
+                raise _QueryApiError(
+                    f"{updated_time_field} または $id を取得できなかったため差分同期を継続できません。updated_time_field と fields パラメータを確認してください。"
+                )
+            # 更新日時は分単位のため、同じ分のうちに $id の小さいレコードが後から更新されることがある。
+            # 次回の同期はその分の先頭から取り直せるよう、返す（保存する）ウォーターマークの $id は 0 にする
+            stats["watermark"] = Watermark(watermark.updated_time, 0)
+            yield records, None
+
+            if len(records) < limit:
+                return
+
+    def _iter_parallel_pages(
+        self,
+        fetch: Callable[..., Dict[str, Any]],
+        clean_query: str,
+        limit: int,
+        workers: int,
+        stats: Dict[str, Any],
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """$id の範囲を分割して並列に取得し、$id の昇順でページを返す。"""
+
+        # OR 条件を含むクエリでも $id 条件が全体に掛かるよう括弧で囲む
+        condition = f"({clean_query})" if clean_query else ""
+
+        def where(extra: str) -> str:
+            return f"{condition} and {extra}" if condition else extra
+
+        # 対象レコードの最小/最大 $id を求める
+        bounds: List[int] = []
+        for direction in ("asc", "desc"):
+            order_clause = f"order by $id {direction} limit 1"
+            probe_query = f"{condition} {order_clause}" if condition else order_clause
+            records = fetch(probe_query, projection=["$id"]).get("records", [])
+            if not records:
+                stats["partitions"] = 0
+                return
+            record_id = self._extract_record_id(records[0])
+            if record_id is None:
+                raise _QueryApiError("$id フィールドを取得できなかったため並列取得を開始できません。")
+            bounds.append(record_id)
+
+        min_id, max_id = bounds
+        span = max_id - min_id + 1
+        partition_count = max(1, min(workers * _PARTITIONS_PER_WORKER, span))
+        step = math.ceil(span / partition_count)
+        windows = [(low, min(low + step - 1, max_id)) for low in range(min_id, max_id + 1, step)]
+        stats["partitions"] = len(windows)
+
+        def iter_window(low: int, high: int) -> Generator[List[Dict[str, Any]], None, None]:
+            record_id_cursor = low - 1
+            while True:
+                query = f"{where(f'$id > {record_id_cursor} and $id <= {high}')} order by $id asc limit {limit}"
+                records = fetch(query).get("records", [])
+                if not records:
+                    return
+                yield records
+                if len(records) < limit:
+                    return
+                last_id_value = self._extract_record_id(records[-1])
+                if last_id_value is None:
+                    raise _QueryApiError(
+                        "$id フィールドを取得できなかったためページネーションを継続できません。fields パラメータをご確認ください。"
+                    )
+                record_id_cursor = last_id_value
+
+        cancelled = threading.Event()
+
+        def produce(low: int, high: int, pages: "queue.Queue[Any]") -> None:
+            def put(item: Any) -> bool:
+                # 読み手が止まった（ジェネレーターが閉じられた）場合に待ち続けないよう、定期的に中断を確認する
+                while not cancelled.is_set():
+                    try:
+                        pages.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        continue
+                return False
+
+            try:
+                for records in iter_window(low, high):
+                    if not put(records):
+                        return
+                put(_WINDOW_DONE)
+            except BaseException as error:  # pylint: disable=broad-except
+                put(error)
+
+        # 区間ごとのキューは _WINDOW_BUFFER_PAGES ページで満杯になり、取得スレッドはそこで待つ。
+        # 読み終えた区間の分だけ次の区間を開始するため、未読の区間は常に workers 個以下で、
+        # 保持するページ数は結果の件数によらず workers × (_WINDOW_BUFFER_PAGES + 1) までに収まる
+        in_flight = min(workers, len(windows))
+        executor = ThreadPoolExecutor(max_workers=in_flight)
+        window_pages = [queue.Queue(maxsize=_WINDOW_BUFFER_PAGES) for _ in windows]
+
+        def start(index: int) -> None:
+            if index < len(windows):
+                low, high = windows[index]
+                executor.submit(produce, low, high, window_pages[index])
+
+        try:
+            for index in range(in_flight):
+                start(index)
+            # 区間は $id 順に並んでいるため、先頭の区間から順に結果を返せば全体も $id 順になる
+            for index, pages in enumerate(window_pages):
+                while True:
+                    item = pages.get()
+                    if item is _WINDOW_DONE:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item, None
+                start(index + in_flight)
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_offset_pages(
+        self,
+        fetch: Callable[[str], Dict[str, Any]],
+        clean_query: str,
+        limit: int,
+        initial_offset: int,
+        paginate: bool,
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """limit/offset を進めながら取得する（paginate=False の場合は1回のみ）。"""
+
+        query_core = self._ensure_min_record_id_condition(clean_query, 0)
+        offset = initial_offset
+        while True:
+            query = f"{query_core} limit {limit} offset {offset}"
+            records = fetch(query).get("records", [])
+            if not records:
+                return
+            yield records, offset
+
+            # 1. ユーザーがlimitを指定した場合（paginate = False）：1回だけ取得
+            # 2. 指定していない場合：取得件数がlimit未満になるまで繰り返す
+            if not paginate or len(records) < limit:
+                return
+
+            # 次のページのoffsetを設定
+            offset += limit
+
+    def _iter_cursor_pages(
+        self,
+        *,
+        client: KintoneClient,
+        api_token: str,
+        app_id: int,
+        query: str,
+        fields: Optional[List[str]],
+        timeout_seconds: float,
+        stats: Dict[str, Any],
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """カーソルAPIで全件を取得する。途中で終了した場合もカーソルを必ず削除する。"""
+
+        url = f"{client.base_url}/k/v1/records/cursor.json"
+        create_body: Dict[str, Any] = {"app": app_id, "size": _CURSOR_PAGE_SIZE}
+        if query:
+            create_body["query"] = query
+        if fields:
+            create_body["fields"] = fields
+
+        created = self._call_api(client, "POST", url, timeout_seconds, headers=build_headers(api_token), json=create_body)
+        cursor_id = created.get("id")
+        if not cursor_id:
+            raise _QueryApiError("kintone のカーソルを作成できませんでした。")
+        total_count = created.get("totalCount")
+        if total_count is not None:
+            stats["total_count"] = self._to_int(total_count)
+
+        read_headers = build_headers(api_token, content_type=None)
+        exhausted = False
+        try:
+            while True:
+                # 読み出しごとにカーソルが進むため、応答を受け取れなかった読み出しを再送すると
+                # そのページが失われる。サーバーが処理していないことが明らかな失敗のみ再試行する
+                data = self._call_api(
+                    client,
+                    "GET",
+                    url,
+                    timeout_seconds,
+                    headers=read_headers,
+                    params={"id": cursor_id},
+                    idempotent=False,
+                )
+                records = data.get("records", [])
+                has_next = bool(data.get("next"))
+                # 最終ページを取得した時点でカーソルは kintone 側で自動削除される
+                exhausted = not has_next
+                if records:
+                    yield records, None
+                if not has_next:
+                    return
+        finally:
+            if not exhausted:
+                self._delete_cursor(client, url, api_token, cursor_id, timeout_seconds)
+
+    @staticmethod
+    def _delete_cursor(
+        client: KintoneClient,
+        url: str,
+        api_token: str,
+        cursor_id: str,
+        timeout_seconds: float,
+    ) -> None:
+        """カーソルを削除する（失敗しても元の処理結果を優先するため例外は握りつぶす）。"""
+
+        try:
+            client.delete(url, headers=build_headers(api_token), json={"id": cursor_id}, timeout=timeout_seconds)
+        except RequestException:
+            pass
+
+    def _query_mirror(
+        self,
+        parsed: ParsedQuery,
+        *,
+        client: KintoneClient,
+        api_token: str,
+        domain: str,
+        app_id: int,
+        fields: Optional[List[str]],
+        updated_time_field: str,
+        max_staleness: float,
+        timeout_seconds: float,
+        default_descending: bool,
+        stats: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """必要に応じてミラーを差分更新してから、ミラー上でクエリを評価した結果を返す。"""
+
+        mirror = get_record_mirror()
+        if mirror is None:
+            raise MirrorQueryError(f"環境変数 {MIRROR_PATH_ENV} が設定されていないため、ミラーは使用できません。")
+        key = mirror_key(domain, app_id, api_token, updated_time_field)
+        stats.update({"refreshed": False, "full_load": False, "upserted": 0, "reconciled": False, "deleted": 0})
+        with mirror.refresh_lock(key):
+            state = mirror.get_state(key)
+            age = state.age() if state is not None else None
+            if age is None or age > max_staleness:
+                self._refresh_mirror(
+                    mirror,
+                    key,
+                    state,
+                    client=client,
+                    api_token=api_token,
+                    app_id=app_id,
+                    updated_time_field=updated_time_field,
+                    timeout_seconds=timeout_seconds,
+                    stats=stats,
+                )
+                age = 0.0
+        stats["age_seconds"] = round(age, 3)
+        stats["mirrored_records"] = mirror.count(key)
+
+        # order by がない場合は kintone の既定と同じ $id 順で読み出し、limit 件に達した時点で打ち切る
+        descending = default_descending and not parsed.order_by
+        selected = select_records(mirror.iter_records(key, descending=descending), parsed)
+        if fields:
+            return [{code: record[code] for code in fields if code in record} for record in selected]
+        return selected
+
+    def _refresh_mirror(
+        self,
+        mirror: RecordMirror,
+        key: str,
+        state: Optional[MirrorState],
+        *,
+        client: KintoneClient,
+        api_token: str,
+        app_id: int,
+        updated_time_field: str,
+        timeout_seconds: float,
+        stats: Dict[str, Any],
+    ) -> None:
+        """更新日時のウォーターマーク以降の変更を取り込み、一定間隔で $id を突き合わせて削除を検知する。"""
+
+        started_at = time.time()
+        since = None
+        if state is not None and state.watermark is not None:
+            # 同じ更新日時で後から更新されたレコードを取りこぼさないよう、その日時の先頭から取り直す
+            since = Watermark(state.watermark.updated_time, 0)
+        page_stats: Dict[str, Any] = {}
+
+        def iter_pages(strategy: str, fields: Optional[List[str]]):
+            return self._iter_pages(
+                strategy,
+                client=client,
+                api_token=api_token,
+                app_id=app_id,
+                clean_query="",
+                fields=fields,
+                limit=500,
+                initial_offset=0,
+                paginate=True,
+                timeout_seconds=timeout_seconds,
+                parallel_workers=1,
+                stats=page_stats,
+                since=since,
+                updated_time_field=updated_time_field,
+            )
+
+        # ページごとにレコードとウォーターマークを保存するため、中断しても次回は続きから取得できる
+        with closing(iter_pages("incremental", None)) as pages:
+            for records, _ in pages:
+                mirror.apply_page(key, records, page_stats.get("watermark"))
+                stats["upserted"] += len(records)
+        stats["refreshed"] = True
+        stats["full_load"] = since is None
+
+        reconciled_at = None
+        if state is None:
+            # 初回の全件取得は、その時点で存在するレコードだけを含む
+            reconciled_at = started_at
+        elif started_at - state.reconciled_at >= reconcile_interval():
+            live_ids: set[int] = set()
+            with closing(iter_pages("record_id", ["$id"])) as pages:
+                for records, _ in pages:
+                    live_ids.update(
+                        record_id for record_id in map(self._extract_record_id, records) if record_id is not None
+                    )
+            stats["deleted"] = mirror.reconcile(key, live_ids)
+            stats["reconciled"] = True
+            reconciled_at = started_at
+        mirror.mark_refreshed(key, started_at, reconciled_at=reconciled_at)
+
+    @staticmethod
+    def _iter_stored_pages(
+        pages: List[Tuple[List[Dict[str, Any]], Optional[int]]],
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """結果キャッシュに保存したページを取得時と同じ区切りで返す。"""
+
+        yield from pages
+
+    @staticmethod
+    def _iter_mirror_pages(
+        records: List[Dict[str, Any]],
+        page_size: int,
+    ) -> Generator[Tuple[List[Dict[str, Any]], Optional[int]], None, None]:
+        """ミラーから取り出したレコードを他の戦略と同じページ単位で返す。"""
+
+        for start in range(0, len(records), page_size):
+            yield records[start:start + page_size], None
+
+    def _call_api(
+        self,
+        client: KintoneClient,
+        method: str,
+        url: str,
+        timeout_seconds: float,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """kintone API を呼び出してJSONを返す。失敗時はユーザー向けメッセージ付きの例外を送出する。"""
+
+        try:
+            response = client.request(method, url, timeout=timeout_seconds, **kwargs)
+            # HTTPエラーがあれば例外を発生
+            response.raise_for_status()
+        except Timeout:
+            raise _QueryApiError("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。") from None
+        except HTTPError as error:
+            raise _QueryApiError(self._build_http_error_message(error)) from None
+        except RequestException as error:
+            raise _QueryApiError(f"kintone APIへの接続中にエラーが発生しました: {str(error)}") from None
+
+        # レスポンスのJSONデータを解析
+        try:
+            data = response.json()
+        except json.JSONDecodeError:
+            raise _QueryApiError("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。") from None
+        if not isinstance(data, dict):
+            raise _QueryApiError("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+        return data
+
+    def _build_http_error_message(self, error: HTTPError) -> str:
+        """HTTPステータスコードに基づいたエラーメッセージを組み立てる。"""
+
+        response = getattr(error, "response", None)
+        status_code = response.status_code if response is not None else "unknown"
+        detail = self._extract_http_error_detail(error)
+
+        def _with_detail(message: str) -> str:
+            return f"{message} 詳細: {detail}" if detail else message
+
+        if status_code == 401:
+            return _with_detail("kintone APIの認証に失敗しました。APIトークンを確認してください。")
+        if status_code == 403:
+            return _with_detail("kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。")
+        if status_code == 404:
+            return _with_detail("指定されたkintoneアプリが見つかりません。アプリIDを確認してください。")
+        if isinstance(status_code, int) and status_code >= 500:
+            return _with_detail(f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。")
+        return _with_detail(f"kintone APIリクエスト中にHTTPエラーが発生しました: {str(error)}")
+
+    @staticmethod
+    def _to_int(value: Any) -> Optional[int]:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
     def _normalize_query(
         self, raw_query: Optional[str]
     ) -> tuple[str, Optional[int], Optional[int], bool, bool, bool]:
         """
         クエリ文字列からlimit/offsetを取り除き、余分な結合演算子を整形する。
+        文字列リテラル内の limit / offset は書き換えない。
         """
-        query = (raw_query or "").strip()
-        if not query:
-            return "", None, None, False, False, False
+        clauses = split_query((raw_query or "").strip())
+        return (
+            clauses.to_query(),
+            clauses.limit,
+            clauses.offset,
+            clauses.limit is not None,
+            clauses.offset is not None,
+            bool(clauses.order_by),
+        )
 
-        limit_match = re.search(r"\blimit\s+(\d+)", query, flags=re.IGNORECASE)
-        has_limit = bool(limit_match)
-        user_limit = int(limit_match.group(1)) if has_limit else None
+    @staticmethod
+    def _resolve_pagination_strategy(raw_strategy: Any) -> str:
+        """pagination_strategyパラメータを正規化する。"""
+
+        if raw_strategy is None:
+            return "auto"
+        if isinstance(raw_strategy, str):
+            normalized = raw_strategy.strip().lower()
+            if not normalized:
+                return "auto"
+            if normalized in {"auto", "record_id", "offset", "cursor", "parallel"}:
+                return normalized
+        raise ValueError("invalid pagination strategy")
 
-        offset_match = re.search(r"\boffset\s+(\d+)", query, flags=re.IGNORECASE)
-        has_offset = bool(offset_match)
-        user_offset = int(offset_match.group(1)) if has_offset else None
+    @staticmethod
+    def _resolve_sync_mode(raw_mode: Any) -> str:
+        """sync_modeパラメータを正規化する。"""
 
-        clean_query = query
-        if has_limit:
-            clean_query = re.sub(r"\blimit\s+\d+", "", clean_query, flags=re.IGNORECASE)
-        if has_offset:
-            clean_query = re.sub(r"\boffset\s+\d+", "", clean_query, flags=re.IGNORECASE)
+        if raw_mode is None:
+            return "full"
+        if isinstance(raw_mode, str):
+            normalized = raw_mode.strip().lower()
+            if not normalized:
+                return "full"
+            if normalized in {"full", "incremental"}:
+                return normalized
+        raise ValueError("invalid sync mode")
 
-        clean_query = re.sub(r"\s+", " ", clean_query).strip()
-        clean_query = self._remove_trailing_connectors(clean_query)
-        has_order_by = bool(re.search(r"\border\s+by\b", clean_query, flags=re.IGNORECASE))
+    @staticmethod
+    def _resolve_field_profile(raw_profile: Any) -> str:
+        """field_profileパラメータを正規化する。"""
+
+        if raw_profile is None:
+            return "all"
+        if isinstance(raw_profile, str):
+            normalized = raw_profile.strip().lower()
+            if not normalized:
+                return "all"
+            if normalized in {"all", "compact"}:
+                return normalized
+        raise ValueError("invalid field profile")
 
-        return clean_query, user_limit, user_offset, has_limit, has_offset, has_order_by
+    @staticmethod
+    def _derive_projection(
+        properties: Dict[str, Any],
+        excluded_types: Tuple[str, ...],
+    ) -> Tuple[List[str], List[str]]:
+        """フィールド定義から (取得するフィールドコード, 型により除外したフィールドコード) を求める。"""
+
+        projected: List[str] = []
+        excluded: List[str] = []
+        for code, prop in properties.items():
+            field_type = prop.get("type") if isinstance(prop, dict) else None
+            # 無効化されたプロセス管理のフィールドやレイアウト要素は取得対象にしない
+            if field_type in _NON_DATA_FIELD_TYPES or (isinstance(prop, dict) and prop.get("enabled") is False):
+                continue
+            if field_type in excluded_types:
+                excluded.append(code)
+            else:
+                projected.append(code)
+        return projected, excluded
+
+    @staticmethod
+    def _resolve_staleness(raw_value: Any) -> float:
+        """mirror_max_staleness パラメータを0以上の秒数へ正規化する。"""
+
+        if is_blank(raw_value):
+            return DEFAULT_MIRROR_MAX_STALENESS
+        try:
+            value = float(raw_value)
+        except (TypeError, ValueError) as error:
+            raise ValueError("invalid staleness") from error
+        if not math.isfinite(value) or value < 0:
+            raise ValueError("invalid staleness")
+        return value
 
     @staticmethod
     def _resolve_output_mode(raw_mode: Any) -> str:
@@ -443,7 +1438,18 @@ class KintoneTool(Tool):
             return "both"
         if isinstance(raw_mode, str):
             normalized = raw_mode.strip().lower()
-            if normalized in {"text_only", "json_stream", "both", "flattened_json"}:
+            if normalized in {
+                "text_only",
+                "json_stream",
+                "both",
+                "flattened_json",
+                "ndjson",
+                "flattened_ndjson",
+                "columnar_json",
+                "count_only",
+                "exists",
+                "aggregate",
+            }:
                 return normalized
         raise ValueError("invalid output mode")
 
@@ -494,23 +1500,6 @@ class KintoneTool(Tool):
             result.append(field)
         return result
 
-    @staticmethod
-    def _remove_trailing_connectors(query: str) -> str:
-        """
-        末尾に残った and / or / order by などの不要な結合記号を取り除く。
-        """
-        if not query:
-            return ""
-
-        result = query
-        trailing_pattern = re.compile(r"(?:\b(?:and|or)\b|\border\s+by\b)\s*$", flags=re.IGNORECASE)
-        while True:
-            match = trailing_pattern.search(result)
-            if not match:
-                break
-            result = result[: match.start()].rstrip()
-        return result
-
     @staticmethod
     def _extract_http_error_detail(error: HTTPError) -> Optional[str]:
         """
@@ -547,90 +1536,9 @@ class KintoneTool(Tool):
 
     @staticmethod
     def _ensure_min_record_id_condition(query: str, minimum_id: int) -> str:
-        """order by 句の前で $id > minimum_id を必ず付与する。"""
+        """order by 句の前で $id > minimum_id を必ず付与する（or を含む条件にも全体に掛かるよう括弧で囲む）。"""
 
-        condition = f"$id > {minimum_id}"
-        base = (query or "").strip()
-        if not base:
-            return condition
-
-        order_match = re.search(r"\border\s+by\b", base, flags=re.IGNORECASE)
-        if not order_match:
-            return f"{base} and {condition}"
-
-        prefix = base[: order_match.start()].strip()
-        suffix = base[order_match.start():].strip()
-
-        if prefix:
-            prefix = f"{prefix} and {condition}"
-        else:
-            prefix = condition
-
-        return f"{prefix} {suffix}".strip()
-
-    def _flatten_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        kintone レコードをフラットな辞書形式に変換する。
-        フィールドコードをキーとし、その値を直接持つ。
-        """
-        row = {}
-        for field_code, field_data in record.items():
-            row[field_code] = self._flatten_field(field_data)
-        return row
-
-    def _flatten_field(self, field_data: Any) -> Any:
-        """Flatten SUBTABLE構造を含むフィールドを標準化する。"""
-        if self._is_subtable_dict(field_data):
-            return self._flatten_subtable(field_data)
-
-        extracted = self._extract_value(field_data)
-        if self._looks_like_subtable_rows(extracted):
-            return self._flatten_subtable(extracted)
-        return extracted
-
-    def _flatten_subtable(self, field_data: Any) -> Any:
-        """SUBTABLEの value 配列を [{id, ...}] 形式へ展開する。"""
-        if isinstance(field_data, dict):
-            rows = field_data.get("value", [])
-        else:
-            rows = field_data
-
-        if not isinstance(rows, list):
-            return field_data
-
-        flattened_rows: List[Dict[str, Any]] = []
-        for row in rows:
-            if not isinstance(row, dict):
-                flattened_rows.append(row)
-                continue
-
-            flattened_row: Dict[str, Any] = {}
-            for key, value in row.items():
-                if key == "value" and isinstance(value, dict):
-                    for sub_field_code, sub_field_data in value.items():
-                        flattened_row[sub_field_code] = self._extract_value(
-                            sub_field_data
-                        )
-                else:
-                    flattened_row[key] = value
-            flattened_rows.append(flattened_row)
-        return flattened_rows
-
-    @staticmethod
-    def _extract_value(field_data: Any) -> Any:
-        if isinstance(field_data, dict) and "value" in field_data:
-            return field_data["value"]
-        return field_data
-
-    @staticmethod
-    def _is_subtable_dict(field_data: Any) -> bool:
-        return isinstance(field_data, dict) and field_data.get("type") == "SUBTABLE"
-
-    @staticmethod
-    def _looks_like_subtable_rows(value: Any) -> bool:
-        if not isinstance(value, list):
-            return False
-        return any(isinstance(row, dict) and "value" in row for row in value)
+        return split_query(query).with_condition(f"$id > {minimum_id}")
 
 
 def get_field_value(record: Dict[str, Any], field_name: str) -> Any:
@@ -5,7 +5,6 @@ import json
 from collections.abc import Generator
 from typing import Any, Dict, List
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
@@ -13,6 +12,7 @@ from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
     build_headers,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
@@ -114,6 +114,7 @@ class KintoneUpdateRecordTool(Tool):
 
         headers = build_headers(kintone_api_token, method_override="PUT")
         url = f"{kintone_domain}/k/v1/record.json"
+        client = get_client(kintone_domain)
 
         try:
             request_body = {
@@ -126,7 +127,7 @@ class KintoneUpdateRecordTool(Tool):
             request_body["record"] = record_json
 
             try:
-                response = requests.post(
+                response = client.post(
                     url,
                     headers=headers,
                     json=request_body,
@@ -163,6 +164,7 @@ class KintoneUpdateRecordTool(Tool):
                 self,
                 "kintone update response",
                 data,
+                client,
             )
 
             revision = data.get("revision")
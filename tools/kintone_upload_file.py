@@ -6,31 +6,44 @@ why: チャットフローから渡されたファイルをkintoneに保存しfi
 
 from __future__ import annotations
 
-import base64
 import binascii
 import copy
 import json
 import math
 import re
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
+    KintoneClient,
     build_headers,
+    get_client,
+    get_session,
     is_blank,
     log_parameters,
     log_response,
     normalize_api_tokens,
     normalize_domain,
+    resolve_flag,
+    resolve_parallel_workers,
     resolve_timeout,
     resolve_tool_parameter,
 )
+from .upload_dedup import content_digest, upload_dedup_key
+from .upload_stream import (
+    Base64Source,
+    BytesSource,
+    FileSource,
+    MultipartFileBody,
+    UploadTooLargeError,
+    spool_response,
+)
 
 
 class KintoneUploadFileTool(Tool):
@@ -74,6 +87,24 @@ class KintoneUploadFileTool(Tool):
             yield self.create_text_message(str(error))
             return
 
+        try:
+            timeout_seconds = resolve_timeout(tool_parameters.get("request_timeout"), 30.0)
+        except ValueError:
+            yield self.create_text_message("request_timeout には正の数値を指定してください。")
+            return
+
+        try:
+            parallel_workers = resolve_parallel_workers(tool_parameters.get("parallel_workers"))
+        except ValueError:
+            yield self.create_text_message("parallel_workers には1以上の整数を指定してください。")
+            return
+
+        try:
+            deduplicate = resolve_flag(tool_parameters.get("deduplicate"))
+        except ValueError:
+            yield self.create_text_message("deduplicate には true または false を指定してください。")
+            return
+
         try:
             files_to_upload = self._prepare_files(file_parameter, file_name_overrides)
         except ValueError as error:
@@ -84,12 +115,8 @@ class KintoneUploadFileTool(Tool):
             yield self.create_text_message("アップロードするファイルが指定されていません。少なくとも1件のファイルを選択してください。")
             return
 
-        try:
-            timeout_seconds = resolve_timeout(tool_parameters.get("request_timeout"), 30.0)
-        except ValueError:
-            yield self.create_text_message("request_timeout には正の数値を指定してください。")
-            return
         url = f"{kintone_domain}/k/v1/file.json"
+        client = get_client(kintone_domain)
         headers = build_headers(kintone_api_token, content_type=None)
 
         yield log_parameters(
@@ -101,86 +128,88 @@ class KintoneUploadFileTool(Tool):
             },
         )
 
-        uploaded_files: List[Dict[str, Any]] = []
-        uploaded_details: List[Dict[str, Any]] = []
-        file_names: List[str] = []
-
         try:
-            for file_bytes, file_name, mime_type in files_to_upload:
-                if not file_bytes:
+            # 送信前に全ファイルを検証し、入力の誤りがあれば1件もアップロードしない
+            for source, file_name, _ in files_to_upload:
+                if not source.size:
                     yield self.create_text_message(f"ファイル '{file_name}' の内容が空です。別のファイルを指定してください。")
                     return
-                if len(file_bytes) > self.MAX_UPLOAD_BYTES:
-                    limit_mb = max(1, math.ceil(self.MAX_UPLOAD_BYTES / (1024 * 1024)))
-                    yield self.create_text_message(
-                        f"ファイル '{file_name}' のサイズが大きすぎます。{limit_mb}MB 以下のファイルを指定してください。"
-                    )
+                if source.size > self.MAX_UPLOAD_BYTES:
+                    yield self.create_text_message(self._too_large_message(file_name))
                     return
 
-                files = {
-                    "file": (file_name, file_bytes, mime_type or "application/octet-stream"),
-                }
-
-                try:
-                    response = requests.post(
-                        url,
-                        headers=headers,
-                        files=files,
-                        timeout=timeout_seconds,
-                    )
-                    response.raise_for_status()
-                except Timeout:
-                    yield self.create_text_message("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
-                    return
-                except HTTPError as error:
-                    status_code = error.response.status_code if getattr(error, "response", None) else "unknown"
-                    if status_code == 401:
-                        yield self.create_text_message("kintone APIの認証に失敗しました。APIトークンを確認してください。")
-                    elif status_code == 403:
-                        yield self.create_text_message("kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。")
-                    elif status_code == 404:
-                        yield self.create_text_message("kintone APIのエンドポイントが見つかりません。ドメイン設定を確認してください。")
-                    elif isinstance(status_code, int) and status_code >= 500:
-                        yield self.create_text_message(f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。")
+            results: List[Dict[str, Any] | None] = [None] * len(files_to_upload)
+            pending = list(range(len(files_to_upload)))
+            duplicates: Dict[int, int] = {}
+            # 一時保管領域の fileKey は1件のレコードにしか添付できない。records_data を生成する場合は
+            # ファイルごとに添付先が決まるため、同じ内容でも fileKey を共有しない
+            dedupe = deduplicate and records_mapping_param is None
+            if deduplicate and not dedupe:
+                yield self.create_log_message(
+                    label="Upload deduplication skipped",
+                    data={"reason": "records_mapping attaches each fileKey to its own record"},
+                )
+            if dedupe:
+                # 内容のハッシュが同じファイルは、この呼び出しの中で最初の1件だけアップロードする
+                pending = []
+                first_index: Dict[str, int] = {}
+                for index, (source, file_name, mime_type) in enumerate(files_to_upload):
+                    key = upload_dedup_key(content_digest(source), file_name, mime_type or "application/octet-stream")
+                    if key in first_index:
+                        duplicates[index] = first_index[key]
+                        continue
+                    first_index[key] = index
+                    pending.append(index)
+
+            def run_upload(index: int) -> Dict[str, Any]:
+                source, file_name, mime_type = files_to_upload[index]
+                return self._upload_one(client, url, headers, source, file_name, mime_type, timeout_seconds)
+
+            workers = min(parallel_workers, len(pending))
+            if workers > 1:
+                yield self.create_log_message(
+                    label="Parallel upload",
+                    data={"file_count": len(pending), "parallel_workers": workers},
+                )
+            if len(pending) == 1:
+                results[pending[0]] = run_upload(pending[0])
+            elif pending:
+                # 同時リクエスト数はドメインごとのリミッターでも制限される。map は入力順に結果を返す
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for index, result in zip(pending, executor.map(run_upload, pending)):
+                        results[index] = result
+
+            if dedupe:
+                for index, original in duplicates.items():
+                    result = results[original]
+                    if result is not None and result["status"] == "success":
+                        results[index] = self._reused_result(files_to_upload[index], result["detail"]["fileKey"])
                     else:
-                        yield self.create_text_message(f"kintone APIリクエスト中にHTTPエラーが発生しました: {str(error)}")
-                    return
-                except RequestException as error:
-                    yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(error)}")
-                    return
-
-                try:
-                    response_data = response.json()
-                except json.JSONDecodeError:
-                    yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
-                    return
-
-                file_key = response_data.get("fileKey")
-                if not file_key:
-                    yield self.create_text_message("ファイルはアップロードされましたが、fileKeyを取得できませんでした。")
-                    return
-
+                        results[index] = result
                 yield self.create_log_message(
-                    label="Uploaded file",
-                    data={
-                        "file_name": file_name,
-                        "size": len(file_bytes),
-                        "mime_type": mime_type or "application/octet-stream",
-                        "status_code": response.status_code,
-                    },
+                    label="Upload deduplication",
+                    data={"uploaded": len(pending), "duplicates_in_request": len(duplicates)},
                 )
 
-                uploaded_files.append({"fileKey": str(file_key)})
-                uploaded_details.append(
-                    {
-                        "fileKey": str(file_key),
-                        "file_name": file_name,
-                        "size": len(file_bytes),
-                        "mime_type": mime_type or "application/octet-stream",
-                        "status_code": response.status_code,
-                    }
+            if len(results) == 1 and results[0]["status"] == "error":
+                # 単一ファイルの失敗は従来どおりのメッセージで返す
+                yield self.create_text_message(results[0]["message"])
+                return
+
+            uploaded_files: List[Dict[str, Any]] = []
+            uploaded_details: List[Dict[str, Any]] = []
+            failed_files: List[Dict[str, Any]] = []
+            for index, result in enumerate(results):
+                if result["status"] == "error":
+                    failed_files.append({"index": index, "file_name": result["file_name"], "message": result["message"]})
+                    continue
+                detail = result["detail"]
+                yield self.create_log_message(
+                    label="Reused file key" if detail.get("reused") else "Uploaded file",
+                    data={key: detail[key] for key in detail if key != "fileKey"},
                 )
-                file_names.append(file_name)
+                uploaded_files.append({"fileKey": detail["fileKey"]})
+                uploaded_details.append(detail)
 
             yield self.create_variable_message("uploaded_files", uploaded_files)
 
@@ -188,8 +217,16 @@ class KintoneUploadFileTool(Tool):
                 "uploaded_files": uploaded_files,
                 "details": uploaded_details,
             }
+            if failed_files:
+                json_payload["failed_files"] = failed_files
 
-            if records_mapping_param is not None:
+            if records_mapping_param is not None and failed_files:
+                # 一部のファイルが欠けた状態で添付先を割り当てると対応関係がずれるため、records_data は生成しない
+                yield self.create_log_message(
+                    label="Records mapping skipped",
+                    data={"failed_count": len(failed_files)},
+                )
+            elif records_mapping_param is not None:
                 try:
                     records_payload = self._build_records_payload(records_mapping_param, uploaded_files)
                 except ValueError as error:
@@ -216,24 +253,125 @@ class KintoneUploadFileTool(Tool):
                 "kintone upload summary",
                 {
                     "file_count": len(uploaded_files),
+                    "failed_count": len(failed_files),
                     "details": uploaded_details,
-                    "has_records_payload": records_mapping_param is not None,
+                    "has_records_payload": records_mapping_param is not None and not failed_files,
                 },
+                client,
             )
 
-            if len(uploaded_files) == 1:
+            file_names = [detail["file_name"] for detail in uploaded_details]
+            if len(uploaded_files) == 1 and not failed_files:
                 yield self.create_text_message(
                     f"ファイル '{file_names[0]}' のアップロードに成功しました。fileKey: {uploaded_files[0]['fileKey']}"
                 )
-            else:
+            elif uploaded_files:
                 joined_keys = ", ".join(item["fileKey"] for item in uploaded_files)
                 joined_names = ", ".join(file_names)
                 yield self.create_text_message(
                     f"{len(uploaded_files)}件のファイルをアップロードしました。ファイル: {joined_names} / fileKeys: {joined_keys}"
                 )
 
+            if failed_files:
+                failure_lines = [f"- {item['file_name']}: {item['message']}" for item in failed_files]
+                message = f"{len(results)} 件中 {len(failed_files)} 件のファイルのアップロードに失敗しました。\n" + "\n".join(
+                    failure_lines
+                )
+                if records_mapping_param is not None:
+                    message += "\n失敗したファイルがあるため records_data は生成していません。"
+                yield self.create_text_message(message)
+
         except Exception as error:  # pylint: disable=broad-except
             yield self.create_text_message(f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(error)}")
+        finally:
+            for source, _, _ in files_to_upload:
+                source.close()
+
+    @staticmethod
+    def _reused_result(entry: Tuple[FileSource, str, str | None], file_key: str) -> Dict[str, Any]:
+        """同じ呼び出しでアップロード済みの同一ファイルの fileKey を使う場合の結果。"""
+
+        source, file_name, mime_type = entry
+        return {
+            "status": "success",
+            "file_name": file_name,
+            "detail": {
+                "fileKey": file_key,
+                "file_name": file_name,
+                "size": source.size,
+                "mime_type": mime_type or "application/octet-stream",
+                "status_code": None,
+                "reused": "duplicate",
+            },
+        }
+
+    def _upload_one(
+        self,
+        client: KintoneClient,
+        url: str,
+        headers: Dict[str, str],
+        source: FileSource,
+        file_name: str,
+        mime_type: str | None,
+        timeout_seconds: float,
+    ) -> Dict[str, Any]:
+        """1ファイルをアップロードし、成功時は detail、失敗時は message を含む結果を返す（例外は送出しない）。"""
+
+        content_type = mime_type or "application/octet-stream"
+        # ファイル全体を展開せず、チャンクごとに multipart 本文を生成しながら送信する
+        body = MultipartFileBody(source, filename=file_name, content_type=content_type)
+
+        def failure(message: str) -> Dict[str, Any]:
+            return {"status": "error", "file_name": file_name, "message": message}
+
+        try:
+            response = client.post(
+                url,
+                headers={**headers, "Content-Type": body.content_type},
+                data=body,
+                timeout=timeout_seconds,
+            )
+            response.raise_for_status()
+        except Timeout:
+            return failure("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
+        except HTTPError as error:
+            status_code = error.response.status_code if getattr(error, "response", None) else "unknown"
+            if status_code == 401:
+                return failure("kintone APIの認証に失敗しました。APIトークンを確認してください。")
+            if status_code == 403:
+                return failure("kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。")
+            if status_code == 404:
+                return failure("kintone APIのエンドポイントが見つかりません。ドメイン設定を確認してください。")
+            if isinstance(status_code, int) and status_code >= 500:
+                return failure(f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。")
+            return failure(f"kintone APIリクエスト中にHTTPエラーが発生しました: {str(error)}")
+        except RequestException as error:
+            return failure(f"kintone APIへの接続中にエラーが発生しました: {str(error)}")
+
+        try:
+            response_data = response.json()
+        except json.JSONDecodeError:
+            return failure("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+
+        file_key = response_data.get("fileKey")
+        if not file_key:
+            return failure("ファイルはアップロードされましたが、fileKeyを取得できませんでした。")
+
+        return {
+            "status": "success",
+            "file_name": file_name,
+            "detail": {
+                "fileKey": str(file_key),
+                "file_name": file_name,
+                "size": source.size,
+                "mime_type": content_type,
+                "status_code": response.status_code,
+            },
+        }
+
+    def _too_large_message(self, file_name: str) -> str:
+        limit_mb = max(1, math.ceil(self.MAX_UPLOAD_BYTES / (1024 * 1024)))
+        return f"ファイル '{file_name}' のサイズが大きすぎます。{limit_mb}MB 以下のファイルを指定してください。"
 
     def _parse_file_names(
         self,
@@ -301,7 +439,7 @@ class KintoneUploadFileTool(Tool):
         self,
         payload: Any,
         override_names: List[str] | None,
-    ) -> List[Tuple[bytes, str, str | None]]:
+    ) -> List[Tuple[FileSource, str, str | None]]:
         """アップロード対象のファイル群を正規化する。"""
 
         if isinstance(payload, list):
@@ -309,10 +447,16 @@ class KintoneUploadFileTool(Tool):
                 return []
             if override_names and len(override_names) != len(payload):
                 raise ValueError("file_names パラメータはアップロードするファイル数と同じ数のファイル名を指定してください。")
-            return [
-                self._normalize_single_file(item, override_names[idx] if override_names else None)
-                for idx, item in enumerate(payload)
-            ]
+            prepared: List[Tuple[FileSource, str, str | None]] = []
+            try:
+                for idx, item in enumerate(payload):
+                    prepared.append(self._normalize_single_file(item, override_names[idx] if override_names else None))
+            except BaseException:
+                # 途中で失敗した場合は、それまでにダウンロードした一時ファイルを解放する
+                for source, _, _ in prepared:
+                    source.close()
+                raise
+            return prepared
 
         if override_names and len(override_names) != 1:
             raise ValueError("file_names パラメータが不正です。単一ファイルの場合は1件のみ指定してください。")
@@ -323,46 +467,46 @@ class KintoneUploadFileTool(Tool):
         self,
         payload: Any,
         file_name_override: str | None = None,
-    ) -> Tuple[bytes, str, str | None]:
-        """単一ファイル表現をバイト列へ変換する。"""
+    ) -> Tuple[FileSource, str, str | None]:
+        """単一ファイル表現を、送信時にチャンク単位で読み出せるファイル内容へ変換する。"""
 
         mapping = self._coerce_file_payload(payload)
         if mapping is not None:
             meta = mapping.get("meta") or {}
             data_field = mapping.get("data")
 
+            mime_type = meta.get("mime_type") or mapping.get("mime_type")
+            filename_candidate = (
+                file_name_override
+                or meta.get("filename")
+                or mapping.get("filename")
+                or "uploaded-file"
+            )
+            filename_candidate = self._normalize_filename(filename_candidate)
+
             if data_field is None:
-                file_bytes = self._download_file_payload(mapping)
+                source: FileSource = self._download_file_payload(mapping, filename_candidate)
             else:
                 if isinstance(data_field, str):
                     try:
-                        file_bytes = base64.b64decode(data_field, validate=True)
+                        source = Base64Source(data_field)
                     except (ValueError, binascii.Error):
                         raise ValueError("ファイルデータをbase64として解釈できませんでした。") from None
                 elif isinstance(data_field, bytes):
-                    file_bytes = data_field
+                    source = BytesSource(data_field)
                 else:
                     raise ValueError("upload_fileのdataフィールド形式が不明です。base64文字列で指定してください。")
 
-            mime_type = meta.get("mime_type") or mapping.get("mime_type")
-            filename_candidate = (
-                file_name_override
-                or meta.get("filename")
-                or mapping.get("filename")
-                or "uploaded-file"
-            )
-            filename_candidate = self._normalize_filename(filename_candidate)
-
-            return file_bytes, filename_candidate, mime_type
+            return source, filename_candidate, mime_type
 
         if isinstance(payload, str):
             try:
-                file_bytes = base64.b64decode(payload, validate=True)
+                source = Base64Source(payload)
             except (ValueError, binascii.Error):
                 raise ValueError("upload_fileをbase64文字列として解析できませんでした。") from None
 
             filename = self._normalize_filename(file_name_override or "uploaded-file")
-            return file_bytes, filename, None
+            return source, filename, None
 
         raise ValueError("upload_fileパラメータの形式がサポートされていません。")
 
@@ -388,16 +532,24 @@ class KintoneUploadFileTool(Tool):
 
         return None
 
-    def _download_file_payload(self, payload: Dict[str, Any]) -> bytes:
-        """Difyのtool_fileなど、URL経由で渡されるファイルをダウンロードする。"""
+    def _download_file_payload(self, payload: Dict[str, Any], file_name: str) -> FileSource:
+        """Difyのtool_fileなど、URL経由で渡されるファイルをダウンロードする。
+
+        内容は一定サイズまでメモリ、それを超えると一時ファイルへ少しずつ書き出し、全体を bytes として保持しない。
+        """
 
         url = payload.get("url") or payload.get("remote_url")
         if not url:
             raise ValueError("upload_fileにdataフィールドが存在せず、ダウンロード用URLも指定されていません。")
 
         try:
-            response = requests.get(url, timeout=30)
+            # Dify のファイル配信 URL は kintone ではないため、kintone 用のリミッターやリトライを通さない
+            response = get_session(url).get(url, timeout=30, stream=True)
             response.raise_for_status()
+            with response:
+                source = spool_response(response, self.MAX_UPLOAD_BYTES)
+        except UploadTooLargeError:
+            raise ValueError(self._too_large_message(file_name)) from None
         except Timeout:
             raise ValueError("ファイルのダウンロードがタイムアウトしました。再度お試しください。") from None
         except HTTPError as error:
@@ -406,10 +558,10 @@ class KintoneUploadFileTool(Tool):
         except RequestException as error:
             raise ValueError(f"ファイルのダウンロード中にエラーが発生しました: {str(error)}") from None
 
-        content = response.content
-        if not content:
+        if not source.size:
+            source.close()
             raise ValueError("ダウンロードしたファイルの内容が空でした。")
-        return content
+        return source
 
     def _normalize_filename(self, filename: str) -> str:
         """kintoneに渡すファイル名を正規化する。"""
@@ -1,22 +1,30 @@
 import ast
 import json
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple
 
-import requests
 from requests.exceptions import RequestException, Timeout, HTTPError
 
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
+    MAX_TRANSACTION_RECORDS,
+    RECORDS_PER_WRITE,
+    WRITE_MODE_TRANSACTION,
+    KintoneClient,
+    build_bulk_record_requests,
     build_headers,
+    describe_http_error,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
     normalize_api_tokens,
     normalize_app_id,
     normalize_domain,
+    resolve_parallel_workers,
     resolve_timeout,
     resolve_tool_parameter,
 )
@@ -96,115 +104,112 @@ class KintoneUpsertRecordsTool(Tool):
             yield self.create_text_message("request_timeout には正の数値を指定してください。")
             return
 
+        try:
+            parallel_workers = resolve_parallel_workers(tool_parameters.get("parallel_workers"))
+        except ValueError:
+            yield self.create_text_message("parallel_workers には1以上の整数を指定してください。")
+            return
+
+        write_mode = tool_parameters.get("write_mode") or "chunked"
+        if write_mode not in ("chunked", WRITE_MODE_TRANSACTION):
+            yield self.create_text_message("write_mode には chunked または transaction を指定してください。")
+            return
+
+        if write_mode == WRITE_MODE_TRANSACTION:
+            yield from self._invoke_transaction(
+                kintone_domain,
+                kintone_api_token,
+                kintone_app_id,
+                records_json["records"],
+                update_key_count,
+                timeout_seconds,
+            )
+            return
+
         # APIリクエスト用のヘッダー設定
         headers = build_headers(kintone_api_token, method_override="PUT")
 
         # kintone のレコード一括更新/追加 API のエンドポイント
         url = f"{kintone_domain}/k/v1/records.json"
+        client = get_client(kintone_domain)
 
         try:
-            # リクエスト用のJSONボディを作成
-            request_body = {
-                "app": kintone_app_id,
-                "records": records_json["records"],
-                "upsert": True  # 常にupsertモードで実行
-            }
+            all_records = records_json["records"]
+            records_count = len(all_records)
+
+            # kintone 一括更新APIの上限（100件）ごとにチャンクへ分割する
+            chunks = [
+                (start, all_records[start : start + RECORDS_PER_WRITE])
+                for start in range(0, records_count, RECORDS_PER_WRITE)
+            ]
+            if not chunks:
+                yield self.create_text_message("レコードデータが空です。records に1件以上のレコードを指定してください。")
+                return
 
-            records_count = len(request_body["records"])
-            if records_count > 100:
-                yield self.create_text_message(
-                    "kintone 一括更新APIで送信できるレコード数は最大100件です。リクエストを分割してください。"
+            if len(chunks) > 1:
+                yield self.create_log_message(
+                    label="Upsert chunking",
+                    data={
+                        "record_count": records_count,
+                        "chunk_size": RECORDS_PER_WRITE,
+                        "chunk_count": len(chunks),
+                        "parallel_workers": min(parallel_workers, len(chunks)),
+                    },
                 )
-                return
 
-            # APIリクエストの実行
-            try:
-                response = requests.post(
+            def run_chunk(chunk: Tuple[int, List[Dict[str, Any]]]) -> Dict[str, Any]:
+                start, chunk_records = chunk
+                return self._send_chunk(
+                    client,
                     url,
-                    headers=headers,
-                    json=request_body,
-                    timeout=timeout_seconds
+                    headers,
+                    kintone_app_id,
+                    chunk_records,
+                    start,
+                    timeout_seconds,
                 )
-                # HTTPエラーがあれば例外を発生
-                response.raise_for_status()
-            except Timeout:
-                yield self.create_text_message("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
-                return
-            except HTTPError as e:
-                # HTTPステータスコードに基づいたエラーメッセージ
-                status_code = e.response.status_code if hasattr(e, 'response') else 'unknown'
-                error_message = "kintone APIリクエスト中にエラーが発生しました"
-
-                # エラーレスポンスのJSONデータを解析
-                error_payload = None
-                try:
-                    error_payload = e.response.json()
-                    if "message" in error_payload:
-                        error_message = f"{error_message}: {error_payload['message']}"
-                except (json.JSONDecodeError, AttributeError):
-                    pass
-
-                structured_error = {
-                    "status": status_code,
-                    "message": error_message,
-                    "details": error_payload,
-                }
-                if status_code == 401:
-                    yield self.create_text_message("kintone APIの認証に失敗しました。APIトークンを確認してください。")
-                elif status_code == 403:
-                    yield self.create_text_message("kintone APIへのアクセス権限がありません。APIトークンの権限を確認してください。")
-                elif status_code == 404:
-                    yield self.create_text_message("指定されたkintoneアプリが見つかりません。アプリIDを確認してください。")
-                elif isinstance(status_code, int) and status_code >= 500:
-                    yield self.create_text_message(f"kintoneサーバーでエラーが発生しました（ステータスコード: {status_code}）。")
-                else:
-                    yield self.create_text_message(f"{error_message} （ステータスコード: {status_code}）")
-                yield self.create_json_message({"error": structured_error})
-                yield log_response(self, "kintone upsert error", structured_error)
-                return
-            except RequestException as e:
-                yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
-                return
 
-            # レスポンスのJSONデータを解析
-            try:
-                data = response.json()
-            except json.JSONDecodeError:
-                yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+            if len(chunks) == 1:
+                chunk_results = [run_chunk(chunks[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(parallel_workers, len(chunks))) as executor:
+                    # map は入力順に結果を返すため、チャンク結果はレコード順に並ぶ
+                    chunk_results = list(executor.map(run_chunk, chunks))
+
+            if len(chunk_results) == 1 and chunk_results[0]["status"] == "error":
+                # 単一リクエストの失敗は従来どおりのメッセージで返す
+                failure = chunk_results[0]
+                yield self.create_text_message(failure["message"])
+                if failure.get("error") is not None:
+                    yield self.create_json_message({"error": failure["error"]})
+                    yield log_response(self, "kintone upsert error", failure["error"], client)
                 return
 
-            yield log_response(self, "kintone upsert response", data)
-
-            # 処理結果の取得
             inserted_count = 0
             updated_count = 0
-            operations_counted = False
-
-            records_info = data.get("records")
-            if isinstance(records_info, list):
-                for item in records_info:
-                    if not isinstance(item, dict):
-                        continue
-                    op = item.get("operation")
-                    if not isinstance(op, str):
-                        continue
-                    normalized = op.strip().upper()
-                    if normalized == "INSERT":
-                        inserted_count += 1
-                        operations_counted = True
-                    elif normalized == "UPDATE":
-                        updated_count += 1
-                        operations_counted = True
-
-            if not operations_counted:
-                ids = data.get("ids")
-                revisions = data.get("revisions")
-                if isinstance(ids, list):
-                    inserted_count = len(ids)
-                if isinstance(revisions, list):
-                    updated_count = len(revisions)
-                if inserted_count == 0 and updated_count == 0 and isinstance(records_info, list):
-                    updated_count = len(records_info)
+            failed_indexes: List[int] = []
+            aggregated_records: List[Any] = []
+            for result in chunk_results:
+                if result["status"] == "success":
+                    chunk_inserted, chunk_updated = self._count_operations(result["response"])
+                    inserted_count += chunk_inserted
+                    updated_count += chunk_updated
+                    aggregated_records.extend(self._align_chunk_records(result["response"], result["count"]))
+                else:
+                    failed_indexes.extend(range(result["start_index"], result["start_index"] + result["count"]))
+                    aggregated_records.extend([None] * result["count"])
+
+            if len(chunk_results) == 1:
+                data = chunk_results[0]["response"]
+            else:
+                data = {"records": aggregated_records}
+
+            yield log_response(
+                self,
+                "kintone upsert response",
+                data if len(chunk_results) == 1 else {"chunks": self._summarize_chunks(chunk_results)},
+                client,
+            )
 
             total_processed = inserted_count + updated_count
 
@@ -214,27 +219,271 @@ class KintoneUpsertRecordsTool(Tool):
                 "requested": records_count,
                 "with_update_key": update_key_count,
             }
+            if len(chunk_results) > 1:
+                result_payload["chunks"] = len(chunk_results)
+                result_payload["failed"] = len(failed_indexes)
             yield self.create_variable_message("upsert_result", result_payload)
             yield self.create_variable_message("response", data)
-            yield self.create_json_message(
-                {
-                    "app_id": kintone_app_id,
-                    "processed": result_payload,
-                    "raw_response": data,
-                }
-            )
+
+            json_payload: Dict[str, Any] = {
+                "app_id": kintone_app_id,
+                "processed": result_payload,
+                "raw_response": data,
+            }
+            if len(chunk_results) > 1:
+                json_payload["failed_indexes"] = failed_indexes
+                json_payload["chunks"] = self._summarize_chunks(chunk_results)
+            yield self.create_json_message(json_payload)
 
             if total_processed > 0:
                 payload_text = f"アップサート完了: 追加 {inserted_count} 件 / 更新 {updated_count} 件 (リクエスト: {records_count} 件)"
+                if len(chunk_results) > 1:
+                    payload_text += f" / 分割送信: {len(chunk_results)} 回"
                 yield self.create_text_message(payload_text)
-            else:
+            elif not failed_indexes:
                 yield self.create_text_message("レコードの更新/追加処理は完了しましたが、処理されたレコードはありませんでした。")
 
+            if failed_indexes:
+                failed_messages = sorted({result["message"] for result in chunk_results if result["status"] == "error"})
+                yield self.create_text_message(
+                    f"{records_count} 件中 {len(failed_indexes)} 件の更新/追加に失敗しました"
+                    f"（レコード番号 {self._format_index_ranges(failed_indexes)}、0始まり）。\n"
+                    + "\n".join(failed_messages)
+                )
+
         except Exception as e:
             # 予期しないエラーの処理
             error_message = f"kintone API 呼び出し中に予期しないエラーが発生しました: {str(e)}"
             yield self.create_text_message(error_message)
-            
+
+    def _invoke_transaction(
+        self,
+        kintone_domain: str,
+        kintone_api_token: str,
+        app_id: int,
+        records: List[Dict[str, Any]],
+        update_key_count: int,
+        timeout_seconds: float,
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """bulkRequest.json で全チャンクを1回のリクエストとして送信する（全件成功か全件失敗）。"""
+
+        records_count = len(records)
+        if records_count == 0:
+            yield self.create_text_message("レコードデータが空です。records に1件以上のレコードを指定してください。")
+            return
+        if records_count > MAX_TRANSACTION_RECORDS:
+            yield self.create_text_message(
+                f"write_mode が transaction の場合、一度に送信できるレコード数は最大{MAX_TRANSACTION_RECORDS}件です"
+                f"（指定: {records_count} 件）。レコードを分割するか write_mode を chunked にしてください。"
+            )
+            return
+
+        sub_requests = build_bulk_record_requests("PUT", app_id, records, upsert=True)
+        yield self.create_log_message(
+            label="Upsert transaction",
+            data={"record_count": records_count, "sub_requests": len(sub_requests)},
+        )
+
+        client = get_client(kintone_domain)
+        try:
+            response = client.post(
+                f"{kintone_domain}/k/v1/bulkRequest.json",
+                headers=build_headers(kintone_api_token),
+                json={"requests": sub_requests},
+                timeout=timeout_seconds,
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Timeout:
+            # タイムアウト時はkintone側で確定したかどうかを判別できない
+            yield self.create_text_message(
+                "kintone APIへのリクエストがタイムアウトしました。処理結果が不明なため、アプリの状態を確認してから再実行してください。"
+            )
+            return
+        except HTTPError as e:
+            message, structured_error = describe_http_error(e, record_count=records_count)
+            yield self.create_text_message(f"{message}\nトランザクションのため、いずれのレコードも更新/追加されていません。")
+            yield self.create_json_message({"error": structured_error})
+            yield log_response(self, "kintone upsert error", structured_error, client)
+            return
+        except json.JSONDecodeError:
+            yield self.create_text_message("kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。")
+            return
+        except RequestException as e:
+            yield self.create_text_message(f"kintone APIへの接続中にエラーが発生しました: {str(e)}")
+            return
+
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            results = []
+
+        inserted_count = 0
+        updated_count = 0
+        aggregated_records: List[Any] = []
+        for sub_request, result in zip(sub_requests, results + [{}] * (len(sub_requests) - len(results))):
+            result = result if isinstance(result, dict) else {}
+            chunk_inserted, chunk_updated = self._count_operations(result)
+            inserted_count += chunk_inserted
+            updated_count += chunk_updated
+            aggregated_records.extend(self._align_chunk_records(result, len(sub_request["payload"]["records"])))
+
+        yield log_response(self, "kintone upsert response", {"results": results}, client)
+
+        result_payload = {
+            "add": inserted_count,
+            "updated": updated_count,
+            "requested": records_count,
+            "with_update_key": update_key_count,
+            "write_mode": WRITE_MODE_TRANSACTION,
+            "sub_requests": len(sub_requests),
+        }
+        raw_response = {"records": aggregated_records}
+        yield self.create_variable_message("upsert_result", result_payload)
+        yield self.create_variable_message("response", raw_response)
+        yield self.create_json_message(
+            {
+                "app_id": app_id,
+                "processed": result_payload,
+                "raw_response": raw_response,
+            }
+        )
+        yield self.create_text_message(
+            f"アップサート完了（トランザクション）: 追加 {inserted_count} 件 / 更新 {updated_count} 件"
+            f" (リクエスト: {records_count} 件 / bulkRequest 内 {len(sub_requests)} 件)"
+        )
+
+    def _send_chunk(
+        self,
+        client: KintoneClient,
+        url: str,
+        headers: Dict[str, str],
+        app_id: int,
+        records: List[Dict[str, Any]],
+        start_index: int,
+        timeout_seconds: float,
+    ) -> Dict[str, Any]:
+        """1チャンク（最大100件）をupsertし、成功/失敗を結果辞書で返す。"""
+
+        result: Dict[str, Any] = {"start_index": start_index, "count": len(records)}
+
+        # リクエスト用のJSONボディを作成
+        request_body = {
+            "app": app_id,
+            "records": records,
+            "upsert": True  # 常にupsertモードで実行
+        }
+
+        # APIリクエストの実行
+        try:
+            response = client.post(
+                url,
+                headers=headers,
+                json=request_body,
+                timeout=timeout_seconds
+            )
+            # HTTPエラーがあれば例外を発生
+            response.raise_for_status()
+        except Timeout:
+            return {**result, "status": "error", "error": None, "message": "kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。"}
+        except HTTPError as e:
+            message, structured_error = describe_http_error(e)
+            return {**result, "status": "error", "error": structured_error, "message": message}
+        except RequestException as e:
+            return {**result, "status": "error", "error": None, "message": f"kintone APIへの接続中にエラーが発生しました: {str(e)}"}
+
+        # レスポンスのJSONデータを解析
+        try:
+            data = response.json()
+        except json.JSONDecodeError:
+            return {**result, "status": "error", "error": None, "message": "kintone APIからの応答を解析できませんでした。無効なJSONレスポンスです。"}
+
+        return {**result, "status": "success", "response": data}
+
+    @staticmethod
+    def _count_operations(data: Dict[str, Any]) -> Tuple[int, int]:
+        """upsert応答から追加件数と更新件数を数える。"""
+
+        inserted_count = 0
+        updated_count = 0
+        operations_counted = False
+
+        records_info = data.get("records")
+        if isinstance(records_info, list):
+            for item in records_info:
+                if not isinstance(item, dict):
+                    continue
+                op = item.get("operation")
+                if not isinstance(op, str):
+                    continue
+                normalized = op.strip().upper()
+                if normalized == "INSERT":
+                    inserted_count += 1
+                    operations_counted = True
+                elif normalized == "UPDATE":
+                    updated_count += 1
+                    operations_counted = True
+
+        if not operations_counted:
+            ids = data.get("ids")
+            revisions = data.get("revisions")
+            if isinstance(ids, list):
+                inserted_count = len(ids)
+            if isinstance(revisions, list):
+                updated_count = len(revisions)
+            if inserted_count == 0 and updated_count == 0 and isinstance(records_info, list):
+                updated_count = len(records_info)
+
+        return inserted_count, updated_count
+
+    @staticmethod
+    def _align_chunk_records(data: Dict[str, Any], count: int) -> List[Any]:
+        """チャンク応答の records（id/revision/operation）を入力件数に揃えて返す。"""
+
+        records_info = data.get("records")
+        if not isinstance(records_info, list):
+            records_info = []
+        aligned = list(records_info[:count])
+        aligned.extend([None] * (count - len(aligned)))
+        return aligned
+
+    @staticmethod
+    def _summarize_chunks(chunk_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """チャンクごとの処理結果をログ/出力向けに要約する。"""
+
+        summary: List[Dict[str, Any]] = []
+        for index, result in enumerate(chunk_results):
+            item: Dict[str, Any] = {
+                "chunk": index,
+                "start_index": result["start_index"],
+                "count": result["count"],
+                "status": result["status"],
+            }
+            if result["status"] == "error":
+                item["message"] = result["message"]
+                if result.get("error") is not None:
+                    item["error"] = result["error"]
+            summary.append(item)
+        return summary
+
+    @staticmethod
+    def _format_index_ranges(indexes: List[int]) -> str:
+        """連続するインデックスを "0-99, 200-249" のような範囲表記にまとめる。"""
+
+        ranges: List[str] = []
+        start = previous = None
+        for index in indexes:
+            if start is None:
+                start = previous = index
+                continue
+            if index == previous + 1:
+                previous = index
+                continue
+            ranges.append(f"{start}-{previous}" if start != previous else str(start))
+            start = previous = index
+        if start is not None:
+            ranges.append(f"{start}-{previous}" if start != previous else str(start))
+        return ", ".join(ranges)
+
     def _parse_records_data(self, payload: Any) -> Dict[str, Any]:
         """
         records_dataパラメータを辞書形式へ正規化する。
@@ -8,15 +8,14 @@ import re
 from collections.abc import Generator
 from typing import Any, Dict, List, Tuple
 
-import requests
 from requests.exceptions import HTTPError, RequestException, Timeout
 
 from dify_plugin import Tool
-from dify_plugin.core.runtime import Session
-from dify_plugin.entities.tool import ToolInvokeMessage, ToolRuntime
+from dify_plugin.entities.tool import ToolInvokeMessage
 
 from .common import (
-    build_headers,
+    KintoneClient,
+    get_client,
     is_blank,
     log_parameters,
     log_response,
@@ -25,15 +24,12 @@ from .common import (
     normalize_domain,
     resolve_tool_parameter,
 )
+from .field_cache import fetch_field_definitions
 
 
 class KintoneValidateRecordDataTool(Tool):
     """record_data文字列の構文とフィールド型整合性を検証するツール。"""
 
-    def __init__(self, runtime: ToolRuntime, session: Session) -> None:
-        super().__init__(runtime, session)
-        self._fields_cache: Dict[tuple[str, int], Dict[str, Any]] = {}
-
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         raw_domain = resolve_tool_parameter(self, tool_parameters, "kintone_domain")
         if is_blank(raw_domain):
@@ -96,8 +92,9 @@ class KintoneValidateRecordDataTool(Tool):
             },
         )
 
+        client = get_client(kintone_domain)
         try:
-            field_types = self._get_app_fields(kintone_domain, normalized_app_id, kintone_api_token)
+            field_types = self._get_app_fields(client, kintone_domain, normalized_app_id, kintone_api_token)
         except Timeout:
             yield self.create_text_message("kintone APIへのリクエストがタイムアウトしました。ネットワーク接続を確認してください。")
             return
@@ -140,6 +137,7 @@ class KintoneValidateRecordDataTool(Tool):
             self,
             "record_data validation",
             {"field_count": len(record_json)},
+            client,
         )
 
     def _validate_record_structure(self, record_data: Dict[str, Any]) -> List[str]:
@@ -164,34 +162,11 @@ class KintoneValidateRecordDataTool(Tool):
 
         return errors
 
-    def _get_app_fields(self, domain: str, app_id: int, api_token: str) -> Dict[str, str]:
+    def _get_app_fields(self, client: KintoneClient, domain: str, app_id: int, api_token: str) -> Dict[str, str]:
         """kintoneフォーム設定からフィールドタイプ情報を取得する。"""
 
-        cache_key = (domain, app_id)
-        cached = self._fields_cache.get(cache_key)
-        if cached is not None:
-            return cached
-
-        headers = build_headers(api_token, method_override="GET")
-        url = f"https://{domain}/k/v1/app/form/fields.json"
-        request_body = {"app": app_id}
-
-        response = requests.post(
-            url,
-            headers=headers,
-            json=request_body,
-            timeout=10,
-        )
-        response.raise_for_status()
-
-        data = response.json()
-        properties = data.get("properties", {})
-        if not isinstance(properties, dict) or not properties:
-            raise ValueError("kintone アプリにフィールド定義が存在しません。アプリ設定を確認してください。")
-
-        type_map = {field_code: info.get("type", "UNKNOWN") for field_code, info in properties.items()}
-        self._fields_cache[cache_key] = type_map
-        return type_map
+        entry, _ = fetch_field_definitions(client, domain, app_id, api_token, timeout=10)
+        return {field_code: info.get("type", "UNKNOWN") for field_code, info in entry.properties.items()}
 
     def _validate_field_values(
         self, record_data: Dict[str, Any], field_types: Dict[str, str]
@@ -0,0 +1,508 @@
+"""
+where: kintone_integration/tools/query_parser.py
+what: kintone のクエリ構文を字句解析して構文木（AST）へ変換するパーサー
+why: 文字列リテラル内の語句を誤って書き換えずに、limit/offset の抽出や条件の追加、ミラー上での評価を行うため
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Union
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<string>"(?:[^"\\]|\\.)*")
+    |(?P<op>!=|<=|>=|=|<|>)
+    |(?P<lparen>\()
+    |(?P<rparen>\))
+    |(?P<comma>,)
+    |(?P<word>[^\s()"=!<>,]+)
+    """,
+    re.VERBOSE,
+)
+
+COMPARISON_OPERATORS = frozenset({"=", "!=", ">", "<", ">=", "<="})
+
+
+class QuerySyntaxError(ValueError):
+    """クエリ文字列を解析できない場合に送出する。"""
+
+
+class Token:
+    """字句解析の結果（種類, 文字列, 位置）。"""
+
+    __slots__ = ("kind", "text", "position")
+
+    def __init__(self, kind: str, text: str, position: int) -> None:
+        self.kind = kind
+        self.text = text
+        self.position = position
+
+    @property
+    def end(self) -> int:
+        return self.position + len(self.text)
+
+    def is_keyword(self, *keywords: str) -> bool:
+        return self.kind == "word" and self.text.lower() in keywords
+
+    def __repr__(self) -> str:
+        return f"Token({self.kind!r}, {self.text!r})"
+
+
+class Function:
+    """TODAY() や LOGINUSER() などのクエリ関数呼び出し。"""
+
+    __slots__ = ("name", "args")
+
+    def __init__(self, name: str, args: list[str]) -> None:
+        self.name = name
+        self.args = args
+
+    def to_query(self) -> str:
+        return f"{self.name}({', '.join(self.args)})"
+
+    def __repr__(self) -> str:
+        return self.to_query()
+
+
+Operand = Union[str, Function]
+
+
+class Comparison:
+    """`フィールドコード 演算子 値` の条件（in / not in の値はリスト）。"""
+
+    __slots__ = ("field", "operator", "value")
+
+    def __init__(self, field: str, operator: str, value: Operand | list[Operand]) -> None:
+        self.field = field
+        self.operator = operator
+        self.value = value
+
+    def to_query(self) -> str:
+        if isinstance(self.value, list):
+            values = ", ".join(_render_operand(value) for value in self.value)
+            return f"{self.field} {self.operator} ({values})"
+        return f"{self.field} {self.operator} {_render_operand(self.value)}"
+
+    def __repr__(self) -> str:
+        return f"Comparison({self.field!r}, {self.operator!r}, {self.value!r})"
+
+
+class EmptyCheck:
+    """`is empty` / `is not empty` の条件。"""
+
+    __slots__ = ("field", "negated")
+
+    def __init__(self, field: str, negated: bool) -> None:
+        self.field = field
+        self.negated = negated
+
+    def to_query(self) -> str:
+        return f"{self.field} is {'not ' if self.negated else ''}empty"
+
+    def __repr__(self) -> str:
+        return f"EmptyCheck({self.field!r}, negated={self.negated!r})"
+
+
+class BoolOp:
+    """and / or で結合された条件の並び。"""
+
+    __slots__ = ("operator", "operands")
+
+    def __init__(self, operator: str, operands: list["Condition"]) -> None:
+        self.operator = operator
+        self.operands = operands
+
+    def to_query(self) -> str:
+        # 優先順位を保つため、入れ子の and / or は常に括弧で囲む
+        return f" {self.operator} ".join(
+            f"({operand.to_query()})" if isinstance(operand, BoolOp) else operand.to_query()
+            for operand in self.operands
+        )
+
+    def __repr__(self) -> str:
+        return f"BoolOp({self.operator!r}, {self.operands!r})"
+
+
+Condition = Union[Comparison, EmptyCheck, BoolOp]
+
+
+class ParsedQuery:
+    """クエリ全体の構文木。parse_query の結果はキャッシュで共有されるため変更せず、with_* で複製する。"""
+
+    __slots__ = ("condition", "order_by", "limit", "offset")
+
+    def __init__(
+        self,
+        condition: Condition | None,
+        order_by: list[tuple[str, str]],
+        limit: int | None,
+        offset: int | None,
+    ) -> None:
+        self.condition = condition
+        self.order_by = order_by
+        self.limit = limit
+        self.offset = offset
+
+    def with_condition(self, extra: Condition) -> "ParsedQuery":
+        """既存の条件と and で結合した条件を持つ複製を返す。"""
+
+        if self.condition is None:
+            condition: Condition = extra
+        elif isinstance(self.condition, BoolOp) and self.condition.operator == "and":
+            condition = BoolOp("and", [*self.condition.operands, extra])
+        else:
+            condition = BoolOp("and", [self.condition, extra])
+        return ParsedQuery(condition, self.order_by, self.limit, self.offset)
+
+    def with_order_by(self, order_by: list[tuple[str, str]]) -> "ParsedQuery":
+        return ParsedQuery(self.condition, list(order_by), self.limit, self.offset)
+
+    def with_paging(self, limit: int | None, offset: int | None) -> "ParsedQuery":
+        return ParsedQuery(self.condition, self.order_by, limit, offset)
+
+    def to_query(self) -> str:
+        """構文木を kintone のクエリ文字列に戻す。"""
+
+        parts = []
+        if self.condition is not None:
+            parts.append(self.condition.to_query())
+        if self.order_by:
+            parts.append("order by " + ", ".join(f"{field} {direction}" for field, direction in self.order_by))
+        if self.limit is not None:
+            parts.append(f"limit {self.limit}")
+        if self.offset is not None:
+            parts.append(f"offset {self.offset}")
+        return " ".join(parts)
+
+    def __repr__(self) -> str:
+        return (
+            f"ParsedQuery(condition={self.condition!r}, order_by={self.order_by!r}, "
+            f"limit={self.limit!r}, offset={self.offset!r})"
+        )
+
+
+def tokenize(query: str) -> list[Token]:
+    """クエリ文字列をトークン列に分解する（空白は除く）。"""
+
+    tokens: list[Token] = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise QuerySyntaxError(f"クエリを解析できません（{position + 1}文字目: {query[position:position + 10]!r}）。")
+        kind = match.lastgroup or ""
+        if kind != "space":
+            tokens.append(Token(kind, match.group(), position))
+        position = match.end()
+    return tokens
+
+
+def unquote(text: str) -> str:
+    """ダブルクォートで囲まれた文字列リテラルを元の文字列に戻す。"""
+
+    return re.sub(r"\\(.)", r"\1", text[1:-1])
+
+
+def quote(value: str) -> str:
+    """文字列をクエリのダブルクォート文字列リテラルにする。"""
+
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _render_operand(value: Operand) -> str:
+    return value.to_query() if isinstance(value, Function) else quote(value)
+
+
+@lru_cache(maxsize=256)
+def parse_query(query: str) -> ParsedQuery:
+    """kintone のクエリ文字列を構文木に変換する（同じ文字列の解析結果はキャッシュする）。"""
+
+    return _Parser(tokenize(query or "")).parse()
+
+
+class QueryClauses:
+    """クエリを条件部・order by 句・limit・offset に分けた結果（各部分は元の記述を保つ）。"""
+
+    __slots__ = ("condition", "order_by", "limit", "offset")
+
+    def __init__(self, condition: str, order_by: str, limit: int | None, offset: int | None) -> None:
+        self.condition = condition
+        self.order_by = order_by
+        self.limit = limit
+        self.offset = offset
+
+    def to_query(self) -> str:
+        """limit/offset を除いたクエリ文字列を返す。"""
+
+        if not self.order_by:
+            return self.condition
+        return f"{self.condition} order by {self.order_by}".strip()
+
+    def with_condition(self, extra: str, *, order_by: str | None = None) -> str:
+        """条件部を括弧で囲んで extra と and で結合し、order by 句を付けたクエリ文字列を返す。
+
+        or を含む条件でも extra が全体に掛かる。order_by を指定すると元の order by 句を置き換える。
+        """
+
+        condition = f"({self.condition}) and {extra}" if self.condition else extra
+        order = self.order_by if order_by is None else order_by
+        return f"{condition} order by {order}" if order else condition
+
+
+@lru_cache(maxsize=256)
+def split_query(query: str) -> QueryClauses:
+    """クエリを条件部・order by・limit・offset に分ける。
+
+    括弧の外にある `limit <整数>` / `offset <整数>` だけを取り出すため、文字列リテラル内の同じ語句は
+    書き換えない。末尾に残った and / or や空の order by は取り除く。文法全体は検証しないため、
+    parse_query では解析できないクエリもそのまま kintone へ渡せる。
+    """
+
+    text = (query or "").strip()
+    try:
+        tokens = tokenize(text)
+    except QuerySyntaxError:
+        # 閉じていない引用符などは kintone 側のエラーに任せる
+        return QueryClauses(re.sub(r"\s+", " ", text), "", None, None)
+
+    condition_tokens: list[Token] = []
+    order_tokens: list[Token] = []
+    limit: int | None = None
+    offset: int | None = None
+    in_order_by = False
+    depth = 0
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        following = tokens[index + 1] if index + 1 < len(tokens) else None
+        if token.kind == "lparen":
+            depth += 1
+        elif token.kind == "rparen":
+            depth = max(0, depth - 1)
+        elif depth == 0 and token.is_keyword("limit", "offset") and following is not None and following.text.isdigit():
+            if token.text.lower() == "limit":
+                limit = int(following.text)
+            else:
+                offset = int(following.text)
+            index += 2
+            continue
+        elif depth == 0 and token.is_keyword("order") and following is not None and following.is_keyword("by"):
+            in_order_by = True
+            index += 2
+            continue
+        (order_tokens if in_order_by else condition_tokens).append(token)
+        index += 1
+
+    while condition_tokens and condition_tokens[-1].is_keyword("and", "or"):
+        condition_tokens.pop()
+    return QueryClauses(_render_tokens(text, condition_tokens), _render_tokens(text, order_tokens), limit, offset)
+
+
+def _render_tokens(source: str, tokens: list[Token]) -> str:
+    """トークン列を元の文字列から切り出して連結する。トークン間の空白は1つにまとめる。"""
+
+    parts: list[str] = []
+    previous: Token | None = None
+    for token in tokens:
+        if previous is not None and previous.end != token.position:
+            parts.append(" ")
+        parts.append(token.text)
+        previous = token
+    return "".join(parts)
+
+
+def iter_fields(condition: Condition | None) -> list[str]:
+    """条件式で参照しているフィールドコードを出現順に返す。"""
+
+    if condition is None:
+        return []
+    if isinstance(condition, BoolOp):
+        fields: list[str] = []
+        for operand in condition.operands:
+            fields.extend(field for field in iter_fields(operand) if field not in fields)
+        return fields
+    return [condition.field]
+
+
+def has_functions(condition: Condition | None) -> bool:
+    """条件式にクエリ関数（TODAY() など）が含まれるかを返す。"""
+
+    if condition is None or isinstance(condition, EmptyCheck):
+        return False
+    if isinstance(condition, BoolOp):
+        return any(has_functions(operand) for operand in condition.operands)
+    values = condition.value if isinstance(condition.value, list) else [condition.value]
+    return any(isinstance(value, Function) for value in values)
+
+
+class _Parser:
+    def __init__(self, tokens: list[Token]) -> None:
+        self.tokens = tokens
+        self.index = 0
+
+    def parse(self) -> ParsedQuery:
+        condition = None
+        if self._peek() is not None and not self._at_clause():
+            condition = self._parse_or()
+
+        order_by: list[tuple[str, str]] = []
+        limit: int | None = None
+        offset: int | None = None
+        while self._peek() is not None:
+            token = self._next()
+            if token.is_keyword("order"):
+                if order_by or not self._accept_keyword("by"):
+                    raise QuerySyntaxError("order by の指定が正しくありません。")
+                order_by = self._parse_order_by()
+            elif token.is_keyword("limit") and limit is None:
+                limit = self._parse_count("limit")
+            elif token.is_keyword("offset") and offset is None:
+                offset = self._parse_count("offset")
+            else:
+                raise QuerySyntaxError(f"予期しない語句があります: {token.text}")
+        return ParsedQuery(condition, order_by, limit, offset)
+
+    # --- 条件式 ---
+
+    def _parse_or(self) -> Condition:
+        operands = [self._parse_and()]
+        while self._accept_keyword("or"):
+            operands.append(self._parse_and())
+        return operands[0] if len(operands) == 1 else BoolOp("or", operands)
+
+    def _parse_and(self) -> Condition:
+        operands = [self._parse_primary()]
+        while self._accept_keyword("and"):
+            operands.append(self._parse_primary())
+        return operands[0] if len(operands) == 1 else BoolOp("and", operands)
+
+    def _parse_primary(self) -> Condition:
+        token = self._next()
+        if token.kind == "lparen":
+            condition = self._parse_or()
+            self._expect("rparen", ")")
+            return condition
+        if token.kind != "word" or self._is_reserved(token):
+            raise QuerySyntaxError(f"フィールドコードが必要な位置に {token.text} があります。")
+        field = token.text
+
+        if self._accept_keyword("is"):
+            negated = self._accept_keyword("not")
+            if not self._accept_keyword("empty"):
+                raise QuerySyntaxError(f"{field} の is empty の指定が正しくありません。")
+            return EmptyCheck(field, negated)
+
+        operator_token = self._next()
+        if operator_token.kind == "op":
+            return Comparison(field, operator_token.text, self._parse_operand())
+        if operator_token.is_keyword("not"):
+            follower = self._next()
+            if follower.is_keyword("in"):
+                return Comparison(field, "not in", self._parse_list())
+            if follower.is_keyword("like"):
+                return Comparison(field, "not like", self._parse_operand())
+            raise QuerySyntaxError(f"{field} の not の後には in または like を指定してください。")
+        if operator_token.is_keyword("in"):
+            return Comparison(field, "in", self._parse_list())
+        if operator_token.is_keyword("like"):
+            return Comparison(field, "like", self._parse_operand())
+        raise QuerySyntaxError(f"{field} の演算子 {operator_token.text} は使用できません。")
+
+    def _parse_operand(self) -> Operand:
+        token = self._next()
+        if token.kind == "string":
+            return unquote(token.text)
+        if token.kind == "word" and not self._is_reserved(token):
+            following = self._peek()
+            if following is not None and following.kind == "lparen":
+                return self._parse_function(token.text)
+            return token.text
+        raise QuerySyntaxError(f"値が必要な位置に {token.text} があります。")
+
+    def _parse_function(self, name: str) -> Function:
+        self._expect("lparen", "(")
+        args: list[str] = []
+        if self._peek() is not None and self._peek().kind == "rparen":
+            self._next()
+            return Function(name.upper(), args)
+        while True:
+            token = self._next()
+            if token.kind not in {"word", "string"}:
+                raise QuerySyntaxError(f"{name} の引数が正しくありません。")
+            args.append(unquote(token.text) if token.kind == "string" else token.text)
+            if self._next_is("comma"):
+                continue
+            self._expect("rparen", ")")
+            return Function(name.upper(), args)
+
+    def _parse_list(self) -> list[Operand]:
+        self._expect("lparen", "(")
+        values = [self._parse_operand()]
+        while self._next_is("comma"):
+            values.append(self._parse_operand())
+        self._expect("rparen", ")")
+        return values
+
+    # --- order by / limit / offset ---
+
+    def _parse_order_by(self) -> list[tuple[str, str]]:
+        order_by: list[tuple[str, str]] = []
+        while True:
+            token = self._next()
+            if token.kind != "word" or self._is_reserved(token):
+                raise QuerySyntaxError("order by にはフィールドコードを指定してください。")
+            direction = "asc"
+            following = self._peek()
+            if following is not None and following.is_keyword("asc", "desc"):
+                direction = self._next().text.lower()
+            order_by.append((token.text, direction))
+            if not self._next_is("comma"):
+                return order_by
+
+    def _parse_count(self, clause: str) -> int:
+        token = self._next()
+        if token.kind != "word" or not token.text.isdigit():
+            raise QuerySyntaxError(f"{clause} には0以上の整数を指定してください。")
+        return int(token.text)
+
+    # --- トークン操作 ---
+
+    def _peek(self) -> Token | None:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def _next(self) -> Token:
+        token = self._peek()
+        if token is None:
+            raise QuerySyntaxError("クエリが途中で終わっています。")
+        self.index += 1
+        return token
+
+    def _next_is(self, kind: str) -> bool:
+        token = self._peek()
+        if token is not None and token.kind == kind:
+            self.index += 1
+            return True
+        return False
+
+    def _accept_keyword(self, keyword: str) -> bool:
+        token = self._peek()
+        if token is not None and token.is_keyword(keyword):
+            self.index += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, text: str) -> None:
+        if not self._next_is(kind):
+            raise QuerySyntaxError(f"{text} が必要です。")
+
+    def _at_clause(self) -> bool:
+        token = self._peek()
+        return token is not None and token.is_keyword("order", "limit", "offset")
+
+    @staticmethod
+    def _is_reserved(token: Token) -> bool:
+        return token.is_keyword("and", "or", "order", "limit", "offset")
@@ -0,0 +1,113 @@
+"""
+where: kintone_integration/tools/query_planner.py
+what: 推定件数と並び順から kintone_query のページネーション方式を選ぶコストモデル
+why: order by の有無だけで方式を固定せず、件数に応じてリクエスト数と待ち時間が最小になる方式を選ぶため
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any
+
+MAX_OFFSET = 10_000  # kintone の offset の上限
+PAGE_SIZE = 500  # records.json / カーソルAPIの1回あたり最大取得件数
+# kintone は offset までのレコードを読み飛ばすため、offset が大きいページほど応答が遅くなる。
+# offset が OFFSET_PENALTY_RECORDS 増えるごとに1リクエスト分のコストが加算されるとみなす。
+OFFSET_PENALTY_RECORDS = 5_000
+CURSOR_OVERHEAD = 1.0  # カーソル作成のリクエスト
+PARALLEL_OVERHEAD = 2.0  # 最小/最大 $id を調べる2回のリクエスト
+
+
+class QueryPlan:
+    """選択したページネーション方式と、その根拠（推定件数と各方式のコスト）。"""
+
+    __slots__ = ("strategy", "estimated_count", "costs", "reason")
+
+    def __init__(self, strategy: str, estimated_count: int | None, costs: dict[str, float], reason: str) -> None:
+        self.strategy = strategy
+        self.estimated_count = estimated_count
+        self.costs = costs
+        self.reason = reason
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "estimated_count": self.estimated_count,
+            "costs": self.costs,
+            "reason": self.reason,
+        }
+
+
+def estimate_costs(
+    estimated_count: int,
+    *,
+    has_order_by: bool,
+    has_offset: bool,
+    initial_offset: int,
+    parallel_workers: int | None,
+) -> dict[str, float]:
+    """利用可能な方式ごとの推定コスト（逐次リクエスト換算）を返す。
+
+    parallel_workers が None の場合、parallel 方式は候補に含めない。
+    """
+
+    pages = max(1, math.ceil(estimated_count / PAGE_SIZE))
+    costs: dict[str, float] = {}
+
+    if initial_offset + estimated_count <= MAX_OFFSET + PAGE_SIZE:
+        costs["offset"] = sum(
+            1 + (initial_offset + page * PAGE_SIZE) / OFFSET_PENALTY_RECORDS for page in range(pages)
+        )
+    if has_offset:
+        # offset の指定を保てるのは offset 方式だけ
+        return {name: round(cost, 2) for name, cost in costs.items()}
+
+    if not has_order_by:
+        costs["record_id"] = float(pages)
+        if parallel_workers is not None and parallel_workers > 1 and pages > 1:
+            costs["parallel"] = PARALLEL_OVERHEAD + math.ceil(pages / parallel_workers)
+    costs["cursor"] = CURSOR_OVERHEAD + pages
+    return {name: round(cost, 2) for name, cost in costs.items()}
+
+
+def plan_pagination(
+    estimated_count: int | None,
+    *,
+    has_order_by: bool,
+    has_offset: bool,
+    initial_offset: int = 0,
+    parallel_workers: int | None = None,
+) -> QueryPlan:
+    """推定件数から最もコストの低いページネーション方式を選ぶ。
+
+    同じコストの場合は record_id → offset → cursor → parallel の順に単純な方式を優先する。
+    1ページに収まる場合は、order by がなければ record_id（$id 昇順）、あれば offset で1回だけ取得する。
+    parallel 方式は parallel_workers を指定した場合のみ候補にする。
+    """
+
+    fallback = "offset" if has_order_by or has_offset else "record_id"
+    if estimated_count is None:
+        return QueryPlan(fallback, None, {}, "件数を推定できなかったため、従来の規則で方式を選択しました。")
+
+    costs = estimate_costs(
+        estimated_count,
+        has_order_by=has_order_by,
+        has_offset=has_offset,
+        initial_offset=initial_offset,
+        parallel_workers=parallel_workers,
+    )
+    if not costs:
+        return QueryPlan(
+            fallback,
+            estimated_count,
+            costs,
+            f"offset の上限（{MAX_OFFSET}件）を超えますが、offset 指定を保てる方式がないため offset 方式で取得します。",
+        )
+
+    preference = ("record_id", "offset", "cursor", "parallel")
+    strategy = min(costs, key=lambda name: (costs[name], preference.index(name)))
+    if estimated_count <= PAGE_SIZE:
+        reason = f"推定{estimated_count}件で1ページに収まるため、1回の取得で完了する {strategy} 方式を選択しました。"
+    else:
+        reason = f"推定{estimated_count}件で、推定コストが最も低い {strategy} 方式を選択しました。"
+    return QueryPlan(strategy, estimated_count, costs, reason)
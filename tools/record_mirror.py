@@ -0,0 +1,434 @@
+"""
+where: kintone_integration/tools/record_mirror.py
+what: アプリのレコードを $id 単位で保持するローカル SQLite ミラーと、ミラー上でのクエリ評価
+why: 同じアプリへ繰り返し検索するワークフローで、差分更新したミラーから応答して API 呼び出しを減らすため
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterator, Mapping, Sequence
+
+from .field_cache import token_fingerprint
+from .query_parser import BoolOp, Condition, EmptyCheck, ParsedQuery, has_functions
+from .sync_state import Watermark, normalize_timestamp
+
+MIRROR_PATH_ENV = "KINTONE_MIRROR_PATH"
+MIRROR_RECONCILE_ENV = "KINTONE_MIRROR_RECONCILE_SECONDS"
+DEFAULT_MIRROR_MAX_STALENESS = 60.0
+DEFAULT_MIRROR_RECONCILE_SECONDS = 600.0
+# ミラーから読み出すときに1度に取り出す行数（読み出し中に保持するレコードはこの件数まで）
+MIRROR_READ_BATCH = 500
+
+_NUMERIC_TYPES = frozenset({"NUMBER", "CALC", "RECORD_NUMBER", "__ID__", "__REVISION__"})
+_DATETIME_TYPES = frozenset({"DATETIME", "CREATED_TIME", "UPDATED_TIME"})
+_DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class MirrorQueryError(ValueError):
+    """ミラー上で評価できないクエリ（クエリ関数や存在しないフィールド）を表す。"""
+
+
+def mirror_key(domain: str, app_id: int, api_token: str, updated_time_field: str) -> str:
+    """(ドメイン, アプリID, トークン指紋, 更新日時フィールド) のミラーキーを組み立てる。
+
+    閲覧権限はAPIトークンごとに異なるため、トークン単位で別のミラーとして扱う。
+    """
+
+    return f"{domain}|{app_id}|{token_fingerprint(api_token)}|{updated_time_field}"
+
+
+class MirrorState:
+    """ミラーの同期状態。refreshed_at が0の場合は初回の全件取得が完了していない。"""
+
+    __slots__ = ("watermark", "refreshed_at", "reconciled_at")
+
+    def __init__(self, watermark: Watermark | None, refreshed_at: float, reconciled_at: float) -> None:
+        self.watermark = watermark
+        self.refreshed_at = refreshed_at
+        self.reconciled_at = reconciled_at
+
+    @property
+    def complete(self) -> bool:
+        return self.refreshed_at > 0
+
+    def age(self) -> float | None:
+        return max(0.0, time.time() - self.refreshed_at) if self.complete else None
+
+
+class RecordMirror:
+    """アプリのレコードを保持する SQLite ファイルのストア。
+
+    アプリ全体をプラグインのメモリ（manifest の上限 256MB）に載せないよう、ファイルにのみ保存する。
+    """
+
+    def __init__(self, *, db_path: str) -> None:
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 書き込みは接続を使い回してロックで直列化する（読み出しは iter_records が別の接続で行う）
+        self._connection = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS mirror_state ("
+                "mirror_key TEXT PRIMARY KEY, updated_time TEXT, record_id INTEGER, "
+                "refreshed_at REAL NOT NULL DEFAULT 0, reconciled_at REAL NOT NULL DEFAULT 0)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS mirror_record ("
+                "mirror_key TEXT NOT NULL, record_id INTEGER NOT NULL, record TEXT NOT NULL, "
+                "PRIMARY KEY (mirror_key, record_id))"
+            )
+
+    @contextmanager
+    def refresh_lock(self, key: str) -> Iterator[None]:
+        """同じミラーの更新を直列化する（プロセス内のみ）。"""
+
+        with self._lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+    def get_state(self, key: str) -> MirrorState | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT updated_time, record_id, refreshed_at, reconciled_at FROM mirror_state WHERE mirror_key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        updated_time, record_id, refreshed_at, reconciled_at = row
+        watermark = Watermark(updated_time, int(record_id or 0)) if updated_time else None
+        return MirrorState(watermark, float(refreshed_at), float(reconciled_at))
+
+    def apply_page(self, key: str, records: Sequence[Mapping[str, Any]], watermark: Watermark | None) -> None:
+        """取得したページのレコードを反映し、同じトランザクションでウォーターマークを進める。
+
+        途中で失敗しても、保存済みのレコードとウォーターマークは常に整合する。
+        """
+
+        rows = []
+        for record in records:
+            record_id = record_id_of(record)
+            if record_id is not None:
+                rows.append((key, record_id, json.dumps(record, ensure_ascii=False)))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO mirror_record (mirror_key, record_id, record) VALUES (?, ?, ?)",
+                rows,
+            )
+            if watermark is not None:
+                self._connection.execute(
+                    "INSERT INTO mirror_state (mirror_key, updated_time, record_id) VALUES (?, ?, ?) "
+                    "ON CONFLICT(mirror_key) DO UPDATE SET updated_time = excluded.updated_time, "
+                    "record_id = excluded.record_id",
+                    (key, watermark.updated_time, watermark.record_id),
+                )
+
+    def reconcile(self, key: str, live_ids: set[int]) -> int:
+        """kintone 上に存在しない $id のレコードを削除し、削除件数を返す。"""
+
+        with self._lock, self._connection:
+            stored = [row[0] for row in self._connection.execute(
+                "SELECT record_id FROM mirror_record WHERE mirror_key = ?", (key,)
+            )]
+            removed = [(key, record_id) for record_id in stored if record_id not in live_ids]
+            self._connection.executemany(
+                "DELETE FROM mirror_record WHERE mirror_key = ? AND record_id = ?", removed
+            )
+        return len(removed)
+
+    def mark_refreshed(self, key: str, refreshed_at: float, *, reconciled_at: float | None = None) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO mirror_state (mirror_key, refreshed_at, reconciled_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(mirror_key) DO UPDATE SET refreshed_at = excluded.refreshed_at, "
+                "reconciled_at = CASE WHEN ? IS NULL THEN reconciled_at ELSE excluded.reconciled_at END",
+                (key, refreshed_at, reconciled_at or 0.0, reconciled_at),
+            )
+
+    def count(self, key: str) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM mirror_record WHERE mirror_key = ?", (key,)
+            ).fetchone()[0]
+
+    def iter_records(self, key: str, *, descending: bool = False) -> Iterator[dict[str, Any]]:
+        """保存済みのレコードを $id 順に返す。
+
+        MIRROR_READ_BATCH 行ずつ読み出し、アプリ全体を一度に展開しない。WAL のため、読み出し中も更新を妨げない。
+        """
+
+        order = "DESC" if descending else "ASC"
+        with closing(sqlite3.connect(self.db_path, timeout=30.0)) as connection:
+            cursor = connection.execute(
+                f"SELECT record FROM mirror_record WHERE mirror_key = ? ORDER BY record_id {order}", (key,)
+            )
+            while True:
+                rows = cursor.fetchmany(MIRROR_READ_BATCH)
+                if not rows:
+                    break
+                for (payload,) in rows:
+                    yield json.loads(payload)
+
+
+def record_id_of(record: Mapping[str, Any]) -> int | None:
+    entry = record.get("$id")
+    value = entry.get("value") if isinstance(entry, Mapping) else entry
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def select_records(records: Iterator[Mapping[str, Any]], parsed: ParsedQuery) -> list[Mapping[str, Any]]:
+    """条件に一致するレコードを並べ替え、offset/limit を適用して返す。
+
+    order by がない場合、records は返す順（$id 順）に並んでいるものとし、limit 件に達した時点で読み出しをやめる。
+    order by がある場合は offset + limit 件だけをヒープに保持する。limit がなければ一致した全件を保持する。
+    """
+
+    matched = (record for record in records if parsed.condition is None or matches(record, parsed.condition))
+    start = parsed.offset or 0
+    end = start + parsed.limit if parsed.limit is not None else None
+    if not parsed.order_by:
+        selected = []
+        for position, record in enumerate(matched):
+            if end is not None and position >= end:
+                break
+            if position >= start:
+                selected.append(record)
+        return selected
+
+    # 同じ値のレコードは読み出した順（$id 昇順）を保つよう、連番を第2キーにする
+    keyed = ((_OrderKey(record, parsed.order_by), sequence, record) for sequence, record in enumerate(matched))
+    if end is None:
+        ordered = sorted(keyed, key=lambda item: (item[0], item[1]))
+    else:
+        ordered = heapq.nsmallest(end, keyed, key=lambda item: (item[0], item[1]))
+    return [record for _, _, record in ordered[start:]]
+
+
+class _OrderKey:
+    """order by の各フィールドの昇順/降順に従って比較するソートキー。"""
+
+    __slots__ = ("values", "directions")
+
+    def __init__(self, record: Mapping[str, Any], order_by: Sequence[tuple[str, str]]) -> None:
+        self.values = [_sort_key(record, field) for field, _ in order_by]
+        self.directions = [direction == "desc" for _, direction in order_by]
+
+    def __lt__(self, other: "_OrderKey") -> bool:
+        for mine, theirs, descending in zip(self.values, other.values, self.directions):
+            if mine == theirs:
+                continue
+            return _sort_lt(theirs, mine) if descending else _sort_lt(mine, theirs)
+        return False
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _OrderKey) and not self < other and not other < self
+
+
+def _sort_lt(left: tuple[bool, bool, Any], right: tuple[bool, bool, Any]) -> bool:
+    if left[:2] != right[:2]:
+        return left[:2] < right[:2]
+    try:
+        return left[2] < right[2]
+    except TypeError:
+        return str(left[2]) < str(right[2])
+
+
+def matches(record: Mapping[str, Any], condition: Condition) -> bool:
+    """レコードが条件式を満たすかを判定する。"""
+
+    if isinstance(condition, BoolOp):
+        if condition.operator == "and":
+            return all(matches(record, operand) for operand in condition.operands)
+        return any(matches(record, operand) for operand in condition.operands)
+
+    field_type, values = _field_values(record, condition.field)
+    if isinstance(condition, EmptyCheck):
+        return bool(values) if condition.negated else not values
+
+    operator = condition.operator
+    literals = condition.value if isinstance(condition.value, list) else [condition.value]
+    reason = unsupported_reason(condition)
+    if reason:
+        raise MirrorQueryError(reason)
+
+    if operator in {"in", "not in"}:
+        # in ("") は値が空のレコードに一致する
+        found = (not values and "" in literals) or any(
+            _compare(field_type, value, "=", literal) for value in values for literal in literals
+        )
+        return found if operator == "in" else not found
+
+    if operator == "!=":
+        return not any(_compare(field_type, value, "=", literals[0]) for value in values)
+    return any(_compare(field_type, value, operator, literals[0]) for value in values)
+
+
+def unsupported_reason(condition: Condition | None) -> str | None:
+    """ミラー上で kintone と同じ結果を保証できない条件であれば、その理由を返す。
+
+    like / not like の一致判定（大文字小文字や語の区切りの扱い）は kintone の検索仕様に依存し、
+    クエリ関数は実行ユーザーや実行日時に依存するため、どちらもミラーでは評価しない。
+    日付のみのリテラルと日時フィールドの比較はフィールドの型が分かるレコードの評価時に判定する。
+    """
+
+    if condition is None or isinstance(condition, EmptyCheck):
+        return None
+    if isinstance(condition, BoolOp):
+        for operand in condition.operands:
+            reason = unsupported_reason(operand)
+            if reason:
+                return reason
+        return None
+    if condition.operator in {"like", "not like"}:
+        return f"{condition.operator} を含む条件はミラー上で評価できません。"
+    if has_functions(condition):
+        return "クエリ関数を含む条件はミラー上で評価できません。"
+    return None
+
+
+def _field_values(record: Mapping[str, Any], code: str) -> tuple[str | None, list[Any]]:
+    """フィールドの型と値の一覧を返す。テーブル内のフィールドは全行の値をまとめて返す。"""
+
+    entry = record.get(code)
+    if isinstance(entry, Mapping) and "value" in entry:
+        return entry.get("type"), _as_values(entry)
+
+    found = False
+    field_type = None
+    values: list[Any] = []
+    for candidate in record.values():
+        if not (isinstance(candidate, Mapping) and candidate.get("type") == "SUBTABLE"):
+            continue
+        for row in candidate.get("value") or []:
+            cell = (row.get("value") or {}).get(code) if isinstance(row, Mapping) else None
+            if isinstance(cell, Mapping):
+                found = True
+                field_type = cell.get("type")
+                values.extend(_as_values(cell))
+    if not found and not _subtable_declares(record):
+        raise MirrorQueryError(f"フィールド {code} がミラーのレコードに存在しません。")
+    return field_type, values
+
+
+def _subtable_declares(record: Mapping[str, Any]) -> bool:
+    """テーブルが0行のレコードではテーブル内のフィールドを確認できないため、存在を仮定する。"""
+
+    return any(
+        isinstance(entry, Mapping) and entry.get("type") == "SUBTABLE" and not entry.get("value")
+        for entry in record.values()
+    )
+
+
+def _as_values(entry: Mapping[str, Any]) -> list[Any]:
+    value = entry.get("value")
+    if value is None or value == "":
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    result = []
+    for item in value:
+        if isinstance(item, Mapping):
+            # ユーザー・組織・グループ選択は code、添付ファイルは name で比較する
+            item = item.get("code", item.get("name"))
+        if item not in (None, ""):
+            result.append(item)
+    return result
+
+
+def _normalize(field_type: str | None, raw: Any, literal: str) -> tuple[Any, Any]:
+    """比較できるように (レコードの値, リテラル) を型に合わせて変換する。"""
+
+    if field_type in _NUMERIC_TYPES:
+        try:
+            return Decimal(str(raw)), Decimal(literal)
+        except InvalidOperation:
+            return str(raw), literal
+    if field_type in _DATETIME_TYPES:
+        try:
+            value = normalize_timestamp(str(raw))
+        except ValueError:
+            return str(raw), literal
+        if _DATE_ONLY.match(literal):
+            # kintone は日付のみの指定をユーザーのタイムゾーンの日付として解釈するため、UTC では再現できない
+            raise MirrorQueryError("日時フィールドと日付のみの値の比較はミラー上で評価できません。")
+        try:
+            return value, normalize_timestamp(literal)
+        except ValueError:
+            return value, literal
+    return raw if isinstance(raw, str) else str(raw), literal
+
+
+def _compare(field_type: str | None, raw: Any, operator: str, literal: Any) -> bool:
+    value, target = _normalize(field_type, raw, str(literal))
+    if operator == "=":
+        return value == target
+    if type(value) is not type(target):
+        return False
+    if operator == ">":
+        return value > target
+    if operator == "<":
+        return value < target
+    if operator == ">=":
+        return value >= target
+    if operator == "<=":
+        return value <= target
+    raise MirrorQueryError(f"演算子 {operator} はミラー上で評価できません。")
+
+
+def _sort_key(record: Mapping[str, Any], field: str) -> tuple[bool, bool, Any]:
+    field_type, values = _field_values(record, field)
+    if not values:
+        return (True, False, "")
+    # リテラルが数値として解釈できないと値も文字列のまま比較されるため、数値のダミーを渡す
+    value, _ = _normalize(field_type, values[0], "0")
+    # 数値に変換できない値（接頭辞付きのレコード番号など）は文字列として後ろに並べる
+    return (False, isinstance(value, str), value)
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    try:
+        value = float(raw) if raw not in (None, "") else default
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+def reconcile_interval() -> float:
+    """削除検知のための $id 突き合わせを行う間隔（秒）。"""
+
+    return _env_float(MIRROR_RECONCILE_ENV, DEFAULT_MIRROR_RECONCILE_SECONDS)
+
+
+_RECORD_MIRROR: RecordMirror | None = None
+_RECORD_MIRROR_LOCK = threading.Lock()
+
+
+def get_record_mirror() -> RecordMirror | None:
+    """環境変数 KINTONE_MIRROR_PATH の SQLite ファイルを使うプロセス共有のミラーを返す。未設定なら None。"""
+
+    global _RECORD_MIRROR
+    db_path = os.environ.get(MIRROR_PATH_ENV)
+    if not db_path:
+        return None
+    with _RECORD_MIRROR_LOCK:
+        if _RECORD_MIRROR is None or _RECORD_MIRROR.db_path != db_path:
+            _RECORD_MIRROR = RecordMirror(db_path=db_path)
+        return _RECORD_MIRROR
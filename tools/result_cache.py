@@ -0,0 +1,193 @@
+"""
+where: kintone_integration/tools/result_cache.py
+what: kintone_query の取得結果をプロセス内で共有する TTL とバイト数上限付きのキャッシュ
+why: 会話のターンごとに同じ検索を繰り返すフローで、kintone への往復を省いて即座に応答するため
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Optional, Sequence
+
+from .field_cache import token_fingerprint
+
+DEFAULT_QUERY_CACHE_TTL = 30.0
+QUERY_CACHE_TTL_ENV = "KINTONE_QUERY_CACHE_TTL_SECONDS"
+DEFAULT_QUERY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+QUERY_CACHE_MAX_BYTES_ENV = "KINTONE_QUERY_CACHE_MAX_BYTES"
+RESULT_CACHE_HIT = "hit"
+RESULT_CACHE_MISS = "miss"
+
+CachedPage = tuple[list[dict[str, Any]], Optional[int]]
+
+
+def result_cache_key(
+    domain: str,
+    app_id: int,
+    api_token: str,
+    *,
+    query: str,
+    limit: int | None,
+    offset: int | None,
+    fields: Sequence[str] | None,
+    strategy: str,
+) -> str:
+    """(ドメイン, アプリ, トークン指紋, 正規化済みクエリ, fields, 取得方式) のキャッシュキーを組み立てる。
+
+    閲覧権限はAPIトークンごとに異なるため、トークン指紋もキーに含める。order by がない場合の並び順は
+    取得方式によって異なるため、方式もキーに含める。fields には field_profile や aggregate で絞り込んだ後の
+    実際に取得するフィールドを渡す。キャッシュするのは出力モードで整形する前のページなので、出力モードはキーに含めない。
+    """
+
+    payload = json.dumps(
+        [domain, app_id, token_fingerprint(api_token), query, limit, offset, list(fields or []), strategy],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_size(records: Sequence[Mapping[str, Any]]) -> int:
+    """ページのおおよそのサイズ（JSON にした場合のバイト数）を返す。"""
+
+    return len(json.dumps(records, ensure_ascii=False).encode("utf-8"))
+
+
+class ResultCacheEntry:
+    """キャッシュされたページ列と取得時の付随情報。
+
+    strategy は取得時に実際に使ったページネーション方式（auto の場合は選択された方式）。
+    """
+
+    __slots__ = ("pages", "stats", "size", "stored_at", "strategy")
+
+    def __init__(
+        self,
+        pages: list[CachedPage],
+        stats: Mapping[str, Any],
+        size: int,
+        stored_at: float,
+        strategy: str | None = None,
+    ) -> None:
+        self.pages = pages
+        self.stats = stats
+        self.size = size
+        self.stored_at = stored_at
+        self.strategy = strategy
+
+    def age(self) -> float:
+        return max(0.0, time.time() - self.stored_at)
+
+
+class QueryResultCache:
+    """TTL と合計バイト数の上限で古いエントリから破棄する LRU キャッシュ。"""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = DEFAULT_QUERY_CACHE_TTL,
+        max_bytes: int = DEFAULT_QUERY_CACHE_MAX_BYTES,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, ResultCacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> ResultCacheEntry | None:
+        """有効期限内のエントリを返し、ヒット/ミスを記録する。"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age() > self.ttl_seconds:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: str,
+        pages: list[CachedPage],
+        stats: Mapping[str, Any],
+        size: int,
+        *,
+        strategy: str | None = None,
+    ) -> bool:
+        """取得結果を保存する。単独で上限を超える結果は保存せず False を返す。"""
+
+        if size > self.max_bytes or self.ttl_seconds <= 0:
+            return False
+        entry = ResultCacheEntry(pages, dict(stats), size, time.time(), strategy)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name)
+    try:
+        value = float(raw) if raw not in (None, "") else default
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    try:
+        value = int(raw) if raw not in (None, "") else default
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+_RESULT_CACHE: QueryResultCache | None = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> QueryResultCache:
+    """環境変数の設定に基づくプロセス共有の検索結果キャッシュを返す。"""
+
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = QueryResultCache(
+                ttl_seconds=_env_float(QUERY_CACHE_TTL_ENV, DEFAULT_QUERY_CACHE_TTL),
+                max_bytes=_env_int(QUERY_CACHE_MAX_BYTES_ENV, DEFAULT_QUERY_CACHE_MAX_BYTES),
+            )
+        return _RESULT_CACHE
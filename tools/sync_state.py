@@ -0,0 +1,215 @@
+"""
+where: kintone_integration/tools/sync_state.py
+what: 差分同期のウォーターマーク（更新日時 + $id）の解析と保存
+why: 前回の同期以降に更新されたレコードだけを取得し、同期コストを変更件数に比例させるため
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Mapping
+
+SYNC_STATE_PATH_ENV = "KINTONE_SYNC_STATE_PATH"
+DEFAULT_UPDATED_TIME_FIELD = "更新日時"
+
+WatermarkKey = tuple[str, int, str]
+
+
+class Watermark:
+    """最後に取得したレコードの (更新日時, $id)。同じ更新日時のレコードは $id で順序付ける。"""
+
+    __slots__ = ("updated_time", "record_id")
+
+    def __init__(self, updated_time: str, record_id: int = 0) -> None:
+        self.updated_time = updated_time
+        self.record_id = record_id
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"updated_time": self.updated_time, "record_id": self.record_id}
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Watermark) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Watermark({self.updated_time!r}, {self.record_id!r})"
+
+
+def normalize_timestamp(raw: str) -> str:
+    """ISO 8601 の日時文字列を kintone のクエリで使う UTC 形式（YYYY-MM-DDTHH:MM:SSZ）へ揃える。"""
+
+    text = raw.strip()
+    if text.endswith("Z") or text.endswith("z"):
+        text = f"{text[:-1]}+00:00"
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_watermark(raw: Any) -> Watermark | None:
+    """since_watermark パラメータを解析する。
+
+    {"updated_time": "...", "record_id": 123} 形式のJSON（文字列または辞書）か、日時文字列のみを受け付ける。
+    """
+
+    if raw is None or (isinstance(raw, str) and not raw.strip()):
+        return None
+
+    payload: Any = raw
+    if isinstance(raw, str) and raw.strip().startswith("{"):
+        try:
+            payload = json.loads(raw)
+        except json.JSONDecodeError as error:
+            raise ValueError("since_watermark のJSON形式が正しくありません。") from error
+
+    if isinstance(payload, str):
+        updated_time, record_id = payload, 0
+    elif isinstance(payload, Mapping):
+        updated_time = payload.get("updated_time")
+        record_id = payload.get("record_id", 0)
+        if not isinstance(updated_time, str) or not updated_time.strip():
+            raise ValueError("since_watermark には updated_time を指定してください。")
+    else:
+        raise ValueError("since_watermark は日時文字列または JSON オブジェクトで指定してください。")
+
+    try:
+        normalized = normalize_timestamp(updated_time)
+    except ValueError as error:
+        raise ValueError(
+            "since_watermark の updated_time は ISO 8601 形式（例: 2024-01-01T00:00:00Z）で指定してください。"
+        ) from error
+    try:
+        record_id = int(record_id or 0)
+    except (TypeError, ValueError) as error:
+        raise ValueError("since_watermark の record_id には0以上の整数を指定してください。") from error
+    if record_id < 0:
+        raise ValueError("since_watermark の record_id には0以上の整数を指定してください。")
+    return Watermark(normalized, record_id)
+
+
+def watermark_condition(field_code: str, watermark: Watermark | None) -> str:
+    """ウォーターマークより後に更新されたレコードを表す条件式を返す。"""
+
+    if watermark is None:
+        return ""
+    quoted = f'"{watermark.updated_time}"'
+    return (
+        f"({field_code} > {quoted} or "
+        f"({field_code} = {quoted} and $id > {watermark.record_id}))"
+    )
+
+
+def watermark_of(record: Mapping[str, Any], field_code: str) -> Watermark | None:
+    """レコードの更新日時と $id からウォーターマークを作る。取得できなければ None を返す。"""
+
+    def _value(code: str) -> Any:
+        entry = record.get(code)
+        return entry.get("value") if isinstance(entry, Mapping) else entry
+
+    updated_time = _value(field_code)
+    try:
+        record_id = int(_value("$id"))
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(updated_time, str) or not updated_time:
+        return None
+    try:
+        return Watermark(normalize_timestamp(updated_time), record_id)
+    except ValueError:
+        return None
+
+
+def watermark_key(domain: str, app_id: int, query: str, field_code: str) -> WatermarkKey:
+    """(ドメイン, アプリID, クエリと更新日時フィールドのハッシュ) の保存キーを組み立てる。"""
+
+    normalized_query = re.sub(r"\s+", " ", query or "").strip()
+    digest = hashlib.sha256(f"{field_code}\n{normalized_query}".encode("utf-8")).hexdigest()[:16]
+    return (domain, app_id, digest)
+
+
+class WatermarkStore:
+    """ウォーターマークの保存先（プロセス内のメモリ、任意で SQLite に永続化）。"""
+
+    def __init__(self, *, db_path: str | None = None) -> None:
+        self.db_path = db_path
+        self._entries: dict[WatermarkKey, Watermark] = {}
+        self._lock = threading.Lock()
+        if db_path:
+            self._init_db()
+
+    def get(self, key: WatermarkKey) -> Watermark | None:
+        rows = self._execute(
+            "SELECT updated_time, record_id FROM sync_watermark WHERE watermark_key = ?",
+            (self._db_key(key),),
+        )
+        if rows:
+            watermark = Watermark(rows[0][0], int(rows[0][1]))
+            with self._lock:
+                self._entries[key] = watermark
+            return watermark
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: WatermarkKey, watermark: Watermark) -> None:
+        with self._lock:
+            self._entries[key] = watermark
+        self._execute(
+            "INSERT OR REPLACE INTO sync_watermark (watermark_key, updated_time, record_id) VALUES (?, ?, ?)",
+            (self._db_key(key), watermark.updated_time, watermark.record_id),
+        )
+
+    def delete(self, key: WatermarkKey) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        self._execute("DELETE FROM sync_watermark WHERE watermark_key = ?", (self._db_key(key),))
+
+    # --- SQLite 永続化（失敗してもメモリ上の保存で動作を継続する） ---
+
+    @staticmethod
+    def _db_key(key: WatermarkKey) -> str:
+        domain, app_id, digest = key
+        return f"{domain}|{app_id}|{digest}"
+
+    def _init_db(self) -> None:
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS sync_watermark ("
+                "watermark_key TEXT PRIMARY KEY, updated_time TEXT NOT NULL, record_id INTEGER NOT NULL)",
+                (),
+            )
+        except OSError:
+            self.db_path = None
+
+    def _execute(self, sql: str, params: tuple[Any, ...]) -> list[tuple[Any, ...]]:
+        if not self.db_path:
+            return []
+        try:
+            with closing(sqlite3.connect(self.db_path, timeout=5.0)) as connection:
+                with connection:
+                    return connection.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            return []
+
+
+_WATERMARK_STORE: WatermarkStore | None = None
+_WATERMARK_STORE_LOCK = threading.Lock()
+
+
+def get_watermark_store() -> WatermarkStore:
+    """環境変数 KINTONE_SYNC_STATE_PATH の設定に基づくプロセス共有の保存先を返す。"""
+
+    global _WATERMARK_STORE
+    with _WATERMARK_STORE_LOCK:
+        if _WATERMARK_STORE is None:
+            _WATERMARK_STORE = WatermarkStore(db_path=os.environ.get(SYNC_STATE_PATH_ENV) or None)
+        return _WATERMARK_STORE
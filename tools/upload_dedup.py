@@ -0,0 +1,33 @@
+"""
+where: kintone_integration/tools/upload_dedup.py
+what: ファイル内容の SHA-256 から、1回の呼び出しに含まれる同一ファイルを見分けるキー
+why: 同じテンプレートPDFやロゴを複数指定したときに、同じ内容を何度もアップロードしないため
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from .upload_stream import FileSource
+
+
+def content_digest(source: FileSource) -> str:
+    """ファイル内容の SHA-256（16進）をチャンク単位で求める。内容全体はメモリに展開しない。"""
+
+    digest = hashlib.sha256()
+    for chunk in source.iter_chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_dedup_key(digest: str, file_name: str, content_type: str) -> str:
+    """(内容のハッシュ, ファイル名, Content-Type) のキーを組み立てる。
+
+    ファイル名と Content-Type はアップロード時に fileKey と結び付くため、内容が同じでも別のキーとする。
+    一時保管領域の fileKey はレコードに添付すると使えなくなるため、キーは1回の呼び出しの中でのみ使い、
+    呼び出しをまたいで fileKey を保持しない。
+    """
+
+    payload = json.dumps([digest, file_name, content_type], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,184 @@
+"""
+where: kintone_integration/tools/upload_stream.py
+what: ファイルの内容を小さなチャンク単位で multipart/form-data として送信するためのストリーム
+why: アップロードのたびにファイル全体を bytes として展開し、さらに multipart 全体を組み立て直すと
+     ファイルサイズの約3倍のメモリを使い、複数ファイルの並列アップロードでプラグインのメモリ上限に達するため
+"""
+
+from __future__ import annotations
+
+import abc
+import base64
+import binascii
+import os
+import re
+import tempfile
+import uuid
+from typing import IO, Any, Iterator
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_SPOOL_BYTES = 1024 * 1024
+SPOOL_BYTES_ENV = "KINTONE_UPLOAD_SPOOL_BYTES"
+# 4の倍数にして、チャンクごとに独立して base64 デコードできるようにする
+_BASE64_CHUNK_CHARS = (CHUNK_SIZE // 3) * 4
+_BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+
+class UploadTooLargeError(ValueError):
+    """ダウンロード中のファイルがアップロード上限を超えたことを表す。"""
+
+
+def resolve_spool_bytes(value: Any = None) -> int:
+    """URL から取得したファイルをメモリ上に保持する上限バイト数（超えた分は一時ファイルへ書き出す）。"""
+
+    raw = value if value is not None else os.environ.get(SPOOL_BYTES_ENV)
+    try:
+        resolved = int(raw) if raw not in (None, "") else DEFAULT_SPOOL_BYTES
+    except (TypeError, ValueError):
+        return DEFAULT_SPOOL_BYTES
+    return max(0, resolved)
+
+
+class FileSource(abc.ABC):
+    """サイズが事前に分かり、先頭から何度でも読み直せるファイルの内容。"""
+
+    size = 0
+
+    @abc.abstractmethod
+    def iter_chunks(self) -> Iterator[bytes]:
+        """内容を先頭から CHUNK_SIZE 程度のチャンクで返す。"""
+
+    def close(self) -> None:
+        """一時ファイルなどの資源を解放する。"""
+
+
+class BytesSource(FileSource):
+    def __init__(self, data: bytes) -> None:
+        self._view = memoryview(data)
+        self.size = len(data)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for start in range(0, self.size, CHUNK_SIZE):
+            yield self._view[start : start + CHUNK_SIZE]
+
+
+class Base64Source(FileSource):
+    """base64 文字列をチャンクごとにデコードしながら読み出す。デコード結果全体は保持しない。"""
+
+    def __init__(self, text: str) -> None:
+        # b64decode(validate=True) と同じ条件を、デコードせずに先に検証する
+        if len(text) % 4 or not _BASE64_PATTERN.fullmatch(text):
+            raise binascii.Error("invalid base64")
+        self._text = text
+        padding = text[-2:].count("=")
+        self.size = len(text) // 4 * 3 - padding
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        text = self._text
+        for start in range(0, len(text), _BASE64_CHUNK_CHARS):
+            yield base64.b64decode(text[start : start + _BASE64_CHUNK_CHARS])
+
+
+class SpooledSource(FileSource):
+    """一定サイズまではメモリ、それを超えると一時ファイルに保持した内容。"""
+
+    def __init__(self, spool: IO[bytes], size: int) -> None:
+        self._spool = spool
+        self.size = size
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        self._spool.seek(0)
+        while True:
+            chunk = self._spool.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self._spool.close()
+
+
+def spool_response(response: requests.Response, max_bytes: int, spool_bytes: int | None = None) -> SpooledSource:
+    """ダウンロード中のレスポンスを少しずつ書き出す。max_bytes を超えた時点で UploadTooLargeError を送出する。"""
+
+    spool = tempfile.SpooledTemporaryFile(max_size=resolve_spool_bytes(spool_bytes))
+    size = 0
+    try:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError("file too large")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return SpooledSource(spool, size)
+
+
+def _quote_param(value: str) -> str:
+    # requests（urllib3）が files= で送る場合と同じ HTML5 形式でエスケープする
+    escaped = value.replace("\\", "\\\\").replace('"', "%22")
+    return re.sub(r"[\x00-\x1A\x1C-\x1F]", lambda match: f"%{ord(match.group()):02X}", escaped)
+
+
+class MultipartFileBody:
+    """1ファイルを含む multipart/form-data 本文を、read() のたびに必要な分だけ生成するファイルライクオブジェクト。
+
+    長さが事前に分かるため Content-Length 付きで送信でき、rewind() で先頭から送り直せる（再試行用）。
+    """
+
+    def __init__(
+        self,
+        source: FileSource,
+        *,
+        filename: str,
+        content_type: str,
+        field_name: str = "file",
+        boundary: str | None = None,
+    ) -> None:
+        self.source = source
+        self.boundary = boundary or uuid.uuid4().hex
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote_param(field_name)}"; filename="{_quote_param(filename)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self._length = len(self._head) + source.size + len(self._tail)
+        self.rewind()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def rewind(self) -> None:
+        self._parts = self._iter_parts()
+        self._pending = memoryview(b"")
+
+    def _iter_parts(self) -> Iterator[bytes]:
+        yield self._head
+        yield from self.source.iter_chunks()
+        yield self._tail
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        output = bytearray()
+        while len(output) < size:
+            if not self._pending:
+                chunk = next(self._parts, None)
+                if chunk is None:
+                    break
+                self._pending = memoryview(chunk)
+                continue
+            take = size - len(output)
+            output += self._pending[:take]
+            self._pending = self._pending[take:]
+        return bytes(output)